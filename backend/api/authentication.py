@@ -0,0 +1,33 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from api.services import user_cache
+
+# Copied from the user into every token; bumping the user's version revokes them
+TOKEN_VERSION_CLAIM = "token_version"
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the user through ``user_cache``, so hot
+    authenticated traffic skips the per-request ``User`` lookup.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken("Token contained no recognizable user identification") from e
+        version = validated_token.get(TOKEN_VERSION_CLAIM, 0)
+
+        user = user_cache.get(user_id, version)
+        if user is not None:
+            return user
+
+        # Runs the inactive-user checks on every cache miss
+        user = super().get_user(validated_token)
+        if user.token_version != version:
+            raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+        user_cache.put(user)
+        return user
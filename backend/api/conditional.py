@@ -0,0 +1,55 @@
+"""
+Conditional GET helpers: strong ETags, Last-Modified and Cache-Control.
+
+Views compute validators from what they already hold (a cached payload or a
+row's ``updated_at``) and check them before building a response body.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def make_etag(*parts, weak: bool = False) -> str:
+    """
+    ETag over ``parts``; dicts and lists are hashed in canonical JSON form.
+
+    ``weak`` marks bodies that are equivalent rather than byte-identical,
+    such as generated text that may be regenerated differently.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, (str, bytes)):
+            part = json.dumps(part, sort_keys=True, separators=(",", ":"), default=str)
+        if isinstance(part, str):
+            part = part.encode()
+        digest.update(part)
+        digest.update(b"\0")
+    etag = f'"{digest.hexdigest()[:32]}"'
+    return f"W/{etag}" if weak else etag
+
+
+def not_modified(request, etag: str = None, last_modified=None):
+    """
+    Return a 304 (or 412 for a failed If-Match) when the request's
+    conditional headers match the validators, otherwise ``None``.
+    """
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        add_validators(response, etag=etag, last_modified=last_modified)
+    return response
+
+
+def add_validators(response, etag: str = None, last_modified=None):
+    if etag:
+        response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    patch_cache_control(response, max_age=settings.HTTP_CACHE_MAX_AGE)
+    return response
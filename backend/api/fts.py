@@ -0,0 +1,65 @@
+"""
+SQLite FTS5 index over api_stock, kept in sync by triggers.
+
+Triggers (rather than model signals) also cover bulk_create upserts and raw
+SQL. SQLite drops triggers when Django rebuilds a table during a migration,
+so any later migration that remakes api_stock must call ``install`` again.
+"""
+
+FTS_TABLE = "api_stock_fts"
+
+COLUMNS = ("symbol", "name", "description", "sector", "industry")
+
+_columns = ", ".join(COLUMNS)
+_new = ", ".join(f"new.{column}" for column in COLUMNS)
+_old = ", ".join(f"old.{column}" for column in COLUMNS)
+
+CREATE_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {_columns},
+        content='api_stock',
+        content_rowid='id',
+        tokenize='unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON api_stock BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON api_stock BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_columns} ON api_stock BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old});
+        INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new});
+    END
+    """,
+    # Index whatever is already in the table
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def install(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def uninstall(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.services import cache_service, popularity, quota
+from api.services.overview_service import aload_overview, is_valid_overview
+from api.services.summary_service import aget_summary
+
+logger = logging.getLogger(__name__)
+
+
+class BudgetExhausted(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Warm the overview cache, Stock rows and AI summaries for the configured "
+        "and most requested tickers, within a daily Alpha Vantage budget. "
+        "An unfinished run (budget spent, interrupted, failures) is resumed "
+        "by running the command again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tickers", help="Comma-separated tickers to warm instead of the configured and popular ones")
+        parser.add_argument("--limit", type=int, default=settings.PREWARM_LIMIT)
+        parser.add_argument("--budget", type=int, default=settings.PREWARM_AV_BUDGET,
+                            help="Alpha Vantage calls the command may spend per day")
+        parser.add_argument("--concurrency", type=int, default=settings.PREWARM_CONCURRENCY)
+        parser.add_argument("--no-summaries", action="store_true", help="Skip the AI summaries")
+        parser.add_argument("--state-file", default=settings.PREWARM_STATE_FILE)
+        parser.add_argument("--restart", action="store_true", help="Discard an unfinished run and start over")
+
+    def handle(self, *args, **options):
+        if settings.CACHE_IS_LOCMEM:
+            self.stderr.write(self.style.WARNING(
+                "CACHE_BACKEND is a per-process LocMemCache: only the Stock rows will "
+                "outlive this command. Use a shared cache backend to warm the web workers."
+            ))
+
+        self.state_file = Path(options["state_file"])
+        self.state = self._load_state(options)
+
+        today = timezone.now().date().isoformat()
+        if self.state.get("day") != today:
+            self.state["day"] = today
+            self.state["av_calls"] = 0
+        self.calls_before = self.state["av_calls"]
+        self.budget = max(options["budget"] - self.calls_before, 0)
+
+        done = set(self.state["done"])
+        pending = [ticker for ticker in self.state["tickers"] if ticker not in done]
+        if not pending:
+            self.stdout.write("Nothing to warm.")
+            self._finish()
+            return
+
+        self.stdout.write(
+            f"Warming {len(pending)} of {len(self.state['tickers'])} tickers, "
+            f"{self.budget} Alpha Vantage calls left today."
+        )
+
+        # The rest of today's budget is all this process may take from the key
+        quota.scheduler.cap_daily(self.budget)
+        self.summaries = not options["no_summaries"]
+        counts = asyncio.run(self._warm(pending, options["concurrency"]))
+
+        self._save_state()
+        self.stdout.write(
+            f"warmed={counts['warmed']} unknown={counts['unknown']} failed={counts['failed']} "
+            f"skipped={counts['skipped']} av_calls={quota.scheduler.granted}"
+        )
+        if counts["skipped"]:
+            self.stdout.write(self.style.WARNING("Alpha Vantage budget spent; run again later to resume."))
+        elif counts["failed"]:
+            self.stdout.write(self.style.WARNING("Some tickers failed; run again to retry them."))
+        else:
+            self._finish()
+
+    # STATE
+    def _load_state(self, options) -> dict:
+        if self.state_file.exists() and not options["restart"]:
+            try:
+                state = json.loads(self.state_file.read_text())
+            except ValueError as e:
+                raise CommandError(f"Unreadable state file {self.state_file}: {e}; use --restart")
+            self.stdout.write(f"Resuming the run from {self.state_file}.")
+            return state
+
+        return {"tickers": self._candidates(options), "done": [], "day": None, "av_calls": 0}
+
+    def _candidates(self, options) -> list:
+        if options["tickers"]:
+            tickers = [t.strip().upper() for t in options["tickers"].split(",") if t.strip()]
+        else:
+            tickers = settings.PREWARM_TICKERS + popularity.most_requested(options["limit"])
+        return list(dict.fromkeys(tickers))[:options["limit"]]
+
+    def _save_state(self) -> None:
+        self.state["av_calls"] = self.calls_before + quota.scheduler.granted
+        tmp = self.state_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.state))
+        os.replace(tmp, self.state_file)
+
+    def _finish(self) -> None:
+        # A finished run leaves nothing to resume, so the next one starts fresh
+        self.state_file.unlink(missing_ok=True)
+
+    # WARM
+    async def _warm(self, tickers: list, concurrency: int) -> dict:
+        counts = {"warmed": 0, "unknown": 0, "failed": 0, "skipped": 0}
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def warm(ticker):
+            async with semaphore:
+                try:
+                    outcome = await self._warm_one(ticker)
+                except BudgetExhausted:
+                    # Left pending for the next run
+                    counts["skipped"] += 1
+                    return
+                except Exception as e:
+                    logger.warning("Prewarm failed for %s: %s", ticker, e)
+                    self.stderr.write(f"{ticker}: {e}")
+                    counts["failed"] += 1
+                    return
+
+            counts[outcome] += 1
+            self.state["done"].append(ticker)
+            self._save_state()
+
+        # The tasks inherit the background priority, so prewarming yields to
+        # interactive requests and leaves them the daily reserve
+        with quota.background():
+            await asyncio.gather(*(warm(ticker) for ticker in tickers))
+        return counts
+
+    async def _warm_one(self, ticker: str) -> str:
+        overview = await self._load_overview(ticker)
+        if not is_valid_overview(overview):
+            return "unknown"
+
+        await cache_service.aset_entry("overview", ticker, overview)
+        if self.summaries:
+            await aget_summary(ticker, overview)
+        return "warmed"
+
+    async def _load_overview(self, ticker: str) -> dict:
+        # A fresh Stock row costs no Alpha Vantage call, so those tickers
+        # still get warmed once the budget is spent
+        while True:
+            try:
+                return await aload_overview(ticker)
+            except quota.QuotaExceeded as e:
+                if (await quota.scheduler.aremaining())["day_background"] < 1:
+                    raise BudgetExhausted() from e
+                # Only the per-minute limit was hit
+                await asyncio.sleep(e.retry_after)
@@ -0,0 +1,67 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from api.services import metrics
+
+
+def _view_name(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    # Unresolved paths share one label so scanners can't blow up the series count
+    return match.view_name if match else "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Records latency, response size, upstream calls, DB queries and cache
+    lookups per view. Streaming responses are recorded once the last chunk
+    has been sent.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        current = metrics.start_request()
+        return self._finish(current, request, self.get_response(request))
+
+    async def __acall__(self, request):
+        current = metrics.start_request()
+        return self._finish(current, request, await self.get_response(request))
+
+    def _finish(self, current, request, response):
+        def finish(size):
+            metrics.finish_request(current, _view_name(request), request.method, response.status_code, size)
+
+        if not response.streaming:
+            finish(len(response.content))
+        elif response.is_async:
+            response.streaming_content = self._acount(response.streaming_content, finish)
+        else:
+            response.streaming_content = self._count(response.streaming_content, finish)
+        return response
+
+    @staticmethod
+    def _count(chunks, finish):
+        size = 0
+        try:
+            for chunk in chunks:
+                size += len(chunk)
+                yield chunk
+        finally:
+            finish(size)
+
+    @staticmethod
+    async def _acount(chunks, finish):
+        size = 0
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                yield chunk
+        finally:
+            finish(size)
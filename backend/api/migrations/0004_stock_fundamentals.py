@@ -0,0 +1,143 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_remove_user_google_sub'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='address',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='analyst_rating_buy',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='analyst_rating_hold',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='analyst_rating_sell',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='analyst_rating_strong_buy',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='analyst_rating_strong_sell',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='analyst_target_price',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='asset_type',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='book_value',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='currency',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='ebitda',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='eps',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='fetched_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='gross_profit_ttm',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='market_cap',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='moving_average_200',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='moving_average_50',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='operating_margin_ttm',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='pe_ratio',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='peg_ratio',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='profit_margin',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='return_on_assets',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='return_on_equity',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='revenue_ttm',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='week_52_high',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='week_52_low',
+            field=models.FloatField(null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_stock_fundamentals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['exchange', 'symbol'], name='api_stock_exchang_1bba1d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['country', 'symbol'], name='api_stock_country_5be179_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['sector', 'symbol'], name='api_stock_sector_2c87de_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['industry', 'symbol'], name='api_stock_industr_51d5ca_idx'),
+        ),
+    ]
@@ -0,0 +1,14 @@
+from django.db import migrations
+
+from api import fts
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_stock_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(fts.install, fts.uninstall),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+from api import fts
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_stock_fts'),
+    ]
+
+    # SQLite rebuilds api_stock for this column (and again when reversing),
+    # which drops the FTS triggers, so they are re-installed on both sides
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, fts.install),
+        migrations.AddField(
+            model_name='stock',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(fts.install, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_stock_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TickerPopularity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=10, unique=True)),
+                ('request_count', models.PositiveBigIntegerField(default=0)),
+                ('last_requested_at', models.DateTimeField(null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-request_count'], name='api_tickerp_request_817abc_idx')],
+            },
+        ),
+    ]
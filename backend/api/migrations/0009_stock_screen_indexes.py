@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_tickerpopularity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['market_cap'], name='api_stock_market__6ad42c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['pe_ratio'], name='api_stock_pe_rati_a24bf9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['profit_margin'], name='api_stock_profit__d36835_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['beta'], name='api_stock_beta_4426e7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['sector', 'market_cap'], name='api_stock_sector_6114a4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['exchange', 'market_cap'], name='api_stock_exchang_4d0e26_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_user_token_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='overview',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
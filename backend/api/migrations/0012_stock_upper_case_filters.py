@@ -0,0 +1,23 @@
+from django.db import migrations
+from django.db.models.functions import Now, Upper
+
+# The list and screen filters match these exactly, in upper case
+UPPER_CASE_FIELDS = ("exchange", "country", "sector", "industry")
+
+
+def upper_case(apps, schema_editor):
+    Stock = apps.get_model("api", "Stock")
+    for name in UPPER_CASE_FIELDS:
+        # Bumping updated_at changes the ETags of the rewritten rows
+        Stock.objects.exclude(**{name: Upper(name)}).update(**{name: Upper(name)}, updated_at=Now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_stock_overview'),
+    ]
+
+    operations = [
+        migrations.RunPython(upper_case, migrations.RunPython.noop),
+    ]
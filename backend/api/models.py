@@ -12,6 +12,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     
     is_staff = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
+    # Carried in issued tokens; bumping it revokes them (see api.authentication)
+    token_version = models.PositiveIntegerField(default=0)
 
     objects = UserManager()
 
@@ -34,5 +36,70 @@ class Stock(models.Model):
     website = models.URLField(blank=True)
     beta = models.FloatField(null=True)
 
+    asset_type = models.CharField(max_length=50, blank=True)
+    currency = models.CharField(max_length=10, blank=True)
+    address = models.CharField(max_length=255, blank=True)
+
+    # Raw fundamentals from the Alpha Vantage OVERVIEW endpoint
+    market_cap = models.BigIntegerField(null=True)
+    ebitda = models.BigIntegerField(null=True)
+    pe_ratio = models.FloatField(null=True)
+    peg_ratio = models.FloatField(null=True)
+    eps = models.FloatField(null=True)
+    book_value = models.FloatField(null=True)
+    revenue_ttm = models.BigIntegerField(null=True)
+    gross_profit_ttm = models.BigIntegerField(null=True)
+    profit_margin = models.FloatField(null=True)
+    operating_margin_ttm = models.FloatField(null=True)
+    return_on_assets = models.FloatField(null=True)
+    return_on_equity = models.FloatField(null=True)
+    week_52_high = models.FloatField(null=True)
+    week_52_low = models.FloatField(null=True)
+    moving_average_50 = models.FloatField(null=True)
+    moving_average_200 = models.FloatField(null=True)
+    analyst_rating_strong_buy = models.PositiveIntegerField(null=True)
+    analyst_rating_buy = models.PositiveIntegerField(null=True)
+    analyst_rating_hold = models.PositiveIntegerField(null=True)
+    analyst_rating_sell = models.PositiveIntegerField(null=True)
+    analyst_rating_strong_sell = models.PositiveIntegerField(null=True)
+    analyst_target_price = models.FloatField(null=True)
+    # The OVERVIEW payload as fetched, so an overview served from this row
+    # matches upstream exactly. Cleared when the columns are edited directly.
+    overview = models.JSONField(null=True, blank=True)
+
+    fetched_at = models.DateTimeField(null=True)
+    # Bumped on every write, bulk upserts included; the version behind stock ETags
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Filtered list pages are walked in symbol order (keyset pagination)
+        indexes = [
+            models.Index(fields=["exchange", "symbol"]),
+            models.Index(fields=["country", "symbol"]),
+            models.Index(fields=["sector", "symbol"]),
+            models.Index(fields=["industry", "symbol"]),
+            # Screener range filters and sorts; the sector / exchange pairs
+            # serve "within a sector, by market cap" screens from one index
+            models.Index(fields=["market_cap"]),
+            models.Index(fields=["pe_ratio"]),
+            models.Index(fields=["profit_margin"]),
+            models.Index(fields=["beta"]),
+            models.Index(fields=["sector", "market_cap"]),
+            models.Index(fields=["exchange", "market_cap"]),
+        ]
+
+    def __str__(self):
+        return self.symbol
+
+class TickerPopularity(models.Model):
+    """How often each ticker was looked up; feeds the prewarm command."""
+
+    symbol = models.CharField(max_length=10, unique=True)
+    request_count = models.PositiveBigIntegerField(default=0)
+    last_requested_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["-request_count"])]
+
     def __str__(self):
-        return self.symbol
\ No newline at end of file
+        return f"{self.symbol} ({self.request_count})"
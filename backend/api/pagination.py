@@ -0,0 +1,10 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class StockCursorPagination(CursorPagination):
+    # symbol is unique, so the cursor is a pure keyset position (symbol > last seen)
+    ordering = "symbol"
+    page_size = settings.STOCKS_PAGE_SIZE
+    page_size_query_param = "limit"
+    max_page_size = settings.STOCKS_MAX_PAGE_SIZE
@@ -0,0 +1,80 @@
+import re
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson spells some floats differently from the stdlib: 0.00001 for 1e-05,
+# 1e-7 for 1e-07, and (depending on the version) 1e16 for 1e+16. Any
+# exponent goes through the stdlib. A match inside a string is harmless, it
+# only costs a re-encode.
+EXPONENT_RE = re.compile(rb"\de[+-]?\d")
+
+
+# Exact types checked before isinstance(), which keeps the scan of a large
+# list payload to a fraction of the stdlib encode it avoids
+_SCALARS = (str, int, bool, type(None))
+
+
+def _has_non_finite(data) -> bool:
+    stack = [(data,)]
+    while stack:
+        for value in stack.pop():
+            cls = value.__class__
+            if cls in _SCALARS:
+                continue
+            if isinstance(value, float):
+                # nan - nan and inf - inf are both nan
+                if value - value != 0.0:
+                    return True
+            elif isinstance(value, dict):
+                stack.append(value.values())
+            elif isinstance(value, (list, tuple)):
+                stack.append(value)
+    return False
+
+
+def _unsupported(value):
+    raise TypeError(f"{type(value).__name__} is left to the DRF encoder")
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed.
+
+    The bytes are identical to JSONRenderer's with the default compact,
+    unicode and strict settings. Anything orjson would spell differently
+    (indented output, types only the DRF encoder knows, floats with an
+    exponent, non-finite floats) goes through JSONRenderer instead, which
+    also raises for NaN and Infinity like it always has.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self._is_default_style(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=_unsupported,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if b"0.0000" in ret or EXPONENT_RE.search(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        # orjson writes NaN and Infinity as null where the strict encoder
+        # raises; only output with a null can hide one
+        if b"null" in ret and _has_non_finite(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same \u2028 / \u2029 escaping as JSONRenderer
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+    def _is_default_style(self, accepted_media_type, renderer_context) -> bool:
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        return indent is None and self.compact and not self.ensure_ascii and self.strict
@@ -1,12 +1,86 @@
+import functools
+
+from django.contrib.auth import password_validation
+from django.core.exceptions import ValidationError as DjangoValidationError
+
 from rest_framework import serializers
 from api.models import Stock, User
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+from api.authentication import TOKEN_VERSION_CLAIM
+
+# Serializer fields whose to_representation leaves database values unchanged
+NATIVE_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.FloatField,
+    serializers.BooleanField,
+)
+
+# Stored in upper case, as Alpha Vantage sends them, so the list and screen
+# filters match exactly and keep using their indexes
+UPPER_CASE_FIELDS = ("exchange", "country", "sector", "industry")
+
 
 class StockSerializer(serializers.ModelSerializer):
     class Meta:
         model = Stock
-        fields = "__all__"
+        # The raw upstream payload stays internal
+        exclude = ["overview"]
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Optional projection, e.g. StockSerializer(stocks, many=True, fields=["symbol", "name"])
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def validate(self, attrs):
+        for name in UPPER_CASE_FIELDS:
+            if attrs.get(name):
+                attrs[name] = attrs[name].upper()
+        return attrs
+
+
+@functools.lru_cache(maxsize=128)
+def _stock_row_fields(fields: tuple = None):
+    # Only serializer fields that change a value read from the database need to run
+    serializer_fields = StockSerializer(fields=fields).fields
+    converters = [
+        (name, field.to_representation)
+        for name, field in serializer_fields.items()
+        if not isinstance(field, NATIVE_FIELDS)
+    ]
+    return list(serializer_fields), converters
+
+
+def stock_rows_data(rows, fields=None) -> list:
+    """
+    Read-only fast path for ``Stock.objects.values(...)`` rows: returns the
+    same data as ``StockSerializer(stocks, many=True, fields=fields).data``
+    without building a model instance or running every field per row.
+
+    Rows may carry extra columns (e.g. the pagination key); they are dropped.
+    """
+    names, converters = _stock_row_fields(tuple(fields) if fields is not None else None)
+
+    data = []
+    for row in rows:
+        if len(row) != len(names):
+            row = {name: row[name] for name in names}
+        for name, to_representation in converters:
+            value = row[name]
+            if value is not None:
+                row[name] = to_representation(value)
+        data.append(row)
+    return data
+
+
+class StockBulkSerializer(StockSerializer):
+    class Meta(StockSerializer.Meta):
+        # Existing symbols are expected in a bulk upsert; conflicts are resolved by the INSERT
+        extra_kwargs = {"symbol": {"validators": []}}
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -31,5 +105,29 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         model = User
         fields = ["name"]
 
+
+class PasswordChangeSerializer(serializers.Serializer):
+    """Validates a password change for ``context["user"]``."""
+    old_password = serializers.CharField(write_only=True)
+    new_password = serializers.CharField(write_only=True)
+
+    def validate_old_password(self, value):
+        if not self.context["user"].check_password(value):
+            raise serializers.ValidationError("Incorrect password.")
+        return value
+
+    def validate_new_password(self, value):
+        try:
+            password_validation.validate_password(value, self.context["user"])
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(list(e.messages))
+        return value
+
 class EmailTokenObtainPairSerializer(TokenObtainPairSerializer):
-    username_field = "email"
\ No newline at end of file
+    username_field = "email"
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
\ No newline at end of file
@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from api.services import latency, quota, singleflight
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+class UpstreamError(Exception):
+    pass
+
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=settings.UPSTREAM_MAX_RETRIES,
+        backoff_factor=settings.UPSTREAM_RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.UPSTREAM_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def get_async_client() -> httpx.AsyncClient:
+    # httpx connection pools belong to the event loop that opened them
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.UPSTREAM_READ_TIMEOUT,
+                connect=settings.UPSTREAM_CONNECT_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.UPSTREAM_POOL_MAXSIZE,
+                max_keepalive_connections=settings.UPSTREAM_POOL_MAXSIZE,
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def query(function: str, **params) -> dict:
+    # Identical concurrent queries share one upstream round trip
+    key = singleflight.make_key("alphavantage", function, params)
+    return singleflight.do(key, lambda: _query(function, params))
+
+
+def _query(function: str, params: dict) -> dict:
+    params = {"function": function, **params, "apikey": settings.AV_KEY}
+    timeout = (settings.UPSTREAM_CONNECT_TIMEOUT, settings.UPSTREAM_READ_TIMEOUT)
+
+    quota.scheduler.acquire(quota.current_priority())
+
+    start = time.perf_counter()
+    try:
+        r = get_session().get(settings.ALPHAVANTAGE_URL, params=params, timeout=timeout)
+        r.raise_for_status()
+        data = r.json()
+    except (requests.RequestException, ValueError) as e:
+        raise UpstreamError(f"Alpha Vantage {function} failed: {e}") from e
+    finally:
+        latency.record("alphavantage", function, time.perf_counter() - start)
+
+    quota.check_throttle(data)
+    _check_notice(function, data)
+    return data
+
+
+def _check_notice(function: str, data: dict) -> None:
+    # Invalid keys and premium-only requests also come back as a lone notice
+    message = quota.notice(data)
+    if message:
+        raise UpstreamError(f"Alpha Vantage {function} refused: {message}")
+
+
+async def aquery(function: str, **params) -> dict:
+    key = singleflight.make_key("alphavantage", function, params)
+    return await singleflight.ado(key, lambda: _aquery(function, params))
+
+
+async def _aquery(function: str, params: dict) -> dict:
+    params = {"function": function, **params, "apikey": settings.AV_KEY}
+
+    await quota.scheduler.aacquire(quota.current_priority())
+
+    start = time.perf_counter()
+    try:
+        data = await _aget_with_retries(params)
+    except (httpx.HTTPError, ValueError) as e:
+        raise UpstreamError(f"Alpha Vantage {function} failed: {e}") from e
+    finally:
+        latency.record("alphavantage", function, time.perf_counter() - start)
+
+    await quota.acheck_throttle(data)
+    _check_notice(function, data)
+    return data
+
+
+async def _aget_with_retries(params: dict) -> dict:
+    # Mirrors the urllib3 Retry policy of the sync session
+    max_retries = settings.UPSTREAM_MAX_RETRIES
+    for attempt in range(max_retries + 1):
+        try:
+            r = await get_async_client().get(settings.ALPHAVANTAGE_URL, params=params)
+            if r.status_code not in RETRY_STATUSES or attempt == max_retries:
+                r.raise_for_status()
+                return r.json()
+        except httpx.TransportError:
+            if attempt == max_retries:
+                raise
+        await asyncio.sleep(settings.UPSTREAM_RETRY_BACKOFF * 2 ** attempt)
+
+
+def get_overview(symbol: str) -> dict:
+    return query("OVERVIEW", symbol=symbol)
+
+
+async def aget_overview(symbol: str) -> dict:
+    return await aquery("OVERVIEW", symbol=symbol)
+
+
+async def asymbol_search(keywords: str) -> dict:
+    return await aquery("SYMBOL_SEARCH", keywords=keywords)
+
+
+def get_daily_series(symbol: str, outputsize: str = "compact") -> dict:
+    return query("TIME_SERIES_DAILY", symbol=symbol, outputsize=outputsize)
+
+
+async def aget_daily_series(symbol: str, outputsize: str = "compact") -> dict:
+    return await aquery("TIME_SERIES_DAILY", symbol=symbol, outputsize=outputsize)
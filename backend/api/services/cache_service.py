@@ -0,0 +1,156 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from api.services import metrics, quota
+
+logger = logging.getLogger(__name__)
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def record_lookup(data_type: str, outcome: str) -> None:
+    with _stats_lock:
+        counters = _stats.setdefault(data_type, {"hit": 0, "miss": 0, "stale": 0})
+        counters[outcome] += 1
+    metrics.record_cache(outcome)
+
+
+def get_cache_stats() -> dict:
+    with _stats_lock:
+        snapshot = {data_type: dict(counters) for data_type, counters in _stats.items()}
+
+    for counters in snapshot.values():
+        total = counters["hit"] + counters["miss"] + counters["stale"]
+        served = counters["hit"] + counters["stale"]
+        counters["hit_ratio"] = round(served / total, 4) if total else None
+
+    return snapshot
+
+
+def _cache_key(data_type: str, ident: str) -> str:
+    return f"{data_type}:{ident}"
+
+
+def _ttl(data_type: str) -> int:
+    return settings.CACHE_TTLS.get(data_type, settings.CACHE_DEFAULT_TTL)
+
+
+# READ
+def get_entry(data_type: str, ident: str):
+    """Return the raw ``{"data", "fetched_at"}`` entry, fresh or stale, without fetching."""
+    return cache.get(_cache_key(data_type, ident))
+
+
+async def aget_entry(data_type: str, ident: str):
+    return await cache.aget(_cache_key(data_type, ident))
+
+
+async def aget_or_fetch(data_type: str, ident: str, afetch, refresh, is_valid=bool):
+    """
+    Serve ``data_type``/``ident`` from the cache, awaiting ``afetch()`` on a miss.
+
+    Entries older than the type's TTL are still returned while a single
+    background refresh runs; they are dropped entirely after the stale window.
+    The refresh calls the synchronous ``refresh`` in a background thread,
+    which outlives the request's event loop. Results rejected by ``is_valid``
+    are returned but never cached.
+    """
+    key = _cache_key(data_type, ident)
+    entry = await cache.aget(key)
+
+    if entry is not None:
+        if time.time() - entry["fetched_at"] < _ttl(data_type):
+            record_lookup(data_type, "hit")
+        else:
+            record_lookup(data_type, "stale")
+            await _arefresh_in_background(data_type, ident, refresh, is_valid)
+        return entry["data"]
+
+    record_lookup(data_type, "miss")
+    data = await afetch()
+    if is_valid(data):
+        await aset_entry(data_type, ident, data)
+    return data
+
+
+async def aget_many(data_type: str, idents, refresh, is_valid=bool) -> dict:
+    """
+    Look up several entries in one cache round trip, returning only the ones
+    found. ``refresh(ident)`` is used for background refreshes of stale entries.
+    """
+    keys = {_cache_key(data_type, ident): ident for ident in idents}
+    entries = await cache.aget_many(keys)
+
+    found = {}
+    for key, ident in keys.items():
+        entry = entries.get(key)
+        if entry is None:
+            record_lookup(data_type, "miss")
+            continue
+        if time.time() - entry["fetched_at"] < _ttl(data_type):
+            record_lookup(data_type, "hit")
+        else:
+            record_lookup(data_type, "stale")
+            await _arefresh_in_background(data_type, ident, lambda ident=ident: refresh(ident), is_valid)
+        found[ident] = entry["data"]
+    return found
+
+
+# WRITE
+def _entry(data) -> dict:
+    return {"data": data, "fetched_at": time.time()}
+
+
+def _timeout(data_type: str) -> int:
+    return _ttl(data_type) + settings.CACHE_STALE_TTL
+
+
+def set_entry(data_type: str, ident: str, data) -> None:
+    cache.set(_cache_key(data_type, ident), _entry(data), timeout=_timeout(data_type))
+
+
+async def aset_entry(data_type: str, ident: str, data) -> None:
+    await cache.aset(_cache_key(data_type, ident), _entry(data), timeout=_timeout(data_type))
+
+
+async def aset_many(data_type: str, items: dict) -> None:
+    entries = {_cache_key(data_type, ident): _entry(data) for ident, data in items.items()}
+    await cache.aset_many(entries, timeout=_timeout(data_type))
+
+
+def invalidate(data_type: str, ident: str) -> None:
+    cache.delete(_cache_key(data_type, ident))
+
+
+def invalidate_many(data_type: str, idents) -> None:
+    cache.delete_many([_cache_key(data_type, ident) for ident in idents])
+
+
+async def _arefresh_in_background(data_type: str, ident: str, fetch, is_valid) -> None:
+    # add is atomic, so only one worker wins the refresh for a key
+    lock_key = f"{_cache_key(data_type, ident)}:refreshing"
+    if not await cache.aadd(lock_key, True, timeout=settings.CACHE_REFRESH_LOCK_TIMEOUT):
+        return
+
+    def refresh():
+        try:
+            with quota.background():
+                data = fetch()
+            if is_valid(data):
+                set_entry(data_type, ident, data)
+        except quota.QuotaExceeded:
+            logger.info("Skipped background refresh for %s:%s, quota exhausted", data_type, ident)
+        except Exception:
+            logger.exception("Background refresh failed for %s:%s", data_type, ident)
+        finally:
+            cache.delete(lock_key)
+            # The thread's own connection would otherwise linger until exit
+            connection.close()
+
+    threading.Thread(target=refresh, daemon=True).start()
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import time
+import weakref
+
+from django.conf import settings
+from google import genai
+from google.genai import types
+
+from api.services import latency, metrics, singleflight
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def _build_client() -> genai.Client:
+    http_options = types.HttpOptions(
+        timeout=int(settings.GEMINI_TIMEOUT * 1000),
+        retry_options=types.HttpRetryOptions(
+            attempts=settings.UPSTREAM_MAX_RETRIES + 1,
+            initial_delay=settings.UPSTREAM_RETRY_BACKOFF,
+        ),
+        # Unset outside local stand-ins (benchmarks/upstream.py)
+        base_url=settings.GEMINI_BASE_URL,
+    )
+    return genai.Client(api_key=settings.GEMINI_KEY, http_options=http_options)
+
+
+def get_async_client():
+    # One client per event loop so its async connection pool is reused
+    # without being shared across loops
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = _build_client()
+    return client.aio
+
+
+def _record_usage(usage) -> None:
+    if usage is not None:
+        metrics.record_tokens("gemini", usage.prompt_token_count, usage.candidates_token_count)
+
+
+def _contents(prompt: str) -> list:
+    return [types.Content(role="user", parts=[types.Part(text=prompt)])]
+
+
+async def agenerate_content(contents, model: str = None, config: types.GenerateContentConfig = None):
+    model = model or settings.GEMINI_MODEL
+
+    start = time.perf_counter()
+    try:
+        response = await get_async_client().models.generate_content(model=model, contents=contents, config=config)
+    finally:
+        latency.record("gemini", "generate_content", time.perf_counter() - start)
+    _record_usage(response.usage_metadata)
+    return response
+
+
+async def agenerate_text(prompt: str, model: str = None) -> str:
+    model = model or settings.GEMINI_MODEL
+
+    async def generate():
+        response = await agenerate_content(_contents(prompt), model=model)
+        return response.text
+
+    # Concurrent requests for the same prompt share one generation
+    key = singleflight.make_key("gemini", "generate_content", {"model": model, "prompt": prompt})
+    return await singleflight.ado(key, generate)
+
+
+async def agenerate_json(prompt: str, schema: dict, model: str = None):
+    """
+    Generate a response constrained to the JSON ``schema`` and return it
+    parsed. Raises ``ValueError`` if the model still answers with invalid JSON.
+    """
+    model = model or settings.GEMINI_MODEL
+    config = types.GenerateContentConfig(response_mime_type="application/json", response_json_schema=schema)
+
+    async def generate():
+        response = await agenerate_content(_contents(prompt), model=model, config=config)
+        return json.loads(response.text or "")
+
+    key = singleflight.make_key("gemini", "generate_json", {"model": model, "prompt": prompt, "schema": schema})
+    return await singleflight.ado(key, generate)
+
+
+async def astream_text(prompt: str, model: str = None):
+    """
+    Yield the summary text chunk by chunk as Gemini generates it.
+
+    Closing this generator closes the upstream stream too, which is how a
+    client disconnect stops the generation.
+    """
+    model = model or settings.GEMINI_MODEL
+
+    start = time.perf_counter()
+    stream = await get_async_client().models.generate_content_stream(
+        model=model,
+        contents=_contents(prompt),
+    )
+    first_chunk = True
+    # Every chunk carries the running totals; the last one seen is the final count
+    usage = None
+    try:
+        async for chunk in stream:
+            if first_chunk:
+                latency.record("gemini", "first_chunk", time.perf_counter() - start)
+                first_chunk = False
+            usage = chunk.usage_metadata or usage
+            if chunk.text:
+                yield chunk.text
+    finally:
+        await stream.aclose()
+        latency.record("gemini", "generate_content_stream", time.perf_counter() - start)
+        _record_usage(usage)
@@ -0,0 +1,255 @@
+"""
+Technical indicators over stored daily closes, computed with whole-array
+NumPy operations.
+
+Every function takes a 2-D float array with one ticker per row. Histories
+of different lengths are right-aligned and padded with NaN at the front, so
+a single call covers a whole batch of tickers. Bars without enough history
+for an indicator come out as NaN.
+"""
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from api.services import price_history
+
+TRADING_DAYS = 252
+
+
+# PRIMITIVES
+def _rolling_sum(x: np.ndarray, period: int):
+    """Rolling sum and count of non-NaN values over ``period`` bars."""
+    valid = ~np.isnan(x)
+    csum = np.cumsum(np.where(valid, x, 0.0), axis=1)
+    ccount = np.cumsum(valid, axis=1)
+    total = csum.copy()
+    count = ccount.copy()
+    total[:, period:] -= csum[:, :-period]
+    count[:, period:] -= ccount[:, :-period]
+    return total, count
+
+
+def _recurrence(x: np.ndarray, w: float) -> np.ndarray:
+    """
+    ``y[t] = w * y[t-1] + x[t]`` along each row, starting from zero.
+
+    Solved in closed form per block (``w**t * cumsum(x / w**t)``), so the
+    Python loop runs once per block of bars, not per bar. Blocks are sized
+    so ``w**-t`` stays far from overflowing.
+    """
+    if w == 0:
+        return x.copy()
+    block = max(1, int(30 / -np.log(w)))
+    out = np.empty_like(x)
+    carry = np.zeros(x.shape[0])
+    for start in range(0, x.shape[1], block):
+        chunk = x[:, start:start + block]
+        powers = w ** np.arange(chunk.shape[1])
+        out[:, start:start + block] = powers * (w * carry[:, None] + np.cumsum(chunk / powers, axis=1))
+        carry = out[:, start + chunk.shape[1] - 1]
+    return out
+
+
+def _first_valid(x: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(x)
+    return np.where(valid.any(axis=1), valid.argmax(axis=1), x.shape[1])
+
+
+def _smooth(x: np.ndarray, alpha: float, period: int) -> np.ndarray:
+    """
+    Exponential smoothing seeded with the simple average of the first
+    ``period`` values, the usual convention for EMA and Wilder averages.
+    """
+    rows, bars = x.shape
+    seed_at = _first_valid(x) + period - 1
+    has_seed = seed_at < bars
+    index = np.arange(bars)
+
+    total, count = _rolling_sum(x, period)
+    seeds = np.full(rows, np.nan)
+    seeds[has_seed] = total[has_seed, seed_at[has_seed]] / period
+
+    # Zero before the seed and the seed itself at it turns the seeded
+    # recursion into a plain one that starts from zero for every row at once:
+    # y[seed] = seed, then y[t] = (1 - alpha) * y[t-1] + alpha * x[t]
+    inputs = np.where(index > seed_at[:, None], alpha * np.nan_to_num(x), 0.0)
+    inputs[has_seed, seed_at[has_seed]] = seeds[has_seed]
+    out = _recurrence(inputs, 1 - alpha)
+    out[index < seed_at[:, None]] = np.nan
+    return out
+
+
+def _rolling_std(x: np.ndarray, period: int) -> np.ndarray:
+    # Centring each row first keeps the sum-of-squares formula accurate
+    shifted = x - np.nanmean(x, axis=1, keepdims=True)
+    total, count = _rolling_sum(shifted, period)
+    squares, _ = _rolling_sum(shifted ** 2, period)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        variance = np.maximum(squares / count - mean ** 2, 0.0)
+    return np.where(count == period, np.sqrt(variance), np.nan)
+
+
+# INDICATORS
+def sma(close: np.ndarray, period: int = 20) -> dict:
+    total, count = _rolling_sum(close, period)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {"value": np.where(count == period, total / period, np.nan)}
+
+
+def ema(close: np.ndarray, period: int = 20) -> dict:
+    return {"value": _smooth(close, 2 / (period + 1), period)}
+
+
+def rsi(close: np.ndarray, period: int = 14) -> dict:
+    change = np.diff(close, axis=1, prepend=np.nan)
+    gain = _smooth(np.where(np.isnan(change), np.nan, np.maximum(change, 0.0)), 1 / period, period)
+    loss = _smooth(np.where(np.isnan(change), np.nan, np.maximum(-change, 0.0)), 1 / period, period)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        value = 100 - 100 / (1 + gain / loss)
+    return {"value": np.where(loss == 0, 100.0, value)}
+
+
+def macd(close: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9) -> dict:
+    line = ema(close, fast)["value"] - ema(close, slow)["value"]
+    signal_line = _smooth(line, 2 / (signal + 1), signal)
+    return {"macd": line, "signal": signal_line, "histogram": line - signal_line}
+
+
+def bollinger(close: np.ndarray, period: int = 20, width: float = 2.0) -> dict:
+    middle = sma(close, period)["value"]
+    band = width * _rolling_std(close, period)
+    return {"middle": middle, "upper": middle + band, "lower": middle - band}
+
+
+def volatility(close: np.ndarray, period: int = 20) -> dict:
+    """Annualised rolling standard deviation of daily log returns."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = np.diff(np.log(close), axis=1, prepend=np.nan)
+    return {"value": _rolling_std(returns, period) * np.sqrt(TRADING_DAYS)}
+
+
+def drawdown(close: np.ndarray) -> dict:
+    """Fall from the running peak, as a negative fraction."""
+    peak = np.fmax.accumulate(close, axis=1)
+    return {"value": close / peak - 1}
+
+
+# name -> (function, parameter types with defaults)
+INDICATORS = {
+    "sma": (sma, [("period", int, 20)]),
+    "ema": (ema, [("period", int, 20)]),
+    "rsi": (rsi, [("period", int, 14)]),
+    "macd": (macd, [("fast", int, 12), ("slow", int, 26), ("signal", int, 9)]),
+    "bollinger": (bollinger, [("period", int, 20), ("width", float, 2.0)]),
+    "volatility": (volatility, [("period", int, 20)]),
+    "drawdown": (drawdown, []),
+}
+
+MAX_PERIOD = 1000
+
+
+def parse_spec(spec: str) -> tuple:
+    """``"macd:12:26:9"`` -> ``("macd", (12, 26, 9))``, defaults filled in."""
+    name, *args = spec.strip().lower().split(":")
+    if name not in INDICATORS:
+        raise ValueError(f"Unknown indicator: {name}")
+    params = INDICATORS[name][1]
+    if len(args) > len(params):
+        raise ValueError(f"{name} takes at most {len(params)} parameters")
+
+    values = []
+    for (param, cast, default), arg in zip(params, args + [None] * len(params)):
+        value = default if arg in (None, "") else cast(arg)
+        if not 0 < value <= MAX_PERIOD:
+            raise ValueError(f"{name} {param} out of range: {value}")
+        values.append(value)
+    return name, tuple(values)
+
+
+def spec_label(name: str, params: tuple) -> str:
+    return ":".join([name, *map(str, params)])
+
+
+# BATCH
+def _stack(closes: list) -> np.ndarray:
+    """Right-align histories of different lengths into one NaN-padded matrix."""
+    width = max((len(close) for close in closes), default=0)
+    matrix = np.full((len(closes), width), np.nan)
+    for row, close in enumerate(closes):
+        if len(close):
+            matrix[row, width - len(close):] = close
+    return matrix
+
+
+def _cache_key(ticker: str, label: str, dates, close) -> str:
+    # The last bar's close is part of the key because that bar is rewritten
+    # until its session closes
+    return f"indicator:{ticker}:{label}:{dates[-1]}:{float(close[-1])!r}"
+
+
+def parse_specs(value: str) -> list:
+    """``"sma:50,rsi"`` -> ``[("sma", (50,)), ("rsi", (14,))]``, duplicates dropped."""
+    specs = [parse_spec(part) for part in value.split(",") if part.strip()]
+    return list(dict.fromkeys(specs))
+
+
+def compute_many(tickers: list, specs: list) -> dict:
+    """
+    Full-history indicator series for every ticker, computed as one matrix
+    per indicator over all tickers that miss the cache.
+
+    Returns ``{ticker: {"date": dates, label: {output: series}}}``.
+    """
+    histories = {
+        ticker: price_history.read_range(ticker, columns=["close"])
+        for ticker in tickers
+    }
+    histories = {ticker: bars for ticker, bars in histories.items() if len(bars["date"])}
+
+    results = {ticker: {"date": bars["date"]} for ticker, bars in histories.items()}
+    for name, params in specs:
+        label = spec_label(name, params)
+        keys = {
+            ticker: _cache_key(ticker, label, bars["date"], bars["close"])
+            for ticker, bars in histories.items()
+        }
+        cached = cache.get_many(keys.values())
+
+        missing = [ticker for ticker, key in keys.items() if key not in cached]
+        computed = {}
+        if missing:
+            function = INDICATORS[name][0]
+            matrix = _stack([histories[ticker]["close"] for ticker in missing])
+            outputs = function(matrix, *params)
+            for row, ticker in enumerate(missing):
+                length = len(histories[ticker]["close"])
+                computed[keys[ticker]] = {
+                    output: series[row, matrix.shape[1] - length:].copy()
+                    for output, series in outputs.items()
+                }
+            cache.set_many(computed, timeout=settings.INDICATOR_CACHE_TTL)
+
+        for ticker, key in keys.items():
+            results[ticker][label] = cached[key] if key in cached else computed[key]
+    return results
+
+
+def as_lists(result: dict, start=None, end=None) -> dict:
+    """
+    JSON-ready slice of one ticker's ``compute_many`` result for
+    ``start <= date <= end``, with NaN as ``None``.
+    """
+    dates = result["date"]
+    lo = 0 if start is None else int(np.searchsorted(dates, np.datetime64(start, "D"), side="left"))
+    hi = len(dates) if end is None else int(np.searchsorted(dates, np.datetime64(end, "D"), side="right"))
+
+    data = {"date": np.datetime_as_string(dates[lo:hi]).tolist()}
+    for label, outputs in result.items():
+        if label == "date":
+            continue
+        data[label] = {
+            output: np.where(np.isnan(series[lo:hi]), None, series[lo:hi]).tolist()
+            for output, series in outputs.items()
+        }
+    return data
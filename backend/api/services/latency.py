@@ -0,0 +1,37 @@
+import logging
+import threading
+
+from api.services import metrics
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_stats = {}
+
+
+def record(provider: str, operation: str, seconds: float) -> None:
+    logger.debug("%s %s took %.1fms", provider, operation, seconds * 1000)
+    metrics.record_upstream(provider, seconds)
+
+    with _lock:
+        stats = _stats.setdefault(
+            (provider, operation),
+            {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0},
+        )
+        stats["count"] += 1
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+
+def get_latency_stats() -> dict:
+    with _lock:
+        snapshot = {key: dict(stats) for key, stats in _stats.items()}
+
+    result = {}
+    for (provider, operation), stats in snapshot.items():
+        result.setdefault(provider, {})[operation] = {
+            "count": stats["count"],
+            "avg_ms": round(stats["total_seconds"] / stats["count"] * 1000, 1),
+            "max_ms": round(stats["max_seconds"] * 1000, 1),
+        }
+    return result
@@ -0,0 +1,238 @@
+"""
+Per-request instrumentation, exported in the Prometheus text format.
+
+``MetricsMiddleware`` opens a ``RequestMetrics`` for each request in a
+context variable. Upstream calls (through ``latency.record``), model token
+counts (through ``gemini``), cache lookups (through
+``cache_service.record_lookup``) and database queries (through a
+connection execute wrapper) add to it wherever they run during the request, including ``sync_to_async`` threads, which copy the context.
+Work in background threads is not attributed to any request.
+
+Metrics live in process memory, so each worker exports its own; the
+scraper sums them.
+"""
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+# Seconds; spans a cache hit to a slow Gemini summary
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.start = time.perf_counter()
+        # Requests that fan out to threads record from several at once
+        self.lock = threading.Lock()
+        self.upstream = []
+        # (provider, prompt tokens, output tokens) per model call
+        self.model_calls = []
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.cache = Counter()
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            upstream = Counter(provider for provider, _ in self.upstream)
+            return {
+                "upstream_calls": dict(upstream),
+                "prompt_tokens": sum(prompt for _, prompt, _ in self.model_calls),
+                "output_tokens": sum(output for _, _, output in self.model_calls),
+                "db_queries": self.db_queries,
+                "db_ms": round(self.db_seconds * 1000, 1),
+                "cache": dict(self.cache),
+            }
+
+
+# METRIC TYPES
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class CounterMetric:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.lock = threading.Lock()
+        self.values = Counter()
+
+    def inc(self, labels: tuple, amount: float = 1) -> None:
+        with self.lock:
+            self.values[labels] += amount
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value:g}"
+
+
+class HistogramMetric:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple, buckets: tuple):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        # labels -> (count per bucket, non-cumulative with +Inf last, sum)
+        self.values = {}
+
+    def observe(self, labels: tuple, value: float) -> None:
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self.lock:
+            counts, total = self.values.get(labels) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self.values[labels] = (counts, total + value)
+
+    def samples(self):
+        with self.lock:
+            values = {labels: (list(counts), total) for labels, (counts, total) in self.values.items()}
+        for labels, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else f"{bound:g}"
+                yield f"{self.name}_bucket{_labels((*self.labelnames, 'le'), (*labels, le))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {total:g}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+REQUESTS = CounterMetric(
+    "http_requests_total", "Requests by view, method and status.", ("view", "method", "status"))
+REQUEST_SECONDS = HistogramMetric(
+    "http_request_duration_seconds", "Time until the response body was sent.", ("view",), LATENCY_BUCKETS)
+RESPONSE_BYTES = HistogramMetric(
+    "http_response_size_bytes", "Response body size.", ("view",), SIZE_BUCKETS)
+UPSTREAM_SECONDS = HistogramMetric(
+    "upstream_call_duration_seconds", "Upstream API calls made while serving a view.",
+    ("view", "provider"), LATENCY_BUCKETS)
+PROMPT_TOKENS = HistogramMetric(
+    "model_prompt_tokens", "Prompt tokens per model call, as reported by the provider.",
+    ("view", "provider"), TOKEN_BUCKETS)
+MODEL_TOKENS = CounterMetric(
+    "model_tokens_total", "Model tokens by kind (prompt, output).", ("view", "provider", "kind"))
+DB_QUERIES = HistogramMetric(
+    "db_queries_per_request", "Database queries per request.", ("view",), QUERY_COUNT_BUCKETS)
+DB_SECONDS = CounterMetric(
+    "db_query_seconds_total", "Time spent in database queries.", ("view",))
+CACHE_LOOKUPS = CounterMetric(
+    "cache_lookups_total", "Cache lookups by outcome (hit, miss, stale).", ("view", "outcome"))
+
+REGISTRY = (
+    REQUESTS, REQUEST_SECONDS, RESPONSE_BYTES, UPSTREAM_SECONDS, PROMPT_TOKENS, MODEL_TOKENS,
+    DB_QUERIES, DB_SECONDS, CACHE_LOOKUPS,
+)
+
+
+# RECORD
+def start_request() -> RequestMetrics:
+    current = RequestMetrics()
+    _current.set(current)
+    return current
+
+
+def record_upstream(provider: str, seconds: float) -> None:
+    current = _current.get()
+    if current is not None:
+        with current.lock:
+            current.upstream.append((provider, seconds))
+
+
+def record_tokens(provider: str, prompt: int, output: int) -> None:
+    current = _current.get()
+    if current is not None:
+        with current.lock:
+            current.model_calls.append((provider, prompt or 0, output or 0))
+
+
+def record_cache(outcome: str) -> None:
+    current = _current.get()
+    if current is not None:
+        with current.lock:
+            current.cache[outcome] += 1
+
+
+def query_timer(execute, sql, params, many, context):
+    """Connection execute wrapper counting the queries of the current request."""
+    current = _current.get()
+    if current is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        with current.lock:
+            current.db_queries += 1
+            current.db_seconds += elapsed
+
+
+def install_query_timer(sender, connection, **kwargs) -> None:
+    # connection_created fires again when a connection object reconnects
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+
+def finish_request(current: RequestMetrics, view: str, method: str, status: int, size: int) -> None:
+    elapsed = time.perf_counter() - current.start
+    REQUESTS.inc((view, method, str(status)))
+    REQUEST_SECONDS.observe((view,), elapsed)
+    RESPONSE_BYTES.observe((view,), size)
+
+    with current.lock:
+        upstream = list(current.upstream)
+        model_calls = list(current.model_calls)
+        queries, db_seconds = current.db_queries, current.db_seconds
+        cache = dict(current.cache)
+    for provider, seconds in upstream:
+        UPSTREAM_SECONDS.observe((view, provider), seconds)
+    for provider, prompt, output in model_calls:
+        PROMPT_TOKENS.observe((view, provider), prompt)
+        MODEL_TOKENS.inc((view, provider, "prompt"), prompt)
+        MODEL_TOKENS.inc((view, provider, "output"), output)
+    DB_QUERIES.observe((view,), queries)
+    if db_seconds:
+        DB_SECONDS.inc((view,), db_seconds)
+    for outcome, count in cache.items():
+        CACHE_LOOKUPS.inc((view, outcome), count)
+
+
+# EXPORT
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+# LOGGING
+def log_sample(logger: logging.Logger, event: str, **fields) -> None:
+    """
+    Log ``event`` as one JSON line for a ``LOG_SAMPLE_RATE`` fraction of
+    calls, with the current request's upstream, DB and cache counts attached.
+    """
+    if random.random() >= settings.LOG_SAMPLE_RATE:
+        return
+    current = _current.get()
+    if current is not None:
+        fields.update(current.snapshot())
+    logger.info(json.dumps({"event": event, **fields}, default=str))
@@ -0,0 +1,135 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+
+from api.services import alphavantage, cache_service, quota
+from api.services.stock_service import (
+    aget_fetched_at,
+    aget_overview_from_db,
+    aget_stocks_fetched,
+    aupsert_from_overview,
+    get_overview_from_db,
+    overview_from_stock,
+    overview_if_fresh,
+    upsert_from_overview,
+)
+
+
+def is_valid_overview(data) -> bool:
+    # Unknown tickers come back as {} and throttled calls as {"Note": ...}
+    return bool(data and data.get("Symbol"))
+
+
+def _max_age() -> timedelta:
+    return timedelta(seconds=settings.STOCK_FRESHNESS_SECONDS)
+
+
+def load_overview(ticker: str) -> dict:
+    """
+    Read OVERVIEW data for ``ticker`` from the Stock table when its row is fresh
+    enough, otherwise fetch it upstream and write it through to the table.
+    """
+    data = get_overview_from_db(ticker, max_age=_max_age())
+    if data is not None:
+        return data
+
+    data = alphavantage.get_overview(ticker)
+    if is_valid_overview(data):
+        upsert_from_overview(data)
+    return data
+
+
+async def aload_overview(ticker: str) -> dict:
+    data = await aget_overview_from_db(ticker, max_age=_max_age())
+    if data is not None:
+        return data
+
+    data = await alphavantage.aget_overview(ticker)
+    if is_valid_overview(data):
+        await aupsert_from_overview(data)
+    return data
+
+
+async def aget_overview(ticker: str) -> dict:
+    ticker = ticker.upper().strip()
+    try:
+        return await cache_service.aget_or_fetch(
+            "overview",
+            ticker,
+            lambda: aload_overview(ticker),
+            # Stale entries are refreshed from a background thread
+            lambda: load_overview(ticker),
+            is_valid=is_valid_overview,
+        )
+    except quota.QuotaExceeded:
+        # Out of quota: an outdated row beats no answer at all. It is not
+        # cached, so the next request retries upstream once quota is back.
+        data = await aget_overview_from_db(ticker)
+        if data is None:
+            raise
+        return data
+
+
+async def aget_overview_modified(ticker: str):
+    """
+    When the OVERVIEW data served for ``ticker`` was fetched upstream: the
+    cache entry's time, or the stored row's when it was served from the table.
+    """
+    ticker = ticker.upper().strip()
+    entry = await cache_service.aget_entry("overview", ticker)
+    if entry is not None:
+        return datetime.fromtimestamp(entry["fetched_at"], tz=timezone.utc)
+    return await aget_fetched_at(ticker)
+
+
+async def aget_overviews(tickers) -> dict:
+    """
+    Resolve OVERVIEW data for many tickers: one cache round trip, then one
+    database query, then concurrent upstream fetches for whatever is left.
+
+    Returns ``{ticker: data}`` where ``data`` is an exception when that
+    ticker could not be resolved.
+    """
+    tickers = [ticker.upper().strip() for ticker in tickers]
+    results = await cache_service.aget_many(
+        "overview",
+        tickers,
+        load_overview,
+        is_valid=is_valid_overview,
+    )
+
+    missing = [ticker for ticker in tickers if ticker not in results]
+    if not missing:
+        return results
+
+    stocks = await aget_stocks_fetched(missing)
+    from_db = {}
+    for symbol, stock in stocks.items():
+        data = overview_if_fresh(stock, _max_age())
+        if data is not None:
+            from_db[symbol] = data
+    if from_db:
+        await cache_service.aset_many("overview", from_db)
+        results.update(from_db)
+
+    semaphore = asyncio.Semaphore(settings.STOCK_BATCH_CONCURRENCY)
+
+    async def fetch(ticker):
+        async with semaphore:
+            try:
+                data = await alphavantage.aget_overview(ticker)
+            except quota.QuotaExceeded:
+                if ticker not in stocks:
+                    raise
+                return overview_from_stock(stocks[ticker])
+
+        if is_valid_overview(data):
+            await aupsert_from_overview(data)
+            await cache_service.aset_entry("overview", ticker, data)
+        return data
+
+    upstream = [ticker for ticker in missing if ticker not in results]
+    fetched = await asyncio.gather(*(fetch(ticker) for ticker in upstream), return_exceptions=True)
+    results.update(zip(upstream, fetched))
+    return results
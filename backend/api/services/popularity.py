@@ -0,0 +1,67 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api.models import TickerPopularity
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending = Counter()
+_last_flush = time.monotonic()
+
+
+# WRITE
+def record(ticker: str) -> None:
+    """Count one lookup of ``ticker``; counts reach the database in batches."""
+    global _last_flush
+
+    with _lock:
+        _pending[ticker.upper()] += 1
+        now = time.monotonic()
+        if now - _last_flush < settings.POPULARITY_FLUSH_INTERVAL:
+            return
+        counts = dict(_pending)
+        _pending.clear()
+        _last_flush = now
+
+    # Keeps the write off the request path
+    threading.Thread(target=_flush, args=(counts,), daemon=True).start()
+
+
+def _flush(counts: dict) -> None:
+    now = timezone.now()
+    try:
+        for symbol, count in counts.items():
+            _add(symbol, count, now)
+    except Exception:
+        logger.exception("Failed to write ticker request counts")
+    finally:
+        # The thread's own connection would otherwise linger until exit
+        connection.close()
+
+
+def _add(symbol: str, count: int, now) -> None:
+    rows = TickerPopularity.objects.filter(symbol=symbol)
+    if rows.update(request_count=F("request_count") + count, last_requested_at=now):
+        return
+    try:
+        with transaction.atomic():
+            TickerPopularity.objects.create(symbol=symbol, request_count=count, last_requested_at=now)
+    except IntegrityError:
+        # Another worker created the row first
+        rows.update(request_count=F("request_count") + count, last_requested_at=now)
+
+
+# READ
+def most_requested(limit: int) -> list:
+    return list(
+        TickerPopularity.objects.order_by("-request_count", "symbol")
+        .values_list("symbol", flat=True)[:limit]
+    )
@@ -0,0 +1,259 @@
+"""
+Daily OHLCV history, stored per ticker as one raw NumPy column file each.
+
+    PRICE_HISTORY_DIR/IBM/date.bin    datetime64[D], ascending
+    PRICE_HISTORY_DIR/IBM/close.bin   float64
+    ...
+
+Files are read through ``np.memmap``, so a date-range read only touches the
+pages it slices. New bars are appended to the end of each file. The row
+count is the shortest column, so a write cut off halfway is never read and
+is truncated by the next append.
+"""
+import fcntl
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from api.services import alphavantage, quota
+
+COLUMNS = {
+    "date": np.dtype("<M8[D]"),
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<i8"),
+}
+
+# TIME_SERIES_DAILY bar key -> column
+SERIES_KEYS = {
+    "1. open": "open",
+    "2. high": "high",
+    "3. low": "low",
+    "4. close": "close",
+    "5. volume": "volume",
+}
+
+SERIES_FIELD = "Time Series (Daily)"
+
+# The compact output holds the latest 100 trading days
+COMPACT_MAX_GAP_DAYS = 140
+
+TICKER_RE = re.compile(r"[A-Z0-9][A-Z0-9.\-]{0,9}")
+
+
+class InvalidTicker(ValueError):
+    pass
+
+
+class UnknownTicker(Exception):
+    pass
+
+
+def _ticker_dir(ticker: str) -> Path:
+    # The ticker becomes a directory name, so nothing path-like gets through
+    if not TICKER_RE.fullmatch(ticker):
+        raise InvalidTicker(f"Invalid ticker: {ticker!r}")
+    return Path(settings.PRICE_HISTORY_DIR) / ticker
+
+
+def _column_path(directory: Path, column: str) -> Path:
+    return directory / f"{column}.bin"
+
+
+def _rows(directory: Path) -> int:
+    lengths = []
+    for column, dtype in COLUMNS.items():
+        path = _column_path(directory, column)
+        lengths.append(path.stat().st_size // dtype.itemsize if path.exists() else 0)
+    return min(lengths)
+
+
+# READ
+def read_range(ticker: str, start: date = None, end: date = None, columns=None) -> dict:
+    """
+    Return ``{column: array}`` for the bars with ``start <= date <= end``.
+
+    The arrays are copies of just that slice; the rest of the history is
+    never read from disk.
+    """
+    directory = _ticker_dir(ticker)
+    columns = list(columns or COLUMNS)
+    if "date" not in columns:
+        columns.insert(0, "date")
+
+    rows = _rows(directory)
+    if rows == 0:
+        return {column: np.empty(0, COLUMNS[column]) for column in columns}
+
+    dates = np.memmap(_column_path(directory, "date"), dtype=COLUMNS["date"], mode="r", shape=(rows,))
+    # Binary search over the mapped dates only faults in a handful of pages
+    lo = 0 if start is None else int(np.searchsorted(dates, np.datetime64(start, "D"), side="left"))
+    hi = rows if end is None else int(np.searchsorted(dates, np.datetime64(end, "D"), side="right"))
+
+    result = {}
+    for column in columns:
+        mapped = np.memmap(_column_path(directory, column), dtype=COLUMNS[column], mode="r", shape=(rows,))
+        result[column] = np.array(mapped[lo:hi])
+    return result
+
+
+def as_lists(bars: dict) -> dict:
+    """JSON-ready columns: ISO date strings and plain numbers."""
+    return {
+        column: np.datetime_as_string(values).tolist() if column == "date" else values.tolist()
+        for column, values in bars.items()
+    }
+
+
+def last_date(ticker: str):
+    directory = _ticker_dir(ticker)
+    rows = _rows(directory)
+    if rows == 0:
+        return None
+    dates = np.memmap(_column_path(directory, "date"), dtype=COLUMNS["date"], mode="r", shape=(rows,))
+    return dates[-1].astype(object)
+
+
+def checked_at(ticker: str):
+    """When ``ticker`` was last refreshed from upstream, as a Unix timestamp."""
+    try:
+        return json.loads((_ticker_dir(ticker) / "meta.json").read_text())["checked_at"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def is_stale(ticker: str) -> bool:
+    checked = checked_at(ticker)
+    return checked is None or time.time() - checked > settings.PRICE_HISTORY_REFRESH_SECONDS
+
+
+# WRITE
+@contextmanager
+def _locked(directory: Path):
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def bars_from_daily_series(data: dict) -> dict:
+    """Turn a TIME_SERIES_DAILY response into ascending column arrays."""
+    series = data.get(SERIES_FIELD) or {}
+    days = sorted(series)
+    bars = {"date": np.array(days, dtype=COLUMNS["date"])}
+    for key, column in SERIES_KEYS.items():
+        bars[column] = np.array([series[day][key] for day in days], dtype=np.float64).astype(COLUMNS[column])
+    return bars
+
+
+def append_bars(ticker: str, bars: dict) -> int:
+    """
+    Append the bars newer than the stored history; returns how many bars
+    were written.
+
+    A bar for the last stored date replaces it, since the latest daily bar
+    keeps changing until the session closes.
+    """
+    directory = _ticker_dir(ticker)
+    with _locked(directory):
+        rows = _rows(directory)
+        keep = rows
+        start = 0
+        if rows:
+            dates = np.memmap(_column_path(directory, "date"), dtype=COLUMNS["date"], mode="r", shape=(rows,))
+            last = dates[-1]
+            del dates
+            start = int(np.searchsorted(bars["date"], last, side="left"))
+            if start < len(bars["date"]) and bars["date"][start] == last:
+                keep = rows - 1
+
+        written = len(bars["date"]) - start
+        if written <= 0:
+            return 0
+
+        for column, dtype in COLUMNS.items():
+            path = _column_path(directory, column)
+            values = np.ascontiguousarray(bars[column][start:], dtype=dtype)
+            with open(path, "r+b" if path.exists() else "wb") as f:
+                # Drops a torn write from an interrupted append. Readers map at
+                # most ``rows`` bars, so nothing they can touch is truncated.
+                f.truncate(rows * dtype.itemsize)
+                f.seek(keep * dtype.itemsize)
+                f.write(values.tobytes())
+        return written
+
+
+def _mark_checked(ticker: str) -> None:
+    meta = _ticker_dir(ticker) / "meta.json"
+    meta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = meta.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"checked_at": time.time()}))
+    os.replace(tmp, meta)
+
+
+def _outputsize(ticker: str) -> str:
+    last = last_date(ticker)
+    if last is None or (date.today() - last).days > COMPACT_MAX_GAP_DAYS:
+        return "full"
+    return "compact"
+
+
+def _store(ticker: str, data: dict) -> int:
+    if SERIES_FIELD not in data:
+        if "Error Message" in data:
+            raise UnknownTicker(ticker)
+        raise alphavantage.UpstreamError(f"No daily series for {ticker}")
+    written = append_bars(ticker, bars_from_daily_series(data))
+    _mark_checked(ticker)
+    return written
+
+
+def ingest(ticker: str) -> int:
+    """Fetch TIME_SERIES_DAILY for ``ticker`` and append what is new."""
+    data = alphavantage.get_daily_series(ticker, outputsize=_outputsize(ticker))
+    return _store(ticker, data)
+
+
+async def aingest(ticker: str) -> int:
+    data = await alphavantage.aget_daily_series(ticker, outputsize=_outputsize(ticker))
+    return await sync_to_async(_store, thread_sensitive=False)(ticker, data)
+
+
+def _unknown_key(ticker: str) -> str:
+    return f"price_history:unknown:{ticker}"
+
+
+async def arefresh(ticker: str) -> None:
+    """
+    Ingest ``ticker`` if its history is stale. Upstream failures only
+    propagate when there are no stored bars to fall back on.
+
+    An unknown ticker is remembered for a while, so repeated requests for it
+    do not each spend an Alpha Vantage call.
+    """
+    if not is_stale(ticker):
+        return
+    if await cache.aget(_unknown_key(ticker)):
+        raise UnknownTicker(ticker)
+    try:
+        await aingest(ticker)
+    except UnknownTicker:
+        await cache.aset(_unknown_key(ticker), True, timeout=settings.PRICE_HISTORY_UNKNOWN_TTL)
+        raise
+    except (quota.QuotaExceeded, alphavantage.UpstreamError):
+        if last_date(ticker) is None:
+            raise
@@ -0,0 +1,200 @@
+"""
+Compact Gemini prompts for investor summaries.
+
+Only the OVERVIEW fields an investor summary draws on make it into the
+prompt, formatted for reading ("2.91T", "24.3%") rather than as raw
+strings, and the whole prompt is held to ``PROMPT_TOKEN_BUDGET``. Fields
+are listed by priority: when the budget is tight the description is cut
+first, then fields from the end of the list.
+"""
+import math
+
+from django.conf import settings
+
+# Gemini's tokenizer averages about four characters per token on English
+# text. Only used to stay under the budget; the counts Gemini reports are
+# what the metrics record.
+CHARS_PER_TOKEN = 4
+
+PROMPT_TEMPLATE = (
+    "Write a summary of {ticker} for potential investors, highlighting the most important "
+    "information in the company data below. Do not use asterisk or pound symbols. Start with: "
+    "Based on the provided financial data for {ticker} here is a summary of the most important "
+    "information for potential investors to consider.\n\n{facts}"
+)
+
+BATCH_PROMPT_TEMPLATE = (
+    "Write a separate summary of each company below for potential investors, highlighting the "
+    "most important information in its data. Do not use asterisk or pound symbols. Start each "
+    "summary with: Based on the provided financial data for <ticker> here is a summary of the "
+    "most important information for potential investors to consider. Answer with a JSON object "
+    "mapping each ticker to its summary.\n\n{companies}"
+)
+
+MISSING_VALUES = {"", "None", "-", "N/A"}
+
+RATINGS = (
+    ("AnalystRatingStrongBuy", "strong buy"),
+    ("AnalystRatingBuy", "buy"),
+    ("AnalystRatingHold", "hold"),
+    ("AnalystRatingSell", "sell"),
+    ("AnalystRatingStrongSell", "strong sell"),
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+# FORMATTING
+def _text(value):
+    if value is None:
+        return None
+    value = " ".join(str(value).split())
+    return None if value in MISSING_VALUES else value
+
+
+def _number(value):
+    value = _text(value)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _title(value):
+    # Alpha Vantage upper-cases sectors and industries
+    value = _text(value)
+    return value.title() if value else None
+
+
+def _money(value):
+    number = _number(value)
+    if number is None:
+        return None
+    for scale, suffix in ((1e12, "T"), (1e9, "B"), (1e6, "M")):
+        if abs(number) >= scale:
+            return f"{number / scale:.2f}{suffix}"
+    return f"{number:,.0f}"
+
+
+def _percent(value):
+    number = _number(value)
+    return None if number is None else f"{number * 100:.2f}%"
+
+
+def _decimal(value):
+    number = _number(value)
+    return None if number is None else f"{number:.2f}"
+
+
+def _ratings(data: dict):
+    counts = [(_number(data.get(key)), label) for key, label in RATINGS]
+    if all(count is None for count, _ in counts):
+        return None
+    return ", ".join(f"{int(count or 0)} {label}" for count, label in counts)
+
+
+# OVERVIEW key -> (label, formatter), most important first
+PROMPT_FIELDS = {
+    "Name": ("Company", _text),
+    "Sector": ("Sector", _title),
+    "Industry": ("Industry", _title),
+    "Exchange": ("Exchange", _text),
+    "Currency": ("Currency", _text),
+    "MarketCapitalization": ("Market cap", _money),
+    "PERatio": ("P/E", _decimal),
+    "ForwardPE": ("Forward P/E", _decimal),
+    "EPS": ("EPS", _decimal),
+    "RevenueTTM": ("Revenue (TTM)", _money),
+    "QuarterlyRevenueGrowthYOY": ("Quarterly revenue growth (YoY)", _percent),
+    "QuarterlyEarningsGrowthYOY": ("Quarterly earnings growth (YoY)", _percent),
+    "ProfitMargin": ("Profit margin", _percent),
+    "OperatingMarginTTM": ("Operating margin (TTM)", _percent),
+    "ReturnOnEquityTTM": ("Return on equity (TTM)", _percent),
+    "DividendYield": ("Dividend yield", _percent),
+    "Beta": ("Beta", _decimal),
+    "AnalystTargetPrice": ("Analyst target price", _decimal),
+    # Not an OVERVIEW key: the five rating counts on one line
+    "AnalystRatings": ("Analyst ratings", None),
+    "52WeekHigh": ("52-week high", _decimal),
+    "52WeekLow": ("52-week low", _decimal),
+    "50DayMovingAverage": ("50-day moving average", _decimal),
+    "200DayMovingAverage": ("200-day moving average", _decimal),
+    "PEGRatio": ("PEG ratio", _decimal),
+    "PriceToBookRatio": ("Price to book", _decimal),
+    "EBITDA": ("EBITDA", _money),
+    "GrossProfitTTM": ("Gross profit (TTM)", _money),
+    "ReturnOnAssetsTTM": ("Return on assets (TTM)", _percent),
+}
+
+
+def select_facts(overview: dict) -> list:
+    """``[(label, value), ...]`` for the prompt fields present in ``overview``, by priority."""
+    facts = []
+    for key, (label, formatter) in PROMPT_FIELDS.items():
+        value = _ratings(overview) if formatter is None else formatter(overview.get(key))
+        if value is not None:
+            facts.append((label, value))
+    return facts
+
+
+def truncate(text: str, tokens: int) -> str:
+    """Cut ``text`` to about ``tokens`` tokens, at a sentence end when one is close."""
+    limit = tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    if limit <= 0:
+        return ""
+    cut = text[:limit]
+    sentence = cut.rfind(". ")
+    if sentence >= limit // 2:
+        return cut[:sentence + 1]
+    return cut.rsplit(" ", 1)[0] + "..."
+
+
+# BUILD
+def company_facts(overview: dict, budget: int) -> str:
+    """The prompt lines for one company, held to about ``budget`` tokens."""
+    facts = select_facts(overview)
+
+    def render(facts, description=""):
+        lines = [f"{label}: {value}" for label, value in facts]
+        if description:
+            lines.append(f"About: {description}")
+        return "\n".join(lines)
+
+    while facts and estimate_tokens(render(facts)) > budget:
+        facts.pop()
+
+    description = _text(overview.get("Description"))
+    if description:
+        room = budget - estimate_tokens(render(facts, " "))
+        description = truncate(description, min(room, settings.PROMPT_DESCRIPTION_TOKENS))
+    return render(facts, description)
+
+
+def _facts_budget(ticker: str, budget: int = None) -> int:
+    # What is left of the budget once the instructions are in
+    budget = budget or settings.PROMPT_TOKEN_BUDGET
+    return budget - estimate_tokens(PROMPT_TEMPLATE.format(ticker=ticker, facts=""))
+
+
+def build_prompt(ticker: str, overview: dict, budget: int = None) -> str:
+    ticker = ticker.upper()
+    facts = company_facts(overview, _facts_budget(ticker, budget))
+    return PROMPT_TEMPLATE.format(ticker=ticker, facts=facts)
+
+
+def build_batch_prompt(overviews: dict) -> str:
+    """
+    One prompt covering ``{ticker: overview}``. Each company gets the same
+    facts as its single-ticker prompt, so a batch summary is as informed as
+    one generated alone.
+    """
+    companies = [
+        f"Ticker: {ticker.upper()}\n{company_facts(overview, _facts_budget(ticker.upper()))}"
+        for ticker, overview in overviews.items()
+    ]
+    return BATCH_PROMPT_TEMPLATE.format(companies="\n\n".join(companies))
@@ -0,0 +1,314 @@
+import asyncio
+import contextlib
+import contextvars
+import math
+import re
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+_priority = contextvars.ContextVar("alphavantage_priority", default=INTERACTIVE)
+
+# A day after the last call both buckets are full again, so the state can go
+QUOTA_STATE_TTL = 2 * 86400
+
+# Alpha Vantage answers rate limits, invalid keys and premium-only requests
+# alike with HTTP 200 and a lone Note/Information key; only the wording tells
+# them apart
+NOTICE_KEYS = {"Note", "Information"}
+RATE_LIMIT_RE = re.compile(r"rate limit|call frequency|per (?:second|minute|day)|spreading out", re.IGNORECASE)
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Alpha Vantage quota exhausted, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class UpstreamThrottled(QuotaExceeded):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_per_second: float, tokens: float = None, updated: float = None):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity if tokens is None else tokens
+        self.updated = time.time() if updated is None else updated
+
+    def _refill(self, now: float) -> None:
+        # Workers on different hosts may disagree slightly on the time
+        elapsed = max(now - self.updated, 0.0)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+        self.updated = max(self.updated, now)
+
+    def available(self, now: float) -> float:
+        self._refill(now)
+        return self.tokens
+
+    def wait_time(self, now: float, needed: float = 1) -> float:
+        missing = needed - self.available(now)
+        if missing <= 0:
+            return 0.0
+        return missing / self.refill_per_second
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def drain(self, now: float) -> None:
+        self._refill(now)
+        self.tokens = min(self.tokens, 0)
+
+
+class Budget:
+    """Both buckets and the back-off deadline, as stored in the shared cache."""
+
+    def __init__(self, per_minute: int, per_day: int, stored: dict = None):
+        stored = stored or {}
+        self.minute = TokenBucket(per_minute, per_minute / 60, *stored.get("minute", ()))
+        self.day = TokenBucket(per_day, per_day / 86400, *stored.get("day", ()))
+        self.backoff_until = stored.get("backoff_until", 0.0)
+
+    def dump(self) -> dict:
+        return {
+            "minute": (self.minute.tokens, self.minute.updated),
+            "day": (self.day.tokens, self.day.updated),
+            "backoff_until": self.backoff_until,
+        }
+
+
+class QuotaScheduler:
+    """
+    Gate for Alpha Vantage calls backed by per-minute and per-day token buckets.
+
+    The buckets live in the default cache, so with a shared backend (Redis,
+    Memcached) every worker draws from one budget; with the per-process
+    LocMemCache each process has its own. Updates are serialised through a
+    cache lock, like singleflight's cross-process mode.
+
+    Interactive callers may wait briefly for a token; background callers only
+    get one when no interactive caller in this process is waiting and a
+    share of the daily budget is still left over for interactive traffic.
+    """
+
+    def __init__(self, per_minute: int, per_day: int, background_reserve: float, key: str = "quota:alphavantage"):
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.background_reserve = background_reserve
+        self.key = key
+        self._cond = threading.Condition()
+        self._interactive_waiting = 0
+        # What this process may still take from the daily budget (see cap_daily)
+        self._allowance = math.inf
+        # Calls let through by this process
+        self.granted = 0
+
+    # SHARED STATE
+    def _update(self, change):
+        """Apply ``change(budget, now)`` to the shared budget under the cache lock; returns its result."""
+        lock_key = f"{self.key}:lock"
+        # A crashed holder's lock expires on its own. The owner token keeps a
+        # holder that outlived its lock from releasing the next holder's.
+        owner = uuid.uuid4().hex
+        while not cache.add(lock_key, owner, timeout=settings.AV_QUOTA_LOCK_TIMEOUT):
+            time.sleep(settings.AV_QUOTA_LOCK_POLL_INTERVAL)
+        try:
+            budget = Budget(self.per_minute, self.per_day, cache.get(self.key))
+            result = change(budget, time.time())
+            cache.set(self.key, budget.dump(), timeout=QUOTA_STATE_TTL)
+            return result
+        finally:
+            if cache.get(lock_key) == owner:
+                cache.delete(lock_key)
+
+    async def _aupdate(self, change):
+        lock_key = f"{self.key}:lock"
+        owner = uuid.uuid4().hex
+        while not await cache.aadd(lock_key, owner, timeout=settings.AV_QUOTA_LOCK_TIMEOUT):
+            await asyncio.sleep(settings.AV_QUOTA_LOCK_POLL_INTERVAL)
+        try:
+            budget = Budget(self.per_minute, self.per_day, await cache.aget(self.key))
+            result = change(budget, time.time())
+            await cache.aset(self.key, budget.dump(), timeout=QUOTA_STATE_TTL)
+            return result
+        finally:
+            if await cache.aget(lock_key) == owner:
+                await cache.adelete(lock_key)
+
+    # ACQUIRE
+    def _wait_time(self, budget: Budget, priority: str, now: float) -> float:
+        if now < budget.backoff_until:
+            return budget.backoff_until - now
+        if self._allowance < 1:
+            # This process spent its share; it comes back with the next run
+            return 86400 / self.per_day
+
+        if priority == BACKGROUND:
+            if self._interactive_waiting:
+                return settings.AV_QUOTA_POLL_INTERVAL
+            reserve = math.ceil(budget.day.capacity * self.background_reserve)
+            return max(budget.minute.wait_time(now), budget.day.wait_time(now, 1 + reserve))
+
+        return max(budget.minute.wait_time(now), budget.day.wait_time(now))
+
+    def _try_take(self, priority: str):
+        def change(budget: Budget, now: float) -> float:
+            # Returns 0 when a token was taken
+            wait = self._wait_time(budget, priority, now)
+            if wait <= 0:
+                budget.minute.take(now)
+                budget.day.take(now)
+                with self._cond:
+                    self._allowance -= 1
+                    self.granted += 1
+            return wait
+        return change
+
+    def _deadline(self, priority: str, timeout: float) -> float:
+        if timeout is None:
+            timeout = settings.AV_QUOTA_MAX_WAIT if priority == INTERACTIVE else 0
+        return time.monotonic() + timeout
+
+    def _enter(self, priority: str) -> None:
+        if priority == INTERACTIVE:
+            with self._cond:
+                self._interactive_waiting += 1
+
+    def _leave(self, priority: str) -> None:
+        if priority == INTERACTIVE:
+            with self._cond:
+                self._interactive_waiting -= 1
+                self._cond.notify_all()
+
+    def acquire(self, priority: str = INTERACTIVE, timeout: float = None) -> None:
+        deadline = self._deadline(priority, timeout)
+
+        self._enter(priority)
+        try:
+            while True:
+                wait = self._update(self._try_take(priority))
+                if wait <= 0:
+                    return
+                if time.monotonic() + wait > deadline:
+                    raise QuotaExceeded(retry_after=wait)
+                with self._cond:
+                    self._cond.wait(wait)
+        finally:
+            self._leave(priority)
+
+    async def aacquire(self, priority: str = INTERACTIVE, timeout: float = None) -> None:
+        deadline = self._deadline(priority, timeout)
+
+        self._enter(priority)
+        try:
+            while True:
+                wait = await self._aupdate(self._try_take(priority))
+                if wait <= 0:
+                    return
+                if time.monotonic() + wait > deadline:
+                    raise QuotaExceeded(retry_after=wait)
+                await asyncio.sleep(wait)
+        finally:
+            self._leave(priority)
+
+    # ADJUST
+    def _backoff(self, seconds: float, daily: bool):
+        def change(budget: Budget, now: float) -> None:
+            budget.backoff_until = max(budget.backoff_until, now + seconds)
+            budget.minute.drain(now)
+            if daily:
+                budget.day.drain(now)
+        return change
+
+    def backoff(self, seconds: float, daily: bool = False) -> None:
+        self._update(self._backoff(seconds, daily))
+
+    async def abackoff(self, seconds: float, daily: bool = False) -> None:
+        await self._aupdate(self._backoff(seconds, daily))
+
+    def cap_daily(self, calls: float) -> None:
+        """Limit what this process may still take from the daily budget, e.g. for a batch job."""
+        with self._cond:
+            self._allowance = min(self._allowance, calls)
+
+    # READ
+    def _remaining(self, stored: dict) -> dict:
+        budget = Budget(self.per_minute, self.per_day, stored)
+        now = time.time()
+        day = budget.day.available(now)
+        reserve = math.ceil(budget.day.capacity * self.background_reserve)
+        return {
+            "minute": math.floor(budget.minute.available(now)),
+            "day": math.floor(min(day, self._allowance)),
+            # What background callers may take before reaching the reserve
+            "day_background": max(math.floor(min(day - reserve, self._allowance)), 0),
+            "backoff_seconds": round(max(0.0, budget.backoff_until - now), 1),
+        }
+
+    def remaining(self) -> dict:
+        # A snapshot for reporting and pacing; it takes no lock, so callers
+        # never queue behind acquire()
+        return self._remaining(cache.get(self.key))
+
+    async def aremaining(self) -> dict:
+        return self._remaining(await cache.aget(self.key))
+
+
+scheduler = QuotaScheduler(
+    per_minute=settings.AV_CALLS_PER_MINUTE,
+    per_day=settings.AV_CALLS_PER_DAY,
+    background_reserve=settings.AV_BACKGROUND_RESERVE,
+)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+@contextlib.contextmanager
+def background():
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def notice(data) -> str:
+    """The message of a lone Note/Information body, or ``None`` for a real payload."""
+    if not isinstance(data, dict) or not data or not set(data) <= NOTICE_KEYS:
+        return None
+    return data.get("Note") or data.get("Information")
+
+
+def _throttle(data):
+    # (seconds, daily) when data is a rate-limit body, otherwise None
+    message = notice(data)
+    if not message or not RATE_LIMIT_RE.search(message):
+        return None
+    daily = "per day" in message.lower()
+    return (settings.AV_THROTTLE_DAILY_BACKOFF if daily else settings.AV_THROTTLE_BACKOFF), daily
+
+
+def check_throttle(data: dict) -> None:
+    """Raise ``UpstreamThrottled`` and back off if ``data`` is a rate-limit body."""
+    throttle = _throttle(data)
+    if throttle is not None:
+        seconds, daily = throttle
+        scheduler.backoff(seconds, daily=daily)
+        raise UpstreamThrottled(retry_after=seconds)
+
+
+async def acheck_throttle(data: dict) -> None:
+    throttle = _throttle(data)
+    if throttle is not None:
+        seconds, daily = throttle
+        await scheduler.abackoff(seconds, daily=daily)
+        raise UpstreamThrottled(retry_after=seconds)
@@ -0,0 +1,66 @@
+from django.db.models import F
+
+from api.models import Stock
+from api.services.stock_service import OVERVIEW_NUMERIC_FIELDS, row_columns
+
+# Numeric columns that accept range filters and sorting
+SCREEN_FIELDS = tuple(OVERVIEW_NUMERIC_FIELDS)
+
+# Exact-match filters, stored upper case like the list endpoint's
+SCREEN_TEXT_FILTERS = ("exchange", "country", "sector", "industry")
+
+DEFAULT_SORT = "-market_cap"
+
+DEFAULT_FIELDS = (
+    "symbol", "name", "exchange", "sector", "industry",
+    "market_cap", "pe_ratio", "profit_margin", "beta",
+)
+
+
+class ScreenError(ValueError):
+    pass
+
+
+def parse_ranges(params) -> dict:
+    """
+    ``?pe_ratio_min=5&pe_ratio_max=30`` -> ``{"pe_ratio__gte": 5.0, "pe_ratio__lte": 30.0}``.
+
+    Unknown ``*_min``/``*_max`` parameters are rejected rather than ignored,
+    so a typo can't silently widen a screen.
+    """
+    filters = {}
+    for key, raw in params.items():
+        field, _, bound = key.rpartition("_")
+        if bound not in ("min", "max") or not raw.strip():
+            continue
+        if field not in SCREEN_FIELDS:
+            raise ScreenError(f"Unknown range filter: {key}")
+        try:
+            value = float(raw)
+        except ValueError:
+            raise ScreenError(f"{key} must be a number")
+        filters[f"{field}__{'gte' if bound == 'min' else 'lte'}"] = value
+    return filters
+
+
+def parse_sort(value: str) -> str:
+    value = (value or DEFAULT_SORT).strip()
+    if value.lstrip("-") not in (*SCREEN_FIELDS, "symbol"):
+        raise ScreenError(f"Cannot sort by: {value.lstrip('-')}")
+    return value
+
+
+# READ
+def screen_stocks(filters: dict, sort: str = DEFAULT_SORT, fields: list = None):
+    """
+    Stored stocks matching ``filters``, ordered by ``sort`` with missing
+    values last and the symbol as tie-breaker. Returns ``values()`` rows.
+    """
+    name = sort.lstrip("-")
+    column = F(name)
+    order = column.desc(nulls_last=True) if sort.startswith("-") else column.asc(nulls_last=True)
+    return (
+        Stock.objects.filter(**filters)
+        .order_by(order, "symbol")
+        .values(*row_columns(fields or DEFAULT_FIELDS))
+    )
@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import weakref
+
+from django.conf import settings
+from django.core.cache import cache
+
+_MISSING = object()
+
+_lock = threading.Lock()
+_calls = {}
+_async_calls = weakref.WeakKeyDictionary()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def make_key(provider: str, function: str, params: dict) -> str:
+    payload = json.dumps([provider, function, params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def do(key: str, fn):
+    """
+    Run ``fn()`` once per ``key`` at a time.
+
+    Threads that ask for a key already in flight block until the first
+    caller finishes and receive its result (or exception). With
+    ``SINGLEFLIGHT_CROSS_PROCESS`` enabled, the first caller across all
+    workers is elected through a cache lock, so a shared cache backend is
+    required for that to have any effect.
+    """
+    with _lock:
+        call = _calls.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _calls[key] = _Call()
+
+    if not is_leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        if settings.SINGLEFLIGHT_CROSS_PROCESS:
+            call.result = _do_shared(key, fn)
+        else:
+            call.result = fn()
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            _calls.pop(key, None)
+        call.done.set()
+
+
+def _do_shared(key: str, fn):
+    lock_key = f"singleflight:{key}:lock"
+    result_key = f"singleflight:{key}:result"
+    deadline = time.monotonic() + settings.SINGLEFLIGHT_WAIT_TIMEOUT
+
+    while True:
+        result = cache.get(result_key, _MISSING)
+        if result is not _MISSING:
+            return result
+
+        if cache.add(lock_key, True, timeout=settings.SINGLEFLIGHT_WAIT_TIMEOUT):
+            try:
+                result = fn()
+                cache.set(result_key, result, timeout=settings.SINGLEFLIGHT_RESULT_TTL)
+                return result
+            finally:
+                cache.delete(lock_key)
+
+        # Another worker holds the lock; give up waiting on it eventually
+        # so a crashed leader cannot stall every request for this key
+        if time.monotonic() >= deadline:
+            return fn()
+        time.sleep(settings.SINGLEFLIGHT_POLL_INTERVAL)
+
+
+async def ado(key: str, coro_fn):
+    """
+    Async counterpart of ``do`` for callers on the same event loop.
+
+    The first caller's work runs as its own task, so a caller that is
+    cancelled (e.g. on client disconnect) does not cancel it for the others.
+    """
+    loop = asyncio.get_running_loop()
+    calls = _async_calls.setdefault(loop, {})
+
+    task = calls.get(key)
+    if task is None:
+        if settings.SINGLEFLIGHT_CROSS_PROCESS:
+            task = loop.create_task(_ado_shared(key, coro_fn))
+        else:
+            task = loop.create_task(coro_fn())
+        calls[key] = task
+        task.add_done_callback(lambda _: calls.pop(key, None))
+
+    return await asyncio.shield(task)
+
+
+async def _ado_shared(key: str, coro_fn):
+    lock_key = f"singleflight:{key}:lock"
+    result_key = f"singleflight:{key}:result"
+    deadline = time.monotonic() + settings.SINGLEFLIGHT_WAIT_TIMEOUT
+
+    while True:
+        result = await cache.aget(result_key, _MISSING)
+        if result is not _MISSING:
+            return result
+
+        if await cache.aadd(lock_key, True, timeout=settings.SINGLEFLIGHT_WAIT_TIMEOUT):
+            try:
+                result = await coro_fn()
+                await cache.aset(result_key, result, timeout=settings.SINGLEFLIGHT_RESULT_TTL)
+                return result
+            finally:
+                await cache.adelete(lock_key)
+
+        if time.monotonic() >= deadline:
+            return await coro_fn()
+        await asyncio.sleep(settings.SINGLEFLIGHT_POLL_INTERVAL)
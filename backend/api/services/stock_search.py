@@ -0,0 +1,72 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from api import fts
+from api.models import Stock
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# bm25 column weights, in fts.COLUMNS order: symbol and name matches count most
+BM25_WEIGHTS = (10.0, 5.0, 1.0, 2.0, 2.0)
+
+SNIPPET_COLUMN = fts.COLUMNS.index("description")
+
+SEARCH_SQL = f"""
+    SELECT s.symbol, s.name, s.exchange, s.sector, s.industry,
+           snippet({fts.FTS_TABLE}, {SNIPPET_COLUMN}, '<b>', '</b>', '…', 16),
+           bm25({fts.FTS_TABLE}, {", ".join(map(str, BM25_WEIGHTS))}) AS rank
+    FROM {fts.FTS_TABLE}
+    JOIN api_stock s ON s.id = {fts.FTS_TABLE}.rowid
+    WHERE {fts.FTS_TABLE} MATCH %s
+    ORDER BY rank
+    LIMIT %s
+"""
+
+RESULT_COLUMNS = ("symbol", "name", "exchange", "sector", "industry", "snippet")
+
+
+def _match_expression(query: str) -> str:
+    # Quote every word so user input can't inject FTS5 syntax; each word is a prefix match
+    return " ".join(f'"{token}"*' for token in TOKEN_RE.findall(query))
+
+
+def search_stocks(query: str, limit: int = 20) -> list:
+    """Full-text search over stored stocks, best match first, without any network access."""
+    expression = _match_expression(query)
+    if not expression:
+        return []
+
+    if connection.vendor != "sqlite":
+        return _search_stocks_fallback(query, limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(SEARCH_SQL, [expression, limit])
+        rows = cursor.fetchall()
+
+    return [
+        {**dict(zip(RESULT_COLUMNS, row[:-1])), "score": round(-row[-1], 6)}
+        for row in rows
+    ]
+
+
+def _search_stocks_fallback(query: str, limit: int) -> list:
+    # Databases without FTS5 get an unranked substring match
+    condition = Q()
+    for column in fts.COLUMNS:
+        condition |= Q(**{f"{column}__icontains": query})
+
+    stocks = Stock.objects.filter(condition).order_by("symbol")[:limit]
+    return [
+        {
+            "symbol": stock.symbol,
+            "name": stock.name,
+            "exchange": stock.exchange,
+            "sector": stock.sector,
+            "industry": stock.industry,
+            "snippet": stock.description[:200],
+            "score": None,
+        }
+        for stock in stocks.only("symbol", "name", "exchange", "sector", "industry", "description")
+    ]
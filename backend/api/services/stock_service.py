@@ -1,12 +1,82 @@
+import functools
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
 from api.models import Stock
-from api.serializers import StockSerializer
+from api.serializers import UPPER_CASE_FIELDS, StockBulkSerializer, StockSerializer
+from api.services import cache_service, symbol_index
+from api.services.summary_service import ainvalidate_summaries, invalidate_summaries
+
+# Stock field -> Alpha Vantage OVERVIEW key
+OVERVIEW_TEXT_FIELDS = {
+    "name": "Name",
+    "description": "Description",
+    "exchange": "Exchange",
+    "country": "Country",
+    "sector": "Sector",
+    "industry": "Industry",
+    "website": "OfficialSite",
+    "asset_type": "AssetType",
+    "currency": "Currency",
+    "address": "Address",
+}
+
+OVERVIEW_NUMERIC_FIELDS = {
+    "beta": ("Beta", float),
+    "market_cap": ("MarketCapitalization", int),
+    "ebitda": ("EBITDA", int),
+    "pe_ratio": ("PERatio", float),
+    "peg_ratio": ("PEGRatio", float),
+    "eps": ("EPS", float),
+    "book_value": ("BookValue", float),
+    "revenue_ttm": ("RevenueTTM", int),
+    "gross_profit_ttm": ("GrossProfitTTM", int),
+    "profit_margin": ("ProfitMargin", float),
+    "operating_margin_ttm": ("OperatingMarginTTM", float),
+    "return_on_assets": ("ReturnOnAssetsTTM", float),
+    "return_on_equity": ("ReturnOnEquityTTM", float),
+    "week_52_high": ("52WeekHigh", float),
+    "week_52_low": ("52WeekLow", float),
+    "moving_average_50": ("50DayMovingAverage", float),
+    "moving_average_200": ("200DayMovingAverage", float),
+    "analyst_rating_strong_buy": ("AnalystRatingStrongBuy", int),
+    "analyst_rating_buy": ("AnalystRatingBuy", int),
+    "analyst_rating_hold": ("AnalystRatingHold", int),
+    "analyst_rating_sell": ("AnalystRatingSell", int),
+    "analyst_rating_strong_sell": ("AnalystRatingStrongSell", int),
+    "analyst_target_price": ("AnalystTargetPrice", float),
+}
+
+
+# Columns the API exposes, in model order; the raw overview stays internal
+STOCK_COLUMNS = [field.name for field in Stock._meta.concrete_fields if field.name != "overview"]
+
+# Editing any of these directly makes the columns, not the stored payload,
+# the source of the overview
+OVERVIEW_COLUMNS = {*OVERVIEW_TEXT_FIELDS, *OVERVIEW_NUMERIC_FIELDS}
+
+
+def _parse_number(value, cast):
+    # Alpha Vantage reports missing numbers as "None", "-" or ""
+    try:
+        number = Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    if not number.is_finite():
+        return None
+    return cast(number)
 
 # CREATE
 def create_stock(**data) -> Stock:
     serializer = StockSerializer(data=data)
     serializer.is_valid(raise_exception=True)
-    return serializer.save()
+    stock = serializer.save()
+    _forget_derived([stock.symbol])
+    return stock
 
 
 # READ
@@ -15,21 +85,254 @@ def get_stock_by_symbol(symbol: str) -> Stock:
         return Stock.objects.get(symbol=symbol.upper())
     except Stock.DoesNotExist:
         raise ObjectDoesNotExist("Stock not found")
-    
-def list_stocks(): 
-    return Stock.objects.all()
+
+
+def row_columns(fields: list = None) -> list:
+    # values() keys come out in the order given; match the serializer's field order
+    columns = list(STOCK_COLUMNS)
+    if fields:
+        columns = [name for name in columns if name in fields]
+    # The pagination key and the ETag version are always read
+    for name in ("symbol", "updated_at"):
+        if name not in columns:
+            columns.append(name)
+    return columns
+
+
+def list_stock_rows(filters: dict = None, fields: list = None):
+    """
+    Stored stocks matching ``filters`` as ``values()`` rows, for the read-only
+    fast path. Text filters are compared exactly, so pass them in upper case.
+    """
+    stocks = Stock.objects.all()
+    if filters:
+        stocks = stocks.filter(**filters)
+    return stocks.values(*row_columns(fields))
+
+
+def get_stock_row(symbol: str) -> dict:
+    row = Stock.objects.filter(symbol=symbol.upper()).values(*row_columns()).first()
+    if row is None:
+        raise ObjectDoesNotExist("Stock not found")
+    return row
+
+
+def get_overview_from_db(symbol: str, max_age: timedelta = None):
+    """
+    Rebuild an OVERVIEW-shaped dict from the stored row, or ``None`` when the
+    row is missing, was never fetched upstream, or is older than ``max_age``.
+    """
+    stock = Stock.objects.filter(symbol=symbol.upper(), fetched_at__isnull=False).first()
+    return overview_if_fresh(stock, max_age)
+
+
+async def aget_overview_from_db(symbol: str, max_age: timedelta = None):
+    stock = await Stock.objects.filter(symbol=symbol.upper(), fetched_at__isnull=False).afirst()
+    return overview_if_fresh(stock, max_age)
+
+
+async def aget_fetched_at(symbol: str):
+    """When the row for ``symbol`` was last written from upstream data, or ``None``."""
+    rows = Stock.objects.filter(symbol=symbol.upper(), fetched_at__isnull=False)
+    return await rows.values_list("fetched_at", flat=True).afirst()
+
+
+async def aget_stocks_fetched(symbols) -> dict:
+    """Return ``{symbol: Stock}`` for the given symbols that were ever fetched upstream."""
+    stocks = Stock.objects.filter(symbol__in=[s.upper() for s in symbols], fetched_at__isnull=False)
+    return {stock.symbol: stock async for stock in stocks}
+
+
+def overview_if_fresh(stock, max_age: timedelta):
+    if stock is None:
+        return None
+    if max_age is not None and stock.fetched_at < timezone.now() - max_age:
+        return None
+    return overview_from_stock(stock)
+
+
+def overview_from_stock(stock: Stock) -> dict:
+    if stock.overview:
+        return dict(stock.overview)
+
+    # Rows stored before the payload was kept, or edited since
+    data = {"Symbol": stock.symbol}
+    for field, key in OVERVIEW_TEXT_FIELDS.items():
+        data[key] = getattr(stock, field)
+    for field, (key, _) in OVERVIEW_NUMERIC_FIELDS.items():
+        value = getattr(stock, field)
+        data[key] = None if value is None else f"{value:.15g}"
+    return data
+
+
+# UPSERT
+def _overview_defaults(data: dict) -> dict:
+    defaults = {field: data.get(key) or "" for field, key in OVERVIEW_TEXT_FIELDS.items()}
+    for field in UPPER_CASE_FIELDS:
+        defaults[field] = defaults[field].upper()
+    for field, (key, cast) in OVERVIEW_NUMERIC_FIELDS.items():
+        defaults[field] = _parse_number(data.get(key), cast)
+    defaults["overview"] = data
+    defaults["fetched_at"] = timezone.now()
+    return defaults
+
+
+def upsert_from_overview(data: dict) -> Stock:
+    stock, _ = Stock.objects.update_or_create(
+        symbol=data["Symbol"].upper(),
+        defaults=_overview_defaults(data),
+    )
+    # A refresh that brought back the same fundamentals keeps its summary
+    invalidate_summaries({stock.symbol: data})
+    return stock
+
+
+async def aupsert_from_overview(data: dict) -> Stock:
+    stock, _ = await Stock.objects.aupdate_or_create(
+        symbol=data["Symbol"].upper(),
+        defaults=_overview_defaults(data),
+    )
+    await ainvalidate_summaries({stock.symbol: data})
+    return stock
+
+
+def _forget_derived(symbols) -> None:
+    # Summaries are built from the cached overview, so a row edited here
+    # drops both and the next request rebuilds them from current data
+    def forget():
+        cache_service.invalidate_many("overview", symbols)
+        invalidate_summaries(dict.fromkeys(symbols))
+
+    transaction.on_commit(forget)
 
 # UPDATE
 def update_stock(stock: Stock, **data) -> Stock:
+    symbol = stock.symbol
     serializer = StockSerializer(
         stock,
         data=data,
         partial=True
     )
     serializer.is_valid(raise_exception=True)
-    return serializer.save()
+    if OVERVIEW_COLUMNS & set(serializer.validated_data):
+        stock.overview = None
+    stock = serializer.save()
+    _forget_derived({symbol, stock.symbol})
+    return stock
+
+
+# BULK UPSERT
+def bulk_upsert_stocks(rows: list, chunk_size: int = 1000) -> list:
+    """
+    Validate and upsert many stock rows, keyed on symbol.
+
+    Returns one outcome per input row, in input order: ``created``,
+    ``updated``, ``duplicate`` (a later row in the batch has the same
+    symbol) or ``invalid`` with the validation errors.
+    """
+    outcomes = [None] * len(rows)
+    valid = {}
+
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            outcomes[index] = {"index": index, "status": "invalid", "errors": {"non_field_errors": ["Expected an object"]}}
+            continue
+        symbol = row.get("symbol")
+        if isinstance(symbol, str):
+            symbol = symbol.upper()
+            row = {**row, "symbol": symbol}
+        elif symbol is not None:
+            # CharField would coerce 123 to "123" and upsert it as a ticker
+            outcomes[index] = {"index": index, "symbol": symbol, "status": "invalid",
+                               "errors": {"symbol": ["Not a valid string."]}}
+            continue
+        try:
+            data = _validate_bulk_row(row)
+        except ValidationError as e:
+            outcomes[index] = {"index": index, "symbol": symbol, "status": "invalid", "errors": e.detail}
+            continue
+
+        previous = valid.pop(data["symbol"], None)
+        if previous is not None:
+            outcomes[previous[0]] = {"index": previous[0], "symbol": data["symbol"], "status": "duplicate"}
+        valid[data["symbol"]] = (index, data)
+
+    items = list(valid.values())
+    for start in range(0, len(items), chunk_size):
+        for index, symbol, status in _upsert_chunk(items[start:start + chunk_size]):
+            outcomes[index] = {"index": index, "symbol": symbol, "status": status}
+
+    return outcomes
+
+
+@functools.lru_cache(maxsize=None)
+def _bulk_fields():
+    serializer = StockBulkSerializer()
+    fields = [(name, field) for name, field in serializer.fields.items() if not field.read_only]
+    return serializer, fields
+
+
+def _validate_bulk_row(row: dict) -> dict:
+    # Same fields, errors and upper-casing as StockBulkSerializer.run_validation,
+    # without building the serializer machinery again for every row
+    serializer, fields = _bulk_fields()
+    data, errors = {}, {}
+    for name, field in fields:
+        try:
+            if name in row:
+                data[name] = field.run_validation(row[name])
+            elif field.required:
+                field.fail("required")
+        except ValidationError as e:
+            errors[name] = e.detail
+    if errors:
+        raise ValidationError(errors)
+    return serializer.validate(data)
+
+
+def _upsert_chunk(items: list) -> list:
+    symbols = [data["symbol"] for _, data in items]
+
+    # Rows only update the columns they provided, so group them by column set
+    groups = {}
+    for index, data in items:
+        groups.setdefault(frozenset(data), []).append(data)
+
+    with transaction.atomic():
+        existing = set(Stock.objects.filter(symbol__in=symbols).values_list("symbol", flat=True))
+        for fields, group in groups.items():
+            update_fields = sorted(fields - {"symbol"})
+            if OVERVIEW_COLUMNS & fields:
+                update_fields.append("overview")
+            objs = [Stock(**data) for data in group]
+            if update_fields:
+                Stock.objects.bulk_create(
+                    objs,
+                    update_conflicts=True,
+                    unique_fields=["symbol"],
+                    # auto_now is filled in by bulk_create but only written if listed
+                    update_fields=update_fields + ["updated_at"],
+                )
+            else:
+                Stock.objects.bulk_create(objs, ignore_conflicts=True)
+
+    _forget_derived(symbols)
+
+    # bulk_create skips model signals, so refresh the symbol index directly
+    if symbol_index.is_loaded():
+        index = symbol_index.get_index()
+        for stock in Stock.objects.filter(symbol__in=symbols).only(
+            "symbol", "name", "exchange", "country", "asset_type", "currency"
+        ):
+            index.add(symbol_index.entry_from_stock(stock))
+
+    return [
+        (index, data["symbol"], "updated" if data["symbol"] in existing else "created")
+        for index, data in items
+    ]
 
 
 # DELETE
 def delete_stock(stock: Stock) -> None:
     stock.delete()
+    _forget_derived([stock.symbol])
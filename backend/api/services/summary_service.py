@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+from api.services import cache_service, gemini
+from api.services.prompt_builder import build_batch_prompt, build_prompt
+
+logger = logging.getLogger(__name__)
+
+# Summaries are keyed on the exact prompt, so prompt changes retire old ones
+# on their own; bump this to retire them for any other reason
+PROMPT_VERSION = 2
+
+
+# Bumped to retire every stored summary at once. The summaries cache may
+# share its backend with everything else, so clear() is never an option.
+EPOCH_KEY = "summary:epoch"
+
+
+def _summaries():
+    return caches[settings.SUMMARY_CACHE_ALIAS]
+
+
+def _current(entry, epoch):
+    # Summaries are stored as (epoch, text); older epochs count as misses
+    if entry is None or entry[0] != (epoch or 0):
+        return None
+    return entry[1]
+
+
+def summary_key(ticker: str, overview: dict, model: str = None) -> str:
+    model = model or settings.GEMINI_MODEL
+    payload = json.dumps(
+        [model, PROMPT_VERSION, build_prompt(ticker, overview)],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return "summary:" + hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _ticker_index_key(ticker: str) -> str:
+    return f"summary:ticker:{ticker.upper()}"
+
+
+def batch_schema(tickers: list) -> dict:
+    """JSON schema for a batch answer: one summary string per ticker."""
+    return {
+        "type": "object",
+        "properties": {ticker: {"type": "string"} for ticker in tickers},
+        "required": list(tickers),
+    }
+
+
+# READ
+async def aget_cached_summary(ticker: str, overview: dict):
+    key = summary_key(ticker, overview)
+    found = await _summaries().aget_many([key, EPOCH_KEY])
+    return _current(found.get(key), found.get(EPOCH_KEY))
+
+
+async def aget_summary(ticker: str, overview: dict) -> str:
+    summary = await aget_cached_summary(ticker, overview)
+    if summary is not None:
+        cache_service.record_lookup("summary", "hit")
+        return summary
+
+    cache_service.record_lookup("summary", "miss")
+    return await _agenerate_summary(ticker, overview)
+
+
+async def aget_summaries(overviews: dict) -> dict:
+    """
+    Summaries for ``{ticker: overview}``, as ``{ticker: summary}`` in the
+    same order. A ticker whose generation failed maps to the exception.
+
+    Cached summaries come from one cache round trip. The rest are generated
+    ``SUMMARY_BATCH_SIZE`` tickers per model call and cached under the same
+    keys as single summaries.
+    """
+    keys = {ticker: summary_key(ticker, overview) for ticker, overview in overviews.items()}
+    cached = await _summaries().aget_many([*keys.values(), EPOCH_KEY])
+    epoch = cached.get(EPOCH_KEY)
+
+    found = {}
+    for ticker, key in keys.items():
+        summary = _current(cached.get(key), epoch)
+        if summary is not None:
+            cache_service.record_lookup("summary", "hit")
+            found[ticker] = summary
+        else:
+            cache_service.record_lookup("summary", "miss")
+
+    missing = [ticker for ticker in overviews if ticker not in found]
+    size = settings.SUMMARY_BATCH_SIZE
+    batches = await asyncio.gather(*(
+        _agenerate_batch({ticker: overviews[ticker] for ticker in missing[start:start + size]})
+        for start in range(0, len(missing), size)
+    ))
+    for batch in batches:
+        found.update(batch)
+    return {ticker: found[ticker] for ticker in overviews}
+
+
+async def _agenerate_summary(ticker: str, overview: dict) -> str:
+    summary = await gemini.agenerate_text(build_prompt(ticker, overview))
+    await astore_summary(ticker, overview, summary)
+    return summary
+
+
+async def _agenerate_batch(overviews: dict) -> dict:
+    """
+    Generate the summaries for ``overviews`` in one structured call and
+    split the answer per ticker. Tickers the answer leaves out, or all of
+    them if it isn't valid JSON, are generated one by one instead.
+    """
+    tickers = [ticker.upper() for ticker in overviews]
+    data = {}
+    if len(tickers) > 1:
+        try:
+            data = await gemini.agenerate_json(build_batch_prompt(overviews), batch_schema(tickers))
+        except ValueError:
+            logger.warning("Batch summary for %s was not valid JSON", ",".join(tickers))
+        except Exception as e:
+            return {ticker: e for ticker in overviews}
+
+    generated = {}
+    for ticker, upper in zip(overviews, tickers):
+        summary = data.get(upper) if isinstance(data, dict) else None
+        if isinstance(summary, str) and summary.strip():
+            generated[ticker] = summary.strip()
+    if generated:
+        await astore_summaries({ticker: (overviews[ticker], summary) for ticker, summary in generated.items()})
+
+    leftover = [ticker for ticker in overviews if ticker not in generated]
+    outcomes = await asyncio.gather(
+        *(_agenerate_summary(ticker, overviews[ticker]) for ticker in leftover),
+        return_exceptions=True,
+    )
+    generated.update(zip(leftover, outcomes))
+    return generated
+
+
+async def astream_summary(ticker: str, overview: dict):
+    """
+    Yield summary chunks, from the cache in one piece when possible.
+
+    A streamed summary is only cached once it has been generated in full.
+    """
+    summary = await aget_cached_summary(ticker, overview)
+    if summary is not None:
+        cache_service.record_lookup("summary", "hit")
+        yield summary
+        return
+
+    cache_service.record_lookup("summary", "miss")
+    chunks = []
+    stream = gemini.astream_text(build_prompt(ticker, overview))
+    try:
+        async for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+    finally:
+        await stream.aclose()
+
+    await astore_summary(ticker, overview, "".join(chunks))
+
+
+# WRITE
+async def astore_summary(ticker: str, overview: dict, summary: str) -> None:
+    await astore_summaries({ticker: (overview, summary)})
+
+
+async def astore_summaries(items: dict) -> None:
+    """Store ``{ticker: (overview, summary)}`` in one cache round trip."""
+    summaries = _summaries()
+    epoch = await summaries.aget(EPOCH_KEY, 0)
+    entries = {}
+    for ticker, (overview, summary) in items.items():
+        key = summary_key(ticker, overview)
+        entries[key] = (epoch, summary)
+        entries[_ticker_index_key(ticker)] = key
+    await summaries.aset_many(entries, timeout=settings.SUMMARY_CACHE_TTL)
+
+
+# INVALIDATE
+def _outdated_keys(indexed: dict, overviews: dict) -> list:
+    # indexed maps each ticker's index key to the summary key stored there
+    outdated = []
+    for ticker, overview in overviews.items():
+        index_key = _ticker_index_key(ticker)
+        key = indexed.get(index_key)
+        if key is None or (overview is not None and key == summary_key(ticker, overview)):
+            continue
+        outdated += [key, index_key]
+    return outdated
+
+
+def invalidate_summaries(overviews: dict) -> None:
+    """
+    Drop the stored summaries for ``{ticker: overview}`` whose fundamentals
+    were rewritten. A summary built from exactly the new ``overview`` is
+    kept; a ``None`` overview always drops it.
+    """
+    summaries = _summaries()
+    indexed = summaries.get_many([_ticker_index_key(ticker) for ticker in overviews])
+    outdated = _outdated_keys(indexed, overviews)
+    if outdated:
+        summaries.delete_many(outdated)
+
+
+async def ainvalidate_summaries(overviews: dict) -> None:
+    summaries = _summaries()
+    indexed = await summaries.aget_many([_ticker_index_key(ticker) for ticker in overviews])
+    outdated = _outdated_keys(indexed, overviews)
+    if outdated:
+        await summaries.adelete_many(outdated)
+
+
+def invalidate_summary(ticker: str = None) -> None:
+    """Drop the current summary for ``ticker``, or every summary when no ticker is given."""
+    if ticker is None:
+        summaries = _summaries()
+        summaries.add(EPOCH_KEY, 0, timeout=None)
+        summaries.incr(EPOCH_KEY)
+        return
+    invalidate_summaries({ticker: None})
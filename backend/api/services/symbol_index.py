@@ -0,0 +1,293 @@
+import bisect
+import csv
+import logging
+import re
+import threading
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Dots and dashes inside a token belong to it, as in BRK.B and RDS-A
+TOKEN_RE = re.compile(r"[A-Z0-9]+(?:[.-][A-Z0-9]+)*")
+PART_SEPARATOR_RE = re.compile(r"[.-]")
+
+# Completions kept per trie node: symbol terms before name terms, shortest
+# first, mirroring how results are scored
+NODE_TOP_K = 64
+
+US_EXCHANGES = {"NYSE", "NASDAQ", "NYSE ARCA", "NYSE MKT", "NYSEARCA", "AMEX", "BATS"}
+
+ASSET_TYPES = {
+    "Common Stock": "Equity",
+    "Stock": "Equity",
+    "ETF": "ETF",
+}
+
+
+def _tokens(text: str) -> list:
+    return TOKEN_RE.findall(text.upper())
+
+
+def _words(tokens: list) -> list:
+    # "COCA-COLA" is also found as "COLA"
+    words = []
+    for token in tokens:
+        words.append(token)
+        parts = PART_SEPARATOR_RE.split(token)
+        if len(parts) > 1:
+            words.extend(parts)
+    return list(dict.fromkeys(words))
+
+
+class _Node:
+    __slots__ = ("children", "top", "ends")
+
+    def __init__(self):
+        self.children = {}
+        # Sorted (is_name_term, term length, symbol) tuples for the best completions
+        self.top = []
+        # Every item whose term ends here, so a trimmed ``top`` can be refilled
+        self.ends = None
+
+
+class SymbolIndex:
+    """
+    Prefix trie over ticker symbols and company-name tokens.
+
+    Results use the same shape as Alpha Vantage SYMBOL_SEARCH matches, with
+    a ``matchScore`` that ranks exact symbols first, then symbol prefixes,
+    then company-name prefixes, each scaled by how much of the term matched.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._entries = {}
+        self._names = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _terms(self, entry: dict) -> dict:
+        """``{term: item}`` for the symbol and each name word of ``entry``."""
+        symbol = entry["symbol"]
+        terms = {word: (1, len(word), symbol) for word in _words(_tokens(entry["name"]))}
+        terms[symbol] = (0, len(symbol), symbol)
+        return terms
+
+    def add(self, entry: dict) -> None:
+        entry = {**entry, "symbol": entry["symbol"].upper()}
+        symbol = entry["symbol"]
+        with self._lock:
+            previous = self._entries.get(symbol)
+            if previous == entry:
+                return
+            terms = self._terms(entry).items()
+            previous_terms = self._terms(previous).items() if previous else set()
+            # Replacing an entry only touches the terms that changed with it
+            for term, item in previous_terms - terms:
+                self._unlink(term, item)
+            for term, item in terms - previous_terms:
+                self._link(term, item)
+            self._entries[symbol] = entry
+            # Normalized once here so scoring stays cheap at query time
+            name_tokens = _tokens(entry["name"])
+            self._names[symbol] = (
+                " ".join(name_tokens), _words(name_tokens), sum(len(token) for token in name_tokens),
+            )
+
+    def remove(self, symbol: str) -> None:
+        symbol = symbol.upper()
+        with self._lock:
+            entry = self._entries.pop(symbol, None)
+            if entry is None:
+                return
+            del self._names[symbol]
+            for term, item in self._terms(entry).items():
+                self._unlink(term, item)
+
+    def _link(self, term: str, item: tuple) -> None:
+        node = self._root
+        for char in term:
+            node = node.children.setdefault(char, _Node())
+            if len(node.top) < NODE_TOP_K or item < node.top[-1]:
+                bisect.insort(node.top, item)
+                del node.top[NODE_TOP_K:]
+        if node.ends is None:
+            node.ends = set()
+        node.ends.add(item)
+
+    def _unlink(self, term: str, item: tuple) -> None:
+        path = []
+        node = self._root
+        for char in term:
+            node = node.children.get(char)
+            if node is None:
+                break
+            path.append(node)
+        else:
+            node.ends.discard(item)
+
+        # Deepest first, so a refill reads children that are already complete
+        for node in reversed(path):
+            index = bisect.bisect_left(node.top, item)
+            if index < len(node.top) and node.top[index] == item:
+                full = len(node.top) == NODE_TOP_K
+                del node.top[index]
+                if full:
+                    self._refill(node)
+
+    @staticmethod
+    def _refill(node: _Node) -> None:
+        # A completion for this prefix either ends here or is among its
+        # child's best, so those are the only candidates for the open slot
+        items = list(node.ends or ())
+        for child in node.children.values():
+            items.extend(child.top)
+        node.top = sorted(items)[:NODE_TOP_K]
+
+    def _find(self, prefix: str):
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def _candidates(self, prefix: str) -> list:
+        node = self._find(prefix)
+        if node is None:
+            return []
+        return list(dict.fromkeys(symbol for _, _, symbol in node.top))
+
+    def _score(self, query: str, tokens: list, symbol: str) -> float:
+        name, name_words, name_length = self._names[symbol]
+
+        # Every query word has to prefix some word of the name or the symbol
+        if not all(
+            symbol.startswith(token) or any(word.startswith(token) for word in name_words)
+            for token in tokens
+        ):
+            return 0.0
+
+        if symbol == query:
+            return 1.0
+        if symbol.startswith(query):
+            return 0.5 + 0.5 * len(query) / len(symbol)
+        if name.startswith(query):
+            return 0.4 + 0.5 * len(query) / len(name)
+
+        matched = sum(len(token) for token in tokens)
+        return 0.2 + 0.5 * matched / name_length
+
+    def search(self, query: str, limit: int = 10) -> list:
+        tokens = _tokens(query)
+        if not tokens:
+            return []
+        query = " ".join(tokens)
+
+        with self._lock:
+            candidates = self._candidates(tokens[0])
+            scored = []
+            for symbol in candidates:
+                score = self._score(query, tokens, symbol)
+                if score > 0:
+                    scored.append((score, symbol, self._entries[symbol]))
+
+        scored.sort(key=lambda item: (-item[0], len(item[1]), item[1]))
+        return [
+            {**entry, "matchScore": round(score, 4)}
+            for score, _, entry in scored[:limit]
+        ]
+
+
+def entry_from_listing(row: dict) -> dict:
+    """Build an index entry from an Alpha Vantage LISTING_STATUS csv row."""
+    exchange = (row.get("exchange") or "").upper()
+    us = exchange in US_EXCHANGES
+    return {
+        "symbol": row["symbol"],
+        "name": row.get("name") or "",
+        "type": ASSET_TYPES.get(row.get("assetType"), row.get("assetType") or ""),
+        "region": "United States" if us else exchange,
+        "marketOpen": "09:30" if us else "",
+        "marketClose": "16:00" if us else "",
+        "timezone": "UTC-04" if us else "",
+        "currency": "USD" if us else "",
+    }
+
+
+def entry_from_stock(stock) -> dict:
+    us = stock.exchange.upper() in US_EXCHANGES or stock.country.upper() in ("USA", "US")
+    return {
+        "symbol": stock.symbol,
+        "name": stock.name,
+        "type": ASSET_TYPES.get(stock.asset_type, stock.asset_type or "Equity"),
+        "region": "United States" if us else stock.country,
+        "marketOpen": "09:30" if us else "",
+        "marketClose": "16:00" if us else "",
+        "timezone": "UTC-04" if us else "",
+        "currency": stock.currency or ("USD" if us else ""),
+    }
+
+
+def entry_from_match(match: dict) -> dict:
+    """Build an index entry from an Alpha Vantage SYMBOL_SEARCH match."""
+    return {
+        "symbol": match.get("1. symbol"),
+        "name": match.get("2. name") or "",
+        "type": match.get("3. type"),
+        "region": match.get("4. region"),
+        "marketOpen": match.get("5. marketOpen"),
+        "marketClose": match.get("6. marketClose"),
+        "timezone": match.get("7. timezone"),
+        "currency": match.get("8. currency"),
+    }
+
+
+def build_index() -> SymbolIndex:
+    from api.models import Stock
+
+    index = SymbolIndex()
+
+    listing = settings.SYMBOL_LISTING_FILE
+    if listing and Path(listing).exists():
+        with open(listing, newline="") as f:
+            for row in csv.DictReader(f):
+                if row.get("symbol") and row.get("status", "Active") == "Active":
+                    index.add(entry_from_listing(row))
+
+    # Rows we hold ourselves are richer than the listing, so they win
+    for stock in Stock.objects.only(
+        "symbol", "name", "exchange", "country", "asset_type", "currency"
+    ).iterator():
+        index.add(entry_from_stock(stock))
+
+    logger.info("Built symbol index with %d symbols", len(index))
+    return index
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> SymbolIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = build_index()
+    return _index
+
+
+async def aget_index() -> SymbolIndex:
+    if _index is not None:
+        return _index
+    return await sync_to_async(get_index)()
+
+
+def is_loaded() -> bool:
+    return _index is not None
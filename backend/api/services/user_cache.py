@@ -0,0 +1,65 @@
+"""
+Short-lived, per-process cache of resolved users, so authenticated
+requests don't look the user up on every call.
+
+Entries are dropped when the user is saved or deleted in this process.
+Other workers see the change once their entry expires, so the TTL is
+kept short.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from api.models import User
+
+_lock = threading.Lock()
+# str(user id) -> (expires at, User)
+_users = OrderedDict()
+
+
+# READ
+def get(user_id, version: int = None):
+    """
+    The cached user, or ``None`` on a miss. With ``version``, a user whose
+    token version differs counts as a miss.
+
+    Callers get their own copy, so changes to it never leak into the cache.
+    """
+    key = str(user_id)
+    with _lock:
+        entry = _users.get(key)
+        if entry is None:
+            return None
+        expires, user = entry
+        if expires < time.monotonic():
+            del _users[key]
+            return None
+    if version is not None and user.token_version != version:
+        return None
+    return copy.copy(user)
+
+
+def get_user(user_id) -> User:
+    """Read-only lookup by id through the cache; raises ``User.DoesNotExist``."""
+    user = get(user_id)
+    if user is None:
+        user = User.objects.get(id=user_id)
+        put(user)
+    return user
+
+
+# WRITE
+def put(user: User) -> None:
+    with _lock:
+        _users[str(user.pk)] = (time.monotonic() + settings.AUTH_USER_CACHE_TTL, copy.copy(user))
+        _users.move_to_end(str(user.pk))
+        while len(_users) > settings.AUTH_USER_CACHE_SIZE:
+            _users.popitem(last=False)
+
+
+def invalidate(user_id) -> None:
+    with _lock:
+        _users.pop(str(user_id), None)
@@ -1,6 +1,6 @@
 from django.core.exceptions import ObjectDoesNotExist
 from api.models import User
-from api.serializers import UserCreateSerializer, UserUpdateSerializer
+from api.serializers import PasswordChangeSerializer, UserCreateSerializer, UserUpdateSerializer
 
 
 # CREATE
@@ -35,6 +35,20 @@ def update_user_by_id(user: User, data) -> User:
     return serializer.save()
 
 
+def change_password(user: User, data) -> User:
+    """
+    Check the current password, set the new one and revoke every token
+    issued under the old one.
+    """
+    serializer = PasswordChangeSerializer(data=data, context={"user": user})
+    serializer.is_valid(raise_exception=True)
+    user.set_password(serializer.validated_data["new_password"])
+    user.token_version += 1
+    # One write, so the stored version always matches the stored password
+    user.save(update_fields=["password", "token_version"])
+    return user
+
+
 # DELETE
 def delete_user_by_id(user: User) -> None:
     user.delete()
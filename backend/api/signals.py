@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.models import Stock, User
+from api.services import symbol_index, user_cache
+
+
+# Keep the in-process symbol index in step with the table without rebuilding it
+@receiver(post_save, sender=Stock)
+def index_stock(sender, instance, **kwargs):
+    if symbol_index.is_loaded():
+        symbol_index.get_index().add(symbol_index.entry_from_stock(instance))
+
+
+@receiver(post_delete, sender=Stock)
+def unindex_stock(sender, instance, **kwargs):
+    if symbol_index.is_loaded():
+        symbol_index.get_index().remove(instance.symbol)
+
+
+# Saves cover updates and deactivation; other workers catch up when their entry expires
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def uncache_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
@@ -1,3 +1,1569 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+import math
+import random
+import tempfile
+import unittest
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api import fts, renderers
+from api.models import Stock, User
+from api.renderers import FastJSONRenderer
+from api.services import alphavantage, cache_service, indicators, metrics, price_history, prompt_builder, quota, screener, singleflight, stock_search, stock_service, summary_service, symbol_index, user_cache
+
+FAST_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+
+class FastPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    iterations = 1000
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class TokenRevocationTests(TestCase):
+    password = "Old-Password-123"
+
+    def setUp(self):
+        user_cache._users.clear()
+        self.user = User.objects.create_user(email="a@example.com", name="A", password=self.password)
+
+    def login(self, password=None):
+        response = self.client.post(
+            "/api/users/login/",
+            {"email": self.user.email, "password": password or self.password},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()["access"]
+
+    def get_self(self, token):
+        return self.client.get(f"/api/users/{self.user.pk}/", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def change_password(self, token=None, old=None, new="New-Password-456"):
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"} if token else {}
+        return self.client.post(
+            "/api/users/password/", {"old_password": old or self.password, "new_password": new},
+            content_type="application/json", **headers,
+        )
+
+    def test_password_change_revokes_old_tokens(self):
+        old = self.login()
+        self.assertEqual(self.get_self(old).status_code, 200)
+
+        self.assertEqual(self.change_password(old).status_code, 204)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.token_version, 1)
+        self.assertTrue(self.user.check_password("New-Password-456"))
+
+        self.assertEqual(self.get_self(old).status_code, 401)
+        self.assertEqual(self.get_self(self.login("New-Password-456")).status_code, 200)
+
+    def test_password_change_requires_the_caller_and_current_password(self):
+        token = self.login()
+        self.assertEqual(self.change_password().status_code, 401)
+        self.assertEqual(self.change_password(token, old="Wrong-Password-1").status_code, 400)
+        # AUTH_PASSWORD_VALIDATORS apply
+        response = self.change_password(token, new="123")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("new_password", response.json())
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.token_version, 0)
+        self.assertTrue(self.user.check_password(self.password))
+
+    def test_update_endpoint_ignores_password(self):
+        response = self.client.patch(
+            f"/api/users/{self.user.pk}/update/", {"password": "New-Password-456"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password(self.password))
+        self.assertEqual(self.user.token_version, 0)
+
+    def test_name_update_keeps_tokens(self):
+        token = self.login()
+        self.client.patch(f"/api/users/{self.user.pk}/update/", {"name": "B"}, content_type="application/json")
+        self.assertEqual(self.get_self(token).status_code, 200)
+
+    @override_settings(PASSWORD_HASHERS=["api.tests.FastPBKDF2PasswordHasher", *FAST_HASHERS])
+    def test_hash_upgrade_on_login_keeps_token_valid(self):
+        # Stored with the old hasher; logging in rehashes with the preferred one
+        User.objects.filter(pk=self.user.pk).update(password=make_password(self.password, hasher="md5"))
+
+        token = self.login()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+        self.assertEqual(self.user.token_version, 0)
+        self.assertEqual(self.get_self(token).status_code, 200)
+
+
+@unittest.skipIf(renderers.orjson is None, "orjson is not installed")
+class StatsAccessTests(TestCase):
+    URLS = ("/api/cacheStats/", "/api/upstreamStats/", "/api/metrics/")
+
+    def setUp(self):
+        user_cache._users.clear()
+        self.staff = User.objects.create_user(email="staff@example.com", name="Staff", is_staff=True)
+        self.member = User.objects.create_user(email="member@example.com", name="Member")
+
+    def get(self, url, user=None, token=None):
+        if user is not None:
+            token = RefreshToken.for_user(user).access_token
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"} if token else {}
+        return self.client.get(url, **headers)
+
+    def test_staff_only(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url).status_code, 401)
+                self.assertEqual(self.get(url, token="not-a-jwt").status_code, 401)
+                self.assertEqual(self.get(url, self.member).status_code, 403)
+                self.assertEqual(self.get(url, self.staff).status_code, 200)
+
+        quota_snapshot = self.get("/api/upstreamStats/", self.staff).json()["alphavantage_quota"]
+        self.assertEqual(set(quota_snapshot), {"minute", "day", "day_background", "backoff_seconds"})
+
+    @override_settings(METRICS_TOKEN="scrape-secret")
+    def test_metrics_token_is_the_scrape_credential(self):
+        response = self.get("/api/metrics/", token="scrape-secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertEqual(self.get("/api/metrics/", token="wrong").status_code, 401)
+        self.assertEqual(self.get("/api/metrics/", self.staff).status_code, 401)
+
+
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches["summaries"].clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(caches["summaries"].clear)
+
+    def requests(self, view, status, method="GET"):
+        return metrics.REQUESTS.values[(view, method, str(status))]
+
+    def histogram(self, metric, *labels):
+        # (observations, sum)
+        counts, total = metric.values.get(labels, ([0], 0.0))
+        return sum(counts), total
+
+    def test_records_sync_views(self):
+        Stock.objects.create(symbol="IBM", name="IBM", exchange="NYSE", country="USA")
+        requests = self.requests("get_stock", 200)
+        queries = self.histogram(metrics.DB_QUERIES, "get_stock")
+        sizes = self.histogram(metrics.RESPONSE_BYTES, "get_stock")
+
+        response = self.client.get("/api/stocks/IBM/")
+        self.assertEqual(self.requests("get_stock", 200), requests + 1)
+        count, total = self.histogram(metrics.DB_QUERIES, "get_stock")
+        self.assertEqual(count, queries[0] + 1)
+        self.assertGreaterEqual(total - queries[1], 1)
+        self.assertEqual(self.histogram(metrics.RESPONSE_BYTES, "get_stock"), (sizes[0] + 1, sizes[1] + len(response.content)))
+
+    def test_records_async_views_and_upstream_calls(self):
+        before = self.requests("stock_info", 200), self.histogram(metrics.UPSTREAM_SECONDS, "stock_info", "alphavantage")
+        with mock.patch("api.services.alphavantage._aget_with_retries", return_value=OVERVIEW):
+            self.client.get("/api/stockInfo/IBM/")
+            # The second request is a cache hit
+            self.client.get("/api/stockInfo/IBM/")
+        self.assertEqual(self.requests("stock_info", 200), before[0] + 2)
+        self.assertEqual(self.histogram(metrics.UPSTREAM_SECONDS, "stock_info", "alphavantage")[0], before[1][0] + 1)
+
+    def test_unresolved_paths_share_one_label(self):
+        before = self.requests("unmatched", 404)
+        self.client.get("/api/no-such-endpoint/")
+        self.client.get("/wp-login.php")
+        self.assertEqual(self.requests("unmatched", 404), before + 2)
+
+    async def test_streams_are_recorded_after_the_last_chunk(self):
+        await cache_service.aset_entry("overview", "IBM", OVERVIEW)
+        await summary_service.astore_summary("IBM", OVERVIEW, "A cached summary")
+        before = self.requests("ai_response_stream", 200), self.histogram(metrics.RESPONSE_BYTES, "ai_response_stream")
+
+        response = await self.async_client.get("/api/aiResponse/IBM/stream/")
+        self.assertEqual(self.requests("ai_response_stream", 200), before[0])
+        body = b"".join([chunk async for chunk in response.streaming_content])
+
+        self.assertEqual(self.requests("ai_response_stream", 200), before[0] + 1)
+        count, size = self.histogram(metrics.RESPONSE_BYTES, "ai_response_stream")
+        self.assertEqual((count, size), (before[1][0] + 1, before[1][1] + len(body)))
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    def assertSameBytes(self, data):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_matches_json_renderer(self):
+        self.assertSameBytes({
+            "symbol": "AAPL", "name": "Caf\u00e9 \u2028 Inc", "beta": 1.165, "market_cap": 3450000000000,
+            "pe_ratio": None, "active": True, "tags": ["a", "b"], "price": Decimal("1.50"),
+            "fetched_at": datetime.datetime(2025, 1, 2, 3, 4, 5, 678000, tzinfo=datetime.timezone.utc),
+        })
+
+    def test_floats_with_exponents(self):
+        for value in (1e16, -1e16, 1.5e17, 1e300, 1e-7, 1e-5, 0.00012, 1e15, 123.456):
+            with self.subTest(value=value):
+                self.assertSameBytes({"market_cap": value, "ebitda": [value]})
+
+    def test_any_exponent_spelling_falls_back(self):
+        # Some orjson versions write 1e16 where the stdlib writes 1e+16
+        with mock.patch.object(renderers.orjson, "dumps", return_value=b'{"market_cap":1e16}'):
+            self.assertEqual(FastJSONRenderer().render({"market_cap": 1e16}), b'{"market_cap":1e+16}')
+
+    def test_non_finite_floats_raise_like_json_renderer(self):
+        for value in (float("nan"), float("inf"), float("-inf")):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    JSONRenderer().render({"rows": [{"beta": value}]})
+                with self.assertRaises(ValueError):
+                    FastJSONRenderer().render({"rows": [{"beta": value}]})
+
+    def test_null_without_non_finite_stays_on_orjson(self):
+        with mock.patch.object(JSONRenderer, "render") as fallback:
+            FastJSONRenderer().render({"beta": None, "pe_ratio": 12.5})
+        fallback.assert_not_called()
+
+
+class BulkUpsertSymbolTests(TestCase):
+    def post(self, rows):
+        response = self.client.post("/api/stocks/bulk/", rows, content_type="application/json")
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def row(self, **extra):
+        return {"name": "Acme", "exchange": "NYSE", "country": "USA", **extra}
+
+    def test_string_symbols_are_upper_cased(self):
+        data = self.post([self.row(symbol="brk.b"), self.row(symbol="msft")])
+        self.assertEqual(data["created"], 2)
+        self.assertEqual(sorted(Stock.objects.values_list("symbol", flat=True)), ["BRK.B", "MSFT"])
+
+    def test_non_string_symbols_are_rejected(self):
+        data = self.post([
+            self.row(symbol=None), self.row(symbol=123), self.row(symbol=True), self.row(), self.row(symbol=""),
+        ])
+        self.assertEqual(data["invalid"], 5)
+        self.assertEqual([r["status"] for r in data["results"]], ["invalid"] * 5)
+        self.assertEqual(data["results"][1]["symbol"], 123)
+        self.assertFalse(Stock.objects.exists())
+
+    def test_existing_rows_are_updated_and_duplicates_reported(self):
+        self.post([self.row(symbol="AAPL", beta=1.0)])
+        data = self.post([self.row(symbol="aapl", beta=1.1), self.row(symbol="AAPL", beta=1.2)])
+        self.assertEqual((data["updated"], data["duplicate"]), (1, 1))
+        self.assertEqual(Stock.objects.get(symbol="AAPL").beta, 1.2)
+
+    @override_settings(STOCK_BULK_CHUNK_SIZE=2)
+    def test_mixed_batch_counts(self):
+        self.post([self.row(symbol="AAPL"), self.row(symbol="MSFT")])
+        data = self.post([
+            self.row(symbol="AAPL", sector="technology"),  # updated
+            self.row(symbol="NVDA"),  # duplicate of the last row
+            self.row(symbol="AMZN"),  # created
+            {"symbol": "GOOG", "name": "Alphabet"},  # invalid: exchange and country missing
+            self.row(symbol="TSLA", beta="high", website="nope"),  # invalid
+            self.row(symbol="MSFT", analyst_rating_buy=3),  # updated
+            self.row(symbol="nvda", beta=1.5),  # created
+        ])
+        counts = {status: data[status] for status in ("created", "updated", "duplicate", "invalid")}
+        self.assertEqual(counts, {"created": 2, "updated": 2, "duplicate": 1, "invalid": 2})
+        self.assertEqual(
+            [r["status"] for r in data["results"]],
+            ["updated", "duplicate", "created", "invalid", "invalid", "updated", "created"],
+        )
+        self.assertEqual(set(data["results"][3]["errors"]), {"exchange", "country"})
+        self.assertEqual(set(data["results"][4]["errors"]), {"beta", "website"})
+        self.assertEqual(Stock.objects.get(symbol="AAPL").sector, "TECHNOLOGY")
+        self.assertEqual(Stock.objects.get(symbol="NVDA").beta, 1.5)
+        self.assertEqual(Stock.objects.count(), 4)
+
+
+class StockListTests(TestCase):
+    url = "/api/stocks/"
+
+    @classmethod
+    def setUpTestData(cls):
+        for index, symbol in enumerate(["EEE", "AAA", "DDD", "BBB", "CCC"]):
+            Stock.objects.create(symbol=symbol, name=f"{symbol} Inc", exchange="NYSE" if index % 2 else "NASDAQ",
+                                 country="USA", sector="TECHNOLOGY", beta=index / 10)
+
+    def page(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_cursor_pages_cover_every_row_once(self):
+        body = self.page(self.url, limit="2")
+        symbols = [row["symbol"] for row in body["results"]]
+        self.assertIsNone(body["previous"])
+        while body["next"]:
+            body = self.page(body["next"])
+            symbols += [row["symbol"] for row in body["results"]]
+        self.assertEqual(symbols, ["AAA", "BBB", "CCC", "DDD", "EEE"])
+
+        # Rows added behind the cursor neither repeat nor shift a page
+        first = self.page(self.url, limit="2")
+        Stock.objects.create(symbol="A", name="A Inc", exchange="NYSE", country="USA")
+        self.assertEqual([row["symbol"] for row in self.page(first["next"])["results"]], ["CCC", "DDD"])
+        previous = self.page(self.page(first["next"])["previous"])
+        self.assertEqual([row["symbol"] for row in previous["results"]], ["AAA", "BBB"])
+
+    def test_projection(self):
+        body = self.page(self.url, fields="symbol,beta", exchange="nyse")
+        self.assertEqual(body["results"], [{"symbol": "AAA", "beta": 0.1}, {"symbol": "BBB", "beta": 0.3}])
+        self.assertEqual(len(self.page(self.url)["results"][0]), len(stock_service.STOCK_COLUMNS))
+
+        response = self.client.get(self.url, {"fields": "symbol,password"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["detail"], "Unknown fields: password")
+
+    def test_mixed_case_writes_match_the_filters(self):
+        response = self.client.post("/api/stocks/create/", {
+            "symbol": "MIX", "name": "Mixed", "exchange": "Nyse", "country": "usa", "sector": "Technology",
+        }, content_type="application/json")
+        self.assertEqual(response.json()["exchange"], "NYSE")
+        stock_service.bulk_upsert_stocks([{"symbol": "low", "name": "Lower", "exchange": "nasdaq", "country": "Usa"}])
+        upsert = async_to_sync(stock_service.aupsert_from_overview)
+        upsert({**OVERVIEW, "Symbol": "AV", "Exchange": "Nyse", "Country": "USA"})
+
+        symbols = [row["symbol"] for row in self.page(self.url, country="USA", exchange="nyse")["results"]]
+        self.assertEqual(symbols, ["AAA", "AV", "BBB", "MIX"])
+        self.assertEqual(self.page(self.url, exchange="Nasdaq", fields="symbol")["results"][0], {"symbol": "CCC"})
+        self.assertIn({"symbol": "LOW"}, self.page(self.url, exchange="Nasdaq", fields="symbol")["results"])
+
+
+class ScreenerTests(TestCase):
+    url = "/api/stocks/screen/"
+
+    @classmethod
+    def setUpTestData(cls):
+        for symbol, sector, market_cap, pe_ratio, beta in (
+            ("AAA", "TECHNOLOGY", 300, 12.0, 1.1),
+            ("BBB", "TECHNOLOGY", 200, 40.0, None),
+            ("CCC", "ENERGY", 100, 8.0, 0.7),
+            ("DDD", "TECHNOLOGY", None, 15.0, 1.3),
+        ):
+            Stock.objects.create(symbol=symbol, name=f"{symbol} Inc", exchange="NYSE", country="USA",
+                                 sector=sector, market_cap=market_cap, pe_ratio=pe_ratio, beta=beta)
+
+    def screen(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def symbols(self, **params):
+        return [row["symbol"] for row in self.screen(**params)["results"]]
+
+    def test_response_shape(self):
+        body = self.screen()
+        self.assertEqual((body["count"], body["sort"]), (4, "-market_cap"))
+        # Largest first, missing values last
+        self.assertEqual([row["symbol"] for row in body["results"]], ["AAA", "BBB", "CCC", "DDD"])
+        self.assertEqual(set(body["results"][0]), set(screener.DEFAULT_FIELDS))
+
+    def test_ranges_text_filters_and_sort(self):
+        self.assertEqual(self.symbols(pe_ratio_min="10", pe_ratio_max="20"), ["AAA", "DDD"])
+        self.assertEqual(self.symbols(sector="technology", sort="pe_ratio"), ["AAA", "DDD", "BBB"])
+        self.assertEqual(self.symbols(sort="-beta"), ["DDD", "AAA", "CCC", "BBB"])
+        # A range excludes rows missing the value
+        self.assertEqual(self.symbols(beta_max="5"), ["AAA", "CCC", "DDD"])
+
+    def test_projection_and_paging(self):
+        body = self.screen(fields="symbol,beta", limit="2", offset="1")
+        self.assertEqual(body["count"], 4)
+        self.assertEqual(body["results"], [{"symbol": "BBB", "beta": None}, {"symbol": "CCC", "beta": 0.7}])
+
+    def test_rejects_bad_parameters(self):
+        for params, detail in (
+            ({"fields": "symbol,secret"}, "Unknown fields: secret"),
+            ({"overview_min": "1"}, "Unknown range filter: overview_min"),
+            ({"pe_ratio_min": "cheap"}, "pe_ratio_min must be a number"),
+            ({"sort": "name"}, "Cannot sort by: name"),
+            ({"limit": "all"}, "limit and offset must be integers"),
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["detail"], detail)
+
+
+class QuotaSchedulerTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def workers(self, count=2, per_minute=3, per_day=100):
+        # Separate schedulers over one cache stand in for separate worker processes
+        return [quota.QuotaScheduler(per_minute, per_day, background_reserve=0.2, key="quota:test")
+                for _ in range(count)]
+
+    def test_workers_share_one_budget(self):
+        first, second = self.workers()
+        first.acquire(timeout=0)
+        first.acquire(timeout=0)
+        second.acquire(timeout=0)
+        with self.assertRaises(quota.QuotaExceeded) as raised:
+            second.acquire(timeout=0)
+        self.assertGreater(raised.exception.retry_after, 0)
+        self.assertEqual(second.remaining()["minute"], 0)
+        self.assertEqual((first.granted, second.granted), (2, 1))
+
+    def test_background_calls_leave_the_reserve(self):
+        (scheduler,) = self.workers(count=1, per_minute=100, per_day=10)
+        for _ in range(8):
+            scheduler.acquire(quota.BACKGROUND)
+        self.assertEqual((scheduler.remaining()["day"], scheduler.remaining()["day_background"]), (2, 0))
+        with self.assertRaises(quota.QuotaExceeded):
+            scheduler.acquire(quota.BACKGROUND)
+        scheduler.acquire(quota.INTERACTIVE, timeout=0)
+
+    def test_cap_daily_only_limits_this_worker(self):
+        first, second = self.workers(per_minute=100)
+        first.cap_daily(1)
+        first.acquire(timeout=0)
+        with self.assertRaises(quota.QuotaExceeded):
+            first.acquire(timeout=0)
+        self.assertEqual(first.remaining()["day"], 0)
+        second.acquire(timeout=0)
+
+    def test_async_acquire_uses_the_same_budget(self):
+        first, second = self.workers(per_minute=1)
+        asyncio.run(first.aacquire(timeout=0))
+        with self.assertRaises(quota.QuotaExceeded):
+            second.acquire(timeout=0)
+
+    def test_lock_is_only_released_by_its_owner(self):
+        (scheduler,) = self.workers(count=1)
+        lock_key = "quota:test:lock"
+
+        def outlived(budget, now):
+            # This holder's lock expired and another worker took it
+            cache.set(lock_key, "other-owner")
+
+        scheduler._update(outlived)
+        self.assertEqual(cache.get(lock_key), "other-owner")
+        cache.delete(lock_key)
+        asyncio.run(scheduler._aupdate(outlived))
+        self.assertEqual(cache.get(lock_key), "other-owner")
+
+        cache.delete(lock_key)
+        scheduler.acquire(timeout=0)
+        self.assertIsNone(cache.get(lock_key))
+
+
+class ThrottleDetectionTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_rate_limit_bodies(self):
+        with self.assertRaises(quota.UpstreamThrottled) as raised:
+            quota.check_throttle({"Note": "Our standard API call frequency is 5 calls per minute."})
+        self.assertEqual(raised.exception.retry_after, 60)
+        self.assertGreater(quota.scheduler.remaining()["backoff_seconds"], 0)
+
+        with self.assertRaises(quota.UpstreamThrottled) as raised:
+            quota.check_throttle({"Information": "You have reached the 25 requests per day limit."})
+        self.assertEqual(raised.exception.retry_after, 3600)
+        self.assertEqual(quota.scheduler.remaining()["day"], 0)
+
+    def test_payloads_that_are_not_throttling(self):
+        quota.check_throttle({"Symbol": "AAPL", "Information": "Delayed data"})
+        quota.check_throttle({"Symbol": "AAPL"})
+        quota.check_throttle({})
+        self.assertEqual(quota.scheduler.remaining()["backoff_seconds"], 0)
+
+    def test_other_notices_are_not_throttling(self):
+        for message in (
+            "The outputsize=full parameter value is a premium feature for the TIME_SERIES_DAILY endpoint. "
+            "You may subscribe to any of the premium plans to instantly unlock all premium features",
+            "Thank you for using Alpha Vantage! This is a premium endpoint.",
+            "The demo API key is for demo purposes only. Please claim your free API key.",
+        ):
+            with self.subTest(message=message):
+                quota.check_throttle({"Information": message})
+                self.assertEqual(quota.notice({"Information": message}), message)
+        self.assertEqual(quota.scheduler.remaining()["backoff_seconds"], 0)
+
+    def test_async_backoff_stays_off_the_sync_lock(self):
+        body = {"Note": "Our standard API call frequency is 5 calls per minute."}
+        with mock.patch.object(quota.scheduler, "_update", side_effect=AssertionError("sync lock")):
+            with self.assertRaises(quota.UpstreamThrottled):
+                asyncio.run(quota.acheck_throttle(body))
+            self.assertGreater(asyncio.run(quota.scheduler.aremaining())["backoff_seconds"], 0)
+
+    def test_premium_notice_is_an_upstream_error(self):
+        body = {"Information": "Thank you for using Alpha Vantage! This is a premium endpoint."}
+        with mock.patch("api.services.alphavantage._aget_with_retries", return_value=body):
+            with self.assertRaises(alphavantage.UpstreamError):
+                asyncio.run(alphavantage.aquery("TIME_SERIES_DAILY", symbol="IBM", outputsize="full"))
+        self.assertEqual(quota.scheduler.remaining()["backoff_seconds"], 0)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.calls = 0
+        self.release = None
+
+    async def upstream(self, params):
+        self.calls += 1
+        # Holds the call open until every caller has joined it
+        await self.release.wait()
+        if params["symbol"] == "FAIL":
+            raise ValueError("Expecting value")
+        return {"Symbol": params["symbol"]}
+
+    def gather(self, symbol, callers=5):
+        async def run():
+            self.release = asyncio.Event()
+            tasks = [asyncio.create_task(alphavantage.aquery("OVERVIEW", symbol=symbol)) for _ in range(callers)]
+            await asyncio.sleep(0)
+            self.release.set()
+            return await asyncio.gather(*tasks, return_exceptions=True)
+
+        scheduler = quota.QuotaScheduler(per_minute=100, per_day=100, background_reserve=0.2)
+        with mock.patch.object(quota, "scheduler", scheduler), \
+                mock.patch("api.services.alphavantage._aget_with_retries", side_effect=self.upstream):
+            results = asyncio.run(run())
+        return results, scheduler.granted
+
+    def test_concurrent_misses_make_one_upstream_call(self):
+        for cross_process in (False, True):
+            self.calls = 0
+            with self.subTest(cross_process=cross_process), override_settings(SINGLEFLIGHT_CROSS_PROCESS=cross_process):
+                results, granted = self.gather(f"IBM{int(cross_process)}")
+                self.assertEqual((self.calls, granted), (1, 1))
+                self.assertEqual(results, [{"Symbol": f"IBM{int(cross_process)}"}] * 5)
+
+    def test_failure_reaches_every_waiter(self):
+        for cross_process in (False, True):
+            self.calls = 0
+            with self.subTest(cross_process=cross_process), override_settings(SINGLEFLIGHT_CROSS_PROCESS=cross_process):
+                results, _ = self.gather("FAIL")
+                self.assertEqual(self.calls, 1)
+                self.assertTrue(all(isinstance(result, alphavantage.UpstreamError) for result in results))
+                # Nothing is left behind, so the next caller tries again
+                self.gather("FAIL", callers=1)
+                self.assertEqual(self.calls, 2)
+
+    def test_cancelled_caller_leaves_the_call_running(self):
+        async def run():
+            release = asyncio.Event()
+
+            async def work():
+                await release.wait()
+                return "done"
+
+            first = asyncio.create_task(singleflight.ado("key", work))
+            second = asyncio.create_task(singleflight.ado("key", work))
+            await asyncio.sleep(0)
+            first.cancel()
+            release.set()
+            return await asyncio.gather(first, second, return_exceptions=True)
+
+        first, second = asyncio.run(run())
+        self.assertIsInstance(first, asyncio.CancelledError)
+        self.assertEqual(second, "done")
+
+
+class ThrottledStockInfoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_throttle_body_becomes_429_and_backs_off(self):
+        body = {"Information": "Our standard API rate limit is 5 requests per minute."}
+        with mock.patch("api.services.alphavantage._aget_with_retries", return_value=body) as upstream:
+            response = self.client.get("/api/stockInfo/QTEST/")
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response["Retry-After"], "60")
+            self.assertEqual(response.json()["retry_after"], 60)
+
+            # Backed off: the next request is refused without going upstream
+            self.assertEqual(self.client.get("/api/stockInfo/QTEST2/").status_code, 429)
+        self.assertEqual(upstream.call_count, 1)
+
+
+OVERVIEW = {"Symbol": "IBM", "Name": "International Business Machines", "Sector": "TECHNOLOGY", "PERatio": "22.5"}
+
+
+class ConditionalResponseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches["summaries"].clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(caches["summaries"].clear)
+        cache_service.set_entry("overview", "IBM", OVERVIEW)
+
+    def assertNotModified(self, url, response, **headers):
+        again = self.client.get(url, headers=headers)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], response["ETag"])
+        self.assertEqual(again["Last-Modified"], response["Last-Modified"])
+
+    def test_stock_info_validators(self):
+        url = "/api/stockInfo/IBM/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        self.assertNotModified(url, response, if_none_match=response["ETag"])
+        self.assertNotModified(url, response, if_modified_since=response["Last-Modified"])
+        older = "Mon, 01 Jan 2001 00:00:00 GMT"
+        self.assertEqual(self.client.get(url, headers={"if_modified_since": older}).status_code, 200)
+
+    def test_stock_info_last_modified_from_stored_row(self):
+        Stock.objects.create(symbol="IBM", name="IBM", fetched_at=datetime.datetime(2024, 5, 1, tzinfo=datetime.timezone.utc))
+        cache.clear()
+        with mock.patch("api.services.alphavantage.aget_overview", side_effect=quota.QuotaExceeded(retry_after=60)):
+            response = self.client.get("/api/stockInfo/IBM/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Last-Modified"], "Wed, 01 May 2024 00:00:00 GMT")
+
+    def test_ai_response_revalidates_without_generating(self):
+        url = "/api/aiResponse/IBM/"
+        with mock.patch("api.services.gemini.agenerate_text", return_value="Summary") as generate:
+            response = self.client.get(url)
+            self.assertEqual(response.json(), {"summ_response": "Summary"})
+
+            # Not even an evicted summary is regenerated for a matching validator
+            caches["summaries"].clear()
+            self.assertNotModified(url, response, if_none_match=response["ETag"])
+            self.assertNotModified(url, response, if_modified_since=response["Last-Modified"])
+        self.assertEqual(generate.call_count, 1)
+
+    def test_ai_response_etag_is_weak(self):
+        with mock.patch("api.services.gemini.agenerate_text", return_value="Summary"):
+            response = self.client.get("/api/aiResponse/IBM/")
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        # Stock info bodies are byte-identical for one overview
+        self.assertTrue(self.client.get("/api/stockInfo/IBM/")["ETag"].startswith('"'))
+
+    def test_ai_endpoints_404_without_generating_for_unknown_tickers(self):
+        cache_service.set_entry("overview", "NOPE", {})
+        with mock.patch("api.services.alphavantage._aget_with_retries", return_value={}), \
+                mock.patch("api.services.gemini.agenerate_text") as generate, \
+                mock.patch("api.services.gemini.astream_text") as stream:
+            for url in ("/api/aiResponse/NOPE/", "/api/aiResponse/NOPE/stream/", "/api/aiResponse/ZZZZ/"):
+                with self.subTest(url=url):
+                    response = self.client.get(url)
+                    self.assertEqual(response.status_code, 404)
+                    self.assertEqual(response.json(), {"detail": "Stock not found"})
+        generate.assert_not_called()
+        stream.assert_not_called()
+
+    def test_ai_response_etag_follows_the_fundamentals(self):
+        url = "/api/aiResponse/IBM/"
+        with mock.patch("api.services.gemini.agenerate_text", return_value="Summary"):
+            etag = self.client.get(url)["ETag"]
+            cache_service.set_entry("overview", "IBM", {**OVERVIEW, "PERatio": "30.1"})
+            response = self.client.get(url, headers={"if_none_match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+async def fake_overview(ticker):
+    # Alpha Vantage stand-in: NOPE is unknown, FAIL and BUSY fail upstream
+    if ticker == "NOPE":
+        return {}
+    if ticker == "FAIL":
+        raise alphavantage.UpstreamError("Alpha Vantage OVERVIEW failed")
+    if ticker == "BUSY":
+        raise quota.QuotaExceeded(retry_after=60)
+    return {**OVERVIEW, "Symbol": ticker, "Name": f"{ticker} Inc"}
+
+
+class StockInfoBatchTests(TestCase):
+    url = "/api/stockInfo/batch/"
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        patcher = mock.patch("api.services.alphavantage.aget_overview", side_effect=fake_overview)
+        self.upstream = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_response_shape(self):
+        response = self.client.get(self.url, {"tickers": "ibm, MSFT,IBM,NOPE,FAIL,BUSY,"})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+
+        self.assertEqual(list(body["results"]), ["IBM", "MSFT"])
+        self.assertEqual(body["results"]["IBM"], self.client.get("/api/stockInfo/IBM/").json())
+        self.assertEqual(body["errors"], {
+            "NOPE": {"detail": "Stock not found", "status": 404},
+            "FAIL": {"detail": "Upstream request failed", "status": 502},
+            "BUSY": {"detail": "Upstream rate limit reached", "status": 429},
+        })
+        # Duplicates are fetched once
+        self.assertEqual(sorted(call.args[0] for call in self.upstream.call_args_list),
+                         ["BUSY", "FAIL", "IBM", "MSFT", "NOPE"])
+
+    def test_cached_and_stored_tickers_skip_upstream(self):
+        cache_service.set_entry("overview", "IBM", OVERVIEW)
+        Stock.objects.create(symbol="MSFT", name="Microsoft", exchange="NASDAQ", country="USA",
+                             overview={**OVERVIEW, "Symbol": "MSFT"}, fetched_at=timezone.now())
+        body = self.client.get(self.url, {"tickers": "IBM,MSFT"}).json()
+        self.assertEqual(list(body["results"]), ["IBM", "MSFT"])
+        self.assertEqual(body["errors"], {})
+        self.upstream.assert_not_called()
+
+    def test_stored_row_answers_when_out_of_quota(self):
+        Stock.objects.create(symbol="BUSY", name="Busy Corp", exchange="NYSE", country="USA",
+                             fetched_at=timezone.now() - datetime.timedelta(days=30))
+        body = self.client.get(self.url, {"tickers": "BUSY"}).json()
+        self.assertEqual(body["results"]["BUSY"]["name"], "Busy Corp")
+        self.assertEqual(body["errors"], {})
+
+    @override_settings(STOCK_BATCH_MAX_TICKERS=2)
+    def test_rejects_missing_and_too_many_tickers(self):
+        for params, detail in (
+            ({}, "Missing query param: ?tickers="),
+            ({"tickers": " , "}, "Missing query param: ?tickers="),
+            ({"tickers": "A,B,C"}, "At most 2 tickers per request"),
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {"detail": detail})
+        # Duplicates do not count against the limit
+        self.assertEqual(self.client.get(self.url, {"tickers": "A,a,B"}).status_code, 200)
+        self.upstream.assert_has_calls([mock.call("A"), mock.call("B")], any_order=True)
+
+
+class AIResponseBatchTests(TestCase):
+    url = "/api/aiResponse/batch/"
+
+    def setUp(self):
+        cache.clear()
+        caches["summaries"].clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(caches["summaries"].clear)
+        self.genai = FakeGenai(["IBM", "MSFT", "ORCL"])
+        for patcher in (
+            mock.patch("api.services.alphavantage.aget_overview", side_effect=fake_overview),
+            mock.patch("api.services.gemini.get_async_client", return_value=self.genai),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_response_shape(self):
+        response = self.client.get(self.url, {"tickers": "ibm,MSFT,NOPE,FAIL,BUSY"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            "results": {
+                "IBM": {"summ_response": "Batch summary of IBM"},
+                "MSFT": {"summ_response": "Batch summary of MSFT"},
+            },
+            "errors": {
+                "NOPE": {"detail": "Stock not found", "status": 404},
+                "FAIL": {"detail": "Upstream request failed", "status": 502},
+                "BUSY": {"detail": "Upstream rate limit reached", "status": 429},
+            },
+        })
+        # Only the resolved tickers reach the model, in one call
+        self.assertEqual(self.genai.batches, [["IBM", "MSFT"]])
+
+    def test_failed_summary_is_a_per_ticker_error(self):
+        generate = self.genai.generate_content
+
+        async def failing(model, contents, config=None):
+            if config is None and "ORCL" in contents[0].parts[0].text:
+                raise RuntimeError("upstream down")
+            return await generate(model, contents, config)
+        self.genai.models.generate_content = failing
+        self.genai.batch_answer = lambda tickers: json.dumps({"IBM": "Batch summary of IBM"})
+
+        with self.assertLogs("api.views", "ERROR"):
+            body = self.client.get(self.url, {"tickers": "IBM,ORCL"}).json()
+        self.assertEqual(body["results"], {"IBM": {"summ_response": "Batch summary of IBM"}})
+        self.assertEqual(body["errors"], {"ORCL": {"detail": "Summary generation failed", "status": 502}})
+
+    @override_settings(STOCK_BATCH_MAX_TICKERS=2)
+    def test_rejects_missing_and_too_many_tickers(self):
+        self.assertEqual(self.client.get(self.url).json(), {"detail": "Missing query param: ?tickers="})
+        response = self.client.get(self.url, {"tickers": "A,B,C"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"detail": "At most 2 tickers per request"})
+        self.assertEqual(self.genai.batches + self.genai.singles, [])
+
+
+class SummaryStreamTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        caches["summaries"].clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(caches["summaries"].clear)
+        cache_service.set_entry("overview", "IBM", OVERVIEW)
+        self.chunks_sent = 0
+        self.upstream_closed = False
+
+    async def generate_content_stream(self, model, contents):
+        async def chunks():
+            try:
+                while True:
+                    self.chunks_sent += 1
+                    yield SimpleNamespace(text=f"word{self.chunks_sent} ", usage_metadata=None)
+                    await asyncio.sleep(0.01)
+            finally:
+                self.upstream_closed = True
+        return chunks()
+
+    def client_stream(self, disconnect_after):
+        async def run():
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                "scheme": "http", "path": "/api/aiResponse/IBM/stream/", "raw_path": b"/api/aiResponse/IBM/stream/",
+                "query_string": b"", "headers": [(b"host", b"testserver")], "server": ("testserver", 80),
+            }
+            communicator = ApplicationCommunicator(get_asgi_application(), scope)
+            await communicator.send_input({"type": "http.request", "body": b"", "more_body": False})
+            start = await communicator.receive_output(timeout=5)
+            events = []
+            while len(events) < disconnect_after:
+                events.append((await communicator.receive_output(timeout=5))["body"].decode())
+            await communicator.send_input({"type": "http.disconnect"})
+            await communicator.wait(timeout=5)
+            return start, events
+
+        client = SimpleNamespace(models=SimpleNamespace(generate_content_stream=self.generate_content_stream))
+        with mock.patch("api.services.gemini.get_async_client", return_value=client):
+            return async_to_sync(run)()
+
+    def test_disconnect_stops_the_upstream_generation(self):
+        start, events = self.client_stream(disconnect_after=2)
+        self.assertEqual(start["status"], 200)
+        self.assertEqual(events[0], 'data: {"text": "word1 "}\n\n')
+
+        self.assertTrue(self.upstream_closed)
+        sent = self.chunks_sent
+        async_to_sync(asyncio.sleep)(0.05)
+        self.assertEqual(self.chunks_sent, sent)
+        # A partial summary is never cached
+        self.assertIsNone(async_to_sync(summary_service.aget_cached_summary)("IBM", OVERVIEW))
+
+
+class SummaryInvalidationTests(TestCase):
+    def setUp(self):
+        caches["summaries"].clear()
+        self.addCleanup(caches["summaries"].clear)
+        self.addCleanup(cache.clear)
+
+    def store(self, overview=OVERVIEW):
+        async_to_sync(summary_service.astore_summary)("IBM", overview, "Summary")
+
+    def cached(self, overview=OVERVIEW):
+        return async_to_sync(summary_service.aget_cached_summary)("ibm", overview)
+
+    def test_summary_key_follows_the_prompt(self):
+        key = summary_service.summary_key("IBM", OVERVIEW)
+        self.assertEqual(summary_service.summary_key("ibm", dict(OVERVIEW)), key)
+        # Fields the prompt leaves out don't change the key
+        self.assertEqual(summary_service.summary_key("IBM", {**OVERVIEW, "LatestQuarter": "2024-06-30"}), key)
+        self.assertNotEqual(summary_service.summary_key("IBM", {**OVERVIEW, "PERatio": "30.1"}), key)
+        self.assertNotEqual(summary_service.summary_key("IBM", OVERVIEW, model="other-model"), key)
+
+    def test_upstream_refresh_keeps_summary_of_same_fundamentals(self):
+        self.store()
+        stock_service.upsert_from_overview(OVERVIEW)
+        self.assertEqual(self.cached(), "Summary")
+
+        stock_service.upsert_from_overview({**OVERVIEW, "PERatio": "30.1"})
+        self.assertIsNone(self.cached())
+        self.assertIsNone(caches["summaries"].get("summary:ticker:IBM"))
+
+    def test_async_upsert_invalidates(self):
+        self.store()
+        async_to_sync(stock_service.aupsert_from_overview)({**OVERVIEW, "PERatio": "30.1"})
+        self.assertIsNone(self.cached())
+
+    def test_stock_edits_drop_summary_and_cached_overview(self):
+        row = {"symbol": "IBM", "name": "IBM", "exchange": "NYSE", "country": "USA", "beta": 1.6}
+        for request in (
+            lambda: self.client.post("/api/stocks/create/", row, content_type="application/json"),
+            lambda: self.client.patch("/api/stocks/IBM/update/", {"beta": 1.5}, content_type="application/json"),
+            lambda: self.client.post("/api/stocks/bulk/", [{**row, "symbol": "ibm"}], content_type="application/json"),
+            lambda: self.client.delete("/api/stocks/IBM/delete/"),
+        ):
+            self.store()
+            cache_service.set_entry("overview", "IBM", OVERVIEW)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertLess(request().status_code, 300)
+            self.assertIsNone(self.cached())
+            self.assertIsNone(cache_service.get_entry("overview", "IBM"))
+
+    def test_create_through_endpoint(self):
+        row = {"symbol": "MSFT", "name": "Microsoft", "exchange": "NASDAQ", "country": "USA"}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/stocks/create/", row, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["symbol"], "MSFT")
+        self.assertTrue(Stock.objects.filter(symbol="MSFT").exists())
+
+    def test_invalidate_all_leaves_other_entries(self):
+        self.store()
+        cache.set("quota:alphavantage", {"minute": (1, 0)})
+        caches["summaries"].set("unrelated", 1)
+
+        summary_service.invalidate_summary()
+        self.assertIsNone(self.cached())
+        self.assertEqual(cache.get("quota:alphavantage"), {"minute": (1, 0)})
+        self.assertEqual(caches["summaries"].get("unrelated"), 1)
+
+        # Summaries stored afterwards are served again
+        self.store()
+        self.assertEqual(self.cached(), "Summary")
+
+
+class FakeGenai:
+    """Stands in for the genai async client; answers batches through ``batch_answer``."""
+
+    def __init__(self, tickers):
+        self.tickers = tickers
+        self.batches = []
+        self.singles = []
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+
+    def batch_answer(self, tickers):
+        return json.dumps({ticker: f"Batch summary of {ticker}" for ticker in tickers})
+
+    async def generate_content(self, model, contents, config=None):
+        prompt = contents[0].parts[0].text
+        if config is not None:
+            tickers = list(config.response_json_schema["properties"])
+            self.batches.append(tickers)
+            text = self.batch_answer(tickers)
+        else:
+            (ticker,) = [ticker for ticker in self.tickers if ticker in prompt]
+            self.singles.append(ticker)
+            text = f"Summary of {ticker}"
+        return SimpleNamespace(text=text, usage_metadata=None)
+
+
+@override_settings(SUMMARY_BATCH_SIZE=2)
+class SummaryBatchTests(SimpleTestCase):
+    TICKERS = ["AAA", "BBB", "CCC", "DDD", "EEE"]
+
+    def setUp(self):
+        caches["summaries"].clear()
+        self.addCleanup(caches["summaries"].clear)
+        self.overviews = {ticker: {**OVERVIEW, "Symbol": ticker, "Name": f"{ticker} Inc"} for ticker in self.TICKERS}
+        self.genai = FakeGenai(self.TICKERS)
+        patcher = mock.patch("api.services.gemini.get_async_client", return_value=self.genai)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def summaries(self, overviews=None):
+        return async_to_sync(summary_service.aget_summaries)(overviews or self.overviews)
+
+    def test_oversized_batch_is_split(self):
+        summaries = self.summaries()
+        self.assertEqual(list(summaries), self.TICKERS)
+        # A lone leftover ticker is a plain single summary
+        self.assertEqual(sorted(self.genai.batches), [["AAA", "BBB"], ["CCC", "DDD"]])
+        self.assertEqual(self.genai.singles, ["EEE"])
+        self.assertEqual(summaries["AAA"], "Batch summary of AAA")
+        self.assertEqual(summaries["EEE"], "Summary of EEE")
+
+        # Stored under the single-summary keys
+        self.assertEqual(self.summaries(), summaries)
+        self.assertEqual(async_to_sync(summary_service.aget_summary)("CCC", self.overviews["CCC"]), "Batch summary of CCC")
+        self.assertEqual(len(self.genai.batches) + len(self.genai.singles), 3)
+
+    def test_unparseable_batch_falls_back_per_ticker(self):
+        self.genai.batch_answer = lambda tickers: "Here are the summaries you asked for"
+        overviews = {ticker: self.overviews[ticker] for ticker in ["AAA", "BBB"]}
+        with self.assertLogs("api.services.summary_service", "WARNING"):
+            summaries = self.summaries(overviews)
+        self.assertEqual(summaries, {"AAA": "Summary of AAA", "BBB": "Summary of BBB"})
+        self.assertEqual(sorted(self.genai.singles), ["AAA", "BBB"])
+
+    def test_tickers_missing_from_the_answer_fall_back(self):
+        self.genai.batch_answer = lambda tickers: json.dumps({"AAA": "Batch summary of AAA", "BBB": "  "})
+        overviews = {ticker: self.overviews[ticker] for ticker in ["AAA", "BBB"]}
+        self.assertEqual(self.summaries(overviews), {"AAA": "Batch summary of AAA", "BBB": "Summary of BBB"})
+        self.assertEqual(self.genai.singles, ["BBB"])
+
+    def test_failed_batch_call_fails_its_tickers_only(self):
+        generate = self.genai.generate_content
+
+        async def failing(model, contents, config=None):
+            if config is not None and "AAA" in config.response_json_schema["properties"]:
+                raise RuntimeError("upstream down")
+            return await generate(model, contents, config)
+        self.genai.models.generate_content = failing
+
+        summaries = self.summaries({ticker: self.overviews[ticker] for ticker in ["AAA", "BBB", "CCC", "DDD"]})
+        self.assertIsInstance(summaries["AAA"], RuntimeError)
+        self.assertIsInstance(summaries["BBB"], RuntimeError)
+        self.assertEqual(summaries["CCC"], "Batch summary of CCC")
+        self.assertEqual(self.genai.singles, [])
+
+
+FULL_OVERVIEW = {
+    "Symbol": "IBM", "AssetType": "Common Stock", "Name": "International Business Machines",
+    "Description": "IBM provides integrated solutions and services worldwide.", "Exchange": "NYSE",
+    "Currency": "USD", "Country": "USA", "Sector": "TECHNOLOGY", "Industry": "COMPUTER & OFFICE EQUIPMENT",
+    "OfficialSite": "None", "MarketCapitalization": "212000000000", "EBITDA": "14600000000",
+    "PERatio": "22.5", "PEGRatio": "None", "BookValue": "25.3", "DividendYield": "0.0312", "EPS": "8.14",
+    "RevenueTTM": "62000000000", "GrossProfitTTM": "35000000000", "ProfitMargin": "0.091",
+    "OperatingMarginTTM": "0.152", "ReturnOnAssetsTTM": "0.047", "ReturnOnEquityTTM": "0.31",
+    "QuarterlyEarningsGrowthYOY": "-0.12", "QuarterlyRevenueGrowthYOY": "0.018",
+    "AnalystTargetPrice": "203.5", "AnalystRatingStrongBuy": "3", "AnalystRatingBuy": "7",
+    "AnalystRatingHold": "9", "AnalystRatingSell": "1", "AnalystRatingStrongSell": "-",
+    "ForwardPE": "19.8", "PriceToBookRatio": "7.9", "Beta": "0.71", "52WeekHigh": "199.18",
+    "52WeekLow": "135.87", "50DayMovingAverage": "185.2", "200DayMovingAverage": "170.3",
+    "LatestQuarter": "2024-06-30",
+}
+
+
+@override_settings(PROMPT_TOKEN_BUDGET=400, PROMPT_DESCRIPTION_TOKENS=120)
+class PromptBuilderTests(SimpleTestCase):
+    LONG_DESCRIPTION = " ".join(f"IBM sentence number {i} about the business." for i in range(200))
+
+    def test_selects_and_formats_the_summary_fields(self):
+        facts = dict(prompt_builder.select_facts(FULL_OVERVIEW))
+        self.assertEqual(facts["Company"], "International Business Machines")
+        self.assertEqual(facts["Sector"], "Technology")
+        self.assertEqual(facts["Industry"], "Computer & Office Equipment")
+        self.assertEqual(facts["Market cap"], "212.00B")
+        self.assertEqual(facts["Quarterly earnings growth (YoY)"], "-12.00%")
+        self.assertEqual(facts["P/E"], "22.50")
+        self.assertEqual(facts["Analyst ratings"], "3 strong buy, 7 buy, 9 hold, 1 sell, 0 strong sell")
+        # Missing values are left out rather than sent as "None"
+        self.assertNotIn("PEG ratio", facts)
+        # Fields a summary doesn't draw on never reach the prompt
+        prompt = prompt_builder.build_prompt("ibm", FULL_OVERVIEW)
+        for unused in ("USA", "Common Stock", "2024-06-30", "25.3"):
+            self.assertNotIn(unused, prompt)
+
+        labels = [label for label, _ in prompt_builder.select_facts(FULL_OVERVIEW)]
+        self.assertEqual(labels, [label for label, _ in prompt_builder.PROMPT_FIELDS.values() if label in labels])
+
+    def test_fits_the_budget_by_cutting_the_description_first(self):
+        overview = {**FULL_OVERVIEW, "Description": self.LONG_DESCRIPTION}
+        prompt = prompt_builder.build_prompt("IBM", overview)
+        self.assertLessEqual(prompt_builder.estimate_tokens(prompt), 400)
+        # Every field still fits; only the description was shortened, at a sentence end
+        self.assertEqual(prompt.count("\n") - prompt_builder.PROMPT_TEMPLATE.count("\n"),
+                         len(prompt_builder.select_facts(overview)))
+        about = prompt.rsplit("About: ", 1)[1]
+        self.assertTrue(self.LONG_DESCRIPTION.startswith(about))
+        self.assertTrue(about.endswith("business."))
+        self.assertLessEqual(prompt_builder.estimate_tokens(about), 120)
+
+    def test_drops_the_least_important_fields_under_a_tight_budget(self):
+        overview = {**FULL_OVERVIEW, "Description": self.LONG_DESCRIPTION}
+        for budget in (150, 200, 300):
+            with self.subTest(budget=budget):
+                prompt = prompt_builder.build_prompt("IBM", overview, budget=budget)
+                self.assertLessEqual(prompt_builder.estimate_tokens(prompt), budget)
+                self.assertIn("Company: International Business Machines", prompt)
+        tight = prompt_builder.build_prompt("IBM", overview, budget=150)
+        self.assertNotIn("Return on assets", tight)
+        self.assertNotIn("About: ", tight)
+
+    def test_truncate(self):
+        text = "First sentence here. Second sentence is a little longer than the first."
+        self.assertEqual(prompt_builder.truncate(text, 100), text)
+        self.assertEqual(prompt_builder.truncate(text, 8), "First sentence here.")
+        # No sentence end in reach: cut at a word
+        self.assertEqual(prompt_builder.truncate("one two three four five six", 3), "one two...")
+        self.assertEqual(prompt_builder.truncate(text, 0), "")
+
+    def test_batch_prompt_carries_each_single_prompts_facts(self):
+        msft = {**FULL_OVERVIEW, "Symbol": "MSFT", "Name": "Microsoft"}
+        batch = prompt_builder.build_batch_prompt({"ibm": FULL_OVERVIEW, "MSFT": msft})
+        for ticker, overview in (("IBM", FULL_OVERVIEW), ("MSFT", msft)):
+            facts = prompt_builder.build_prompt(ticker, overview).split("\n\n", 1)[1]
+            self.assertIn(f"Ticker: {ticker}\n{facts}", batch)
+
+
+class OverviewRoundTripTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_stored_overview_matches_upstream(self):
+        from api.services import overview_service
+
+        stock_service.upsert_from_overview(FULL_OVERVIEW)
+        stored = stock_service.get_overview_from_db("ibm")
+        self.assertEqual(stored, FULL_OVERVIEW)
+        self.assertEqual(summary_service.summary_key("IBM", stored), summary_service.summary_key("IBM", FULL_OVERVIEW))
+
+        # The batch path reads fresh rows through aget_stocks_fetched
+        self.assertEqual(async_to_sync(overview_service.aget_overviews)(["IBM"]), {"IBM": FULL_OVERVIEW})
+
+    def test_edited_columns_become_the_source(self):
+        stock_service.upsert_from_overview(FULL_OVERVIEW)
+        response = self.client.patch("/api/stocks/IBM/update/", {"beta": 1.5}, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("overview", response.json())
+
+        stock = Stock.objects.get(symbol="IBM")
+        self.assertIsNone(stock.overview)
+        self.assertEqual(stock_service.overview_from_stock(stock)["Beta"], "1.5")
+
+        stock_service.upsert_from_overview(FULL_OVERVIEW)
+        row = {"symbol": "IBM", "name": "IBM", "exchange": "NYSE", "country": "USA", "beta": 1.6}
+        self.client.post("/api/stocks/bulk/", [row], content_type="application/json")
+        self.assertIsNone(Stock.objects.get(symbol="IBM").overview)
+
+    def test_payload_stays_out_of_the_api(self):
+        stock_service.upsert_from_overview(FULL_OVERVIEW)
+        self.assertNotIn("overview", self.client.get("/api/stocks/IBM/").json())
+        self.assertEqual(self.client.get("/api/stocks/?fields=overview").status_code, 400)
+
+
+def index_entry(symbol, name=""):
+    return {"symbol": symbol, "name": name, "type": "Equity"}
+
+
+class PrewarmTests(TransactionTestCase):
+    # The command runs its own event loop, whose ORM calls use another connection
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.state_file = Path(directory.name) / "prewarm.json"
+        self.fetched = []
+
+    async def upstream(self, params):
+        self.fetched.append(params["symbol"])
+        return {**FULL_OVERVIEW, "Symbol": params["symbol"]}
+
+    def prewarm(self, *tickers, budget=100, options=()):
+        # A fresh scheduler per run, as for a new process
+        scheduler = quota.QuotaScheduler(per_minute=100, per_day=100, background_reserve=0.2)
+        out = io.StringIO()
+        with mock.patch.object(quota, "scheduler", scheduler), \
+                mock.patch("api.services.alphavantage._aget_with_retries", side_effect=self.upstream):
+            call_command(
+                "prewarm", "--no-summaries", f"--tickers={','.join(tickers)}", f"--budget={budget}",
+                "--concurrency=1", f"--state-file={self.state_file}", *options, stdout=out, stderr=io.StringIO(),
+            )
+        return out.getvalue()
+
+    def test_fetches_at_background_priority(self):
+        priorities = []
+        fetch = self.upstream
+
+        async def upstream(params):
+            priorities.append(quota.current_priority())
+            return await fetch(params)
+        self.upstream = upstream
+
+        self.prewarm("IBM")
+        self.assertEqual(priorities, [quota.BACKGROUND])
+        self.assertTrue(Stock.objects.filter(symbol="IBM").exists())
+        self.assertFalse(self.state_file.exists())
+
+    def test_daily_budget_leaves_the_rest_for_the_next_run(self):
+        output = self.prewarm("AAA", "BBB", "CCC", budget=2)
+        self.assertIn("skipped=1", output)
+        self.assertEqual(self.fetched, ["AAA", "BBB"])
+        state = json.loads(self.state_file.read_text())
+        self.assertEqual((state["done"], state["av_calls"]), (["AAA", "BBB"], 2))
+
+        # Today's calls count against the budget of the next run
+        output = self.prewarm("AAA", "BBB", "CCC", budget=2)
+        self.assertIn("skipped=1", output)
+        self.assertEqual(self.fetched, ["AAA", "BBB"])
+
+    def test_resumes_where_the_last_run_stopped(self):
+        self.prewarm("AAA", "BBB", "CCC", budget=2)
+
+        # The stored ticker list wins over the arguments of a resumed run
+        output = self.prewarm("ZZZ", budget=3)
+        self.assertIn("Resuming", output)
+        self.assertIn("warmed=1", output)
+        self.assertEqual(self.fetched, ["AAA", "BBB", "CCC"])
+        self.assertFalse(self.state_file.exists())
+
+    def test_restart_discards_the_unfinished_run(self):
+        self.prewarm("AAA", "BBB", budget=1)
+        self.prewarm("ZZZ", options=["--restart"])
+        self.assertEqual(self.fetched, ["AAA", "ZZZ"])
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "FTS5 index is SQLite only")
+class StockSearchMigrationTests(TransactionTestCase):
+    # Migrations that remake api_stock on SQLite drop the FTS triggers, so the
+    # index is checked against the fully migrated schema
+
+    def symbols(self, query):
+        return [result["symbol"] for result in stock_search.search_stocks(query)]
+
+    def assertIndexFollowsWrites(self):
+        stock = Stock.objects.create(symbol="IBM", name="International Business Machines", description="Mainframes")
+        self.assertEqual(self.symbols("mainframe"), ["IBM"])
+
+        stock.description = "Hybrid cloud"
+        stock.save()
+        self.assertEqual(self.symbols("mainframe"), [])
+        self.assertEqual(self.symbols("cloud"), ["IBM"])
+
+        # Bulk upserts go through raw INSERT ... ON CONFLICT
+        stock_service.bulk_upsert_stocks([{"symbol": "IBM", "name": "IBM", "exchange": "NYSE", "country": "USA",
+                                           "description": "Quantum computing"}])
+        self.assertEqual(self.symbols("quantum"), ["IBM"])
+        self.assertEqual(self.symbols("cloud"), [])
+
+        Stock.objects.filter(symbol="IBM").delete()
+        self.assertEqual(self.symbols("quantum"), [])
+        self.assertEqual(self.symbols("ibm"), [])
+
+    def test_index_follows_writes_after_all_migrations(self):
+        self.assertIndexFollowsWrites()
+
+    def test_index_survives_migrating_back_and_forth(self):
+        executor = MigrationExecutor(connection)
+        latest = executor.loader.graph.leaf_nodes("api")
+        self.addCleanup(lambda: MigrationExecutor(connection).migrate(latest))
+
+        executor.migrate([("api", "0005_stock_list_indexes")])
+        with connection.cursor() as cursor:
+            self.assertNotIn(fts.FTS_TABLE, connection.introspection.table_names(cursor))
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(latest)
+        self.assertIndexFollowsWrites()
+
+
+class SymbolIndexTests(SimpleTestCase):
+    def build(self, *entries):
+        index = symbol_index.SymbolIndex()
+        for entry in entries:
+            index.add(index_entry(*entry))
+        return index
+
+    def symbols(self, index, query):
+        return [match["symbol"] for match in index.search(query)]
+
+    def test_class_shares_stay_one_token(self):
+        index = self.build(("BRK.A", "Berkshire Hathaway Inc"), ("BRK.B", "Berkshire Hathaway Inc"),
+                           ("RDS-A", "Royal Dutch Shell"), ("B", "Barnes Group"))
+        self.assertEqual(index.search("brk.b")[0]["symbol"], "BRK.B")
+        self.assertEqual(index.search("brk.b")[0]["matchScore"], 1.0)
+        self.assertEqual(index.search("RDS-A")[0]["matchScore"], 1.0)
+        self.assertEqual(self.symbols(index, "brk"), ["BRK.A", "BRK.B"])
+
+    def test_dashed_name_words_match_in_part(self):
+        index = self.build(("KO", "Coca-Cola Co"), ("RYCEY", "Rolls-Royce Holdings"))
+        self.assertEqual(self.symbols(index, "coca-cola"), ["KO"])
+        self.assertEqual(self.symbols(index, "cola"), ["KO"])
+        self.assertEqual(self.symbols(index, "royce"), ["RYCEY"])
+
+    @mock.patch.object(symbol_index, "NODE_TOP_K", 3)
+    def test_removal_refills_trimmed_completions(self):
+        index = self.build(*[(f"AB{c}", "") for c in "CDEFG"])
+        self.assertEqual(self.symbols(index, "ab"), ["ABC", "ABD", "ABE"])
+        index.remove("ABC")
+        index.remove("ABD")
+        self.assertEqual(self.symbols(index, "ab"), ["ABE", "ABF", "ABG"])
+
+    @mock.patch.object(symbol_index, "NODE_TOP_K", 3)
+    def test_top_lists_match_a_fresh_build(self):
+        rng = random.Random(0)
+        names = ["", "Acme", "Acme Bank", "Ab-Co", "Bank Of A.B"]
+        live = {}
+        index = symbol_index.SymbolIndex()
+        for _ in range(400):
+            symbol = "".join(rng.choice("AB.") for _ in range(rng.randint(1, 4))).strip(".") or "A"
+            if symbol in live and rng.random() < 0.5:
+                index.remove(symbol)
+                del live[symbol]
+            else:
+                live[symbol] = rng.choice(names)
+                index.add(index_entry(symbol, live[symbol]))
+
+        fresh = self.build(*live.items())
+
+        def tops(node, prefix="", found=None):
+            found = {} if found is None else found
+            if node.top:
+                found[prefix] = node.top
+            for char, child in node.children.items():
+                tops(child, prefix + char, found)
+            return found
+
+        self.assertEqual(tops(index._root), tops(fresh._root))
+
+
+def naive_smooth(values, alpha, period):
+    """Seed with the mean of the first ``period`` values, then smooth bar by bar."""
+    out = [math.nan] * len(values)
+    first = next((i for i, value in enumerate(values) if not math.isnan(value)), len(values))
+    seed_at = first + period - 1
+    if seed_at >= len(values):
+        return out
+    out[seed_at] = current = sum(values[first:seed_at + 1]) / period
+    for t in range(seed_at + 1, len(values)):
+        current = (1 - alpha) * current + alpha * values[t]
+        out[t] = current
+    return out
+
+
+def naive_ema(values, period):
+    return naive_smooth(values, 2 / (period + 1), period)
+
+
+def naive_rsi(values, period):
+    changes = [math.nan] + [b - a for a, b in zip(values, values[1:])]
+    gains = naive_smooth([max(c, 0.0) if not math.isnan(c) else c for c in changes], 1 / period, period)
+    losses = naive_smooth([max(-c, 0.0) if not math.isnan(c) else c for c in changes], 1 / period, period)
+    return [
+        math.nan if math.isnan(loss) else 100.0 if loss == 0 else 100 - 100 / (1 + gain / loss)
+        for gain, loss in zip(gains, losses)
+    ]
+
+
+def naive_macd(values, fast, slow, signal):
+    line = [a - b for a, b in zip(naive_ema(values, fast), naive_ema(values, slow))]
+    signal_line = naive_smooth(line, 2 / (signal + 1), signal)
+    return line, signal_line
+
+
+def daily_series(closes: dict) -> dict:
+    return {price_history.SERIES_FIELD: {
+        day: {"1. open": close, "2. high": close, "3. low": close, "4. close": close, "5. volume": "100"}
+        for day, close in closes.items()
+    }}
+
+
+class PriceHistoryTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overrides = override_settings(PRICE_HISTORY_DIR=directory.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def append(self, closes: dict) -> int:
+        return price_history.append_bars("IBM", price_history.bars_from_daily_series(daily_series(closes)))
+
+    def closes(self, **bounds) -> dict:
+        bars = price_history.as_lists(price_history.read_range("IBM", columns=["close"], **bounds))
+        return dict(zip(bars["date"], bars["close"]))
+
+    def test_appends_only_newer_bars(self):
+        self.assertEqual(self.append({"2024-01-02": "10", "2024-01-03": "11"}), 2)
+        self.assertEqual(self.append({"2024-01-02": "10", "2024-01-03": "11", "2024-01-04": "12"}), 2)
+        self.assertEqual(self.closes(), {"2024-01-02": 10.0, "2024-01-03": 11.0, "2024-01-04": 12.0})
+        self.assertEqual(price_history.last_date("IBM"), datetime.date(2024, 1, 4))
+
+    def test_replaces_the_last_bar(self):
+        self.append({"2024-01-02": "10", "2024-01-03": "11"})
+        # The session of the 3rd closed higher than the intraday bar stored
+        self.assertEqual(self.append({"2024-01-03": "11.5"}), 1)
+        self.assertEqual(self.closes(), {"2024-01-02": 10.0, "2024-01-03": 11.5})
+
+    def test_truncates_a_torn_write(self):
+        self.append({"2024-01-02": "10", "2024-01-03": "11"})
+        # An append cut off after the first columns and half way through one
+        directory = price_history._ticker_dir("IBM")
+        with open(directory / "date.bin", "ab") as f:
+            f.write(np.array(["2024-01-04"], dtype="<M8[D]").tobytes())
+        with open(directory / "open.bin", "ab") as f:
+            f.write(b"\0\0\0")
+        self.assertEqual(self.closes(), {"2024-01-02": 10.0, "2024-01-03": 11.0})
+
+        self.append({"2024-01-04": "12"})
+        self.assertEqual(self.closes(), {"2024-01-02": 10.0, "2024-01-03": 11.0, "2024-01-04": 12.0})
+        self.assertEqual((directory / "open.bin").stat().st_size, 3 * 8)
+
+    def test_read_range_bounds_are_inclusive(self):
+        self.append({"2024-01-02": "10", "2024-01-03": "11", "2024-01-05": "12", "2024-01-08": "13"})
+        self.assertEqual(self.closes(start=datetime.date(2024, 1, 3), end=datetime.date(2024, 1, 5)),
+                         {"2024-01-03": 11.0, "2024-01-05": 12.0})
+        # Bounds between bars, outside the history, and an empty range
+        self.assertEqual(list(self.closes(start=datetime.date(2024, 1, 4))), ["2024-01-05", "2024-01-08"])
+        self.assertEqual(list(self.closes(end=datetime.date(2024, 1, 1))), [])
+        self.assertEqual(list(self.closes(start=datetime.date(2024, 1, 9))), [])
+        self.assertEqual(len(self.closes(start=datetime.date(2023, 1, 1), end=datetime.date(2025, 1, 1))), 4)
+        self.assertEqual(self.closes(start=datetime.date(2024, 1, 6), end=datetime.date(2024, 1, 7)), {})
+
+    def test_read_range_without_history(self):
+        bars = price_history.read_range("IBM")
+        self.assertEqual(list(bars), list(price_history.COLUMNS))
+        self.assertTrue(all(len(values) == 0 for values in bars.values()))
+        with self.assertRaises(price_history.InvalidTicker):
+            price_history.read_range("../IBM")
+
+    def test_unknown_ticker_is_remembered(self):
+        unknown = {"Error Message": "Invalid API call."}
+        with mock.patch("api.services.alphavantage.aget_daily_series", return_value=unknown) as upstream:
+            for _ in range(2):
+                with self.assertRaises(price_history.UnknownTicker):
+                    async_to_sync(price_history.arefresh)("NOPE")
+        upstream.assert_called_once()
+
+
+class IndicatorTests(SimpleTestCase):
+    BARS = 700
+
+    def setUp(self):
+        # Long enough to cross several closed-form blocks in _recurrence
+        t = np.arange(self.BARS)
+        self.close = 100 + 10 * np.sin(t / 7) + 0.05 * t + 3 * np.cos(t / 3)
+        # Rows: full history, a shorter right-aligned one, one only a bar
+        # longer than the seed window, one too short, and no history at all
+        self.lengths = [self.BARS, 250, 21, 5, 0]
+        self.matrix = indicators._stack([self.close[-length:] if length else [] for length in self.lengths])
+
+    def rows(self):
+        for row, values in enumerate(self.matrix):
+            yield row, list(values)
+
+    def assertSeries(self, actual, expected):
+        np.testing.assert_allclose(actual, np.array(expected, dtype=float), rtol=1e-9, atol=1e-9, equal_nan=True)
+
+    def test_ema_matches_naive_loop(self):
+        for period in (2, 5, 20, 200):
+            result = indicators.ema(self.matrix, period)["value"]
+            for row, values in self.rows():
+                with self.subTest(period=period, row=row):
+                    self.assertSeries(result[row], naive_ema(values, period))
+
+    def test_rsi_matches_naive_loop(self):
+        for period in (2, 14):
+            result = indicators.rsi(self.matrix, period)["value"]
+            for row, values in self.rows():
+                with self.subTest(period=period, row=row):
+                    self.assertSeries(result[row], naive_rsi(values, period))
+
+    def test_rsi_without_losses_is_100(self):
+        result = indicators.rsi(np.arange(1.0, 31.0)[None, :], 14)["value"][0]
+        self.assertTrue(np.isnan(result[:14]).all())
+        self.assertTrue((result[14:] == 100).all())
+
+    def test_macd_matches_naive_loop(self):
+        result = indicators.macd(self.matrix, 12, 26, 9)
+        for row, values in self.rows():
+            line, signal_line = naive_macd(values, 12, 26, 9)
+            with self.subTest(row=row):
+                self.assertSeries(result["macd"][row], line)
+                self.assertSeries(result["signal"][row], signal_line)
+                self.assertSeries(result["histogram"][row], [a - b for a, b in zip(line, signal_line)])
+
+    def test_short_histories_are_all_nan(self):
+        for series in (
+            indicators.ema(self.matrix, 20)["value"],
+            indicators.rsi(self.matrix, 14)["value"],
+            indicators.macd(self.matrix)["signal"],
+        ):
+            self.assertTrue(np.isnan(series[self.lengths.index(5)]).all())
+            self.assertTrue(np.isnan(series[self.lengths.index(0)]).all())
+
+
+class InlineThread:
+    """Runs the target on ``start()`` so background refreshes finish inside the test."""
+
+    def __init__(self, target, daemon=None):
+        self.target = target
+
+    def start(self):
+        self.target()
+
+
+class StaleRefreshTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        patcher = mock.patch.object(cache_service, "connection")
+        self.connection = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_stale(self, data_type, ident):
+        key = cache_service._cache_key(data_type, ident)
+        entry = cache.get(key)
+        entry["fetched_at"] -= cache_service._ttl(data_type) + 1
+        cache.set(key, entry)
+
+    def threads(self, thread):
+        # Only the refresh threads; async_to_sync needs real ones
+        return mock.patch.object(cache_service, "threading", SimpleNamespace(Thread=thread))
+
+    def get(self, refresh):
+        # A stale entry is served as is, never fetched in the request
+        afetch = mock.AsyncMock(side_effect=AssertionError("fetched on a stale hit"))
+        return async_to_sync(cache_service.aget_or_fetch)("overview", "IBM", afetch, refresh)
+
+    def test_stale_entry_is_served_then_refreshed(self):
+        cache_service.set_entry("overview", "IBM", {"v": 1})
+        self.make_stale("overview", "IBM")
+
+        with self.threads(InlineThread), mock.patch.object(cache, "aadd", wraps=cache.aadd) as aadd:
+            data = self.get(lambda: {"v": 2})
+
+        # The refresh lock is taken without a blocking cache call on the event loop
+        aadd.assert_awaited_once()
+        self.assertEqual(data, {"v": 1})
+        self.assertEqual(cache_service.get_entry("overview", "IBM")["data"], {"v": 2})
+        self.assertIsNone(cache.get("overview:IBM:refreshing"))
+        self.connection.close.assert_called_once_with()
+
+    def test_stale_entries_in_a_batch_are_refreshed(self):
+        cache_service.set_entry("overview", "IBM", {"v": 1})
+        cache_service.set_entry("overview", "MSFT", {"v": 1})
+        self.make_stale("overview", "IBM")
+        refresh = mock.Mock(return_value={"v": 2})
+
+        with self.threads(InlineThread):
+            found = async_to_sync(cache_service.aget_many)("overview", ["IBM", "MSFT", "NOPE"], refresh)
+
+        self.assertEqual(found, {"IBM": {"v": 1}, "MSFT": {"v": 1}})
+        refresh.assert_called_once_with("IBM")
+        self.assertEqual(cache_service.get_entry("overview", "IBM")["data"], {"v": 2})
+
+    def test_one_refresh_per_key_while_locked(self):
+        cache_service.set_entry("overview", "IBM", {"v": 1})
+        self.make_stale("overview", "IBM")
+        fetch = mock.Mock(return_value={"v": 2})
+
+        thread = mock.Mock()
+        with self.threads(thread):
+            self.get(fetch)
+            self.get(fetch)
+
+        thread.assert_called_once()
+        fetch.assert_not_called()
+
+    def test_failed_refresh_keeps_entry_and_releases_lock(self):
+        cache_service.set_entry("overview", "IBM", {"v": 1})
+        self.make_stale("overview", "IBM")
+
+        with self.threads(InlineThread), \
+                self.assertLogs("api.services.cache_service", "ERROR"):
+            self.get(mock.Mock(side_effect=RuntimeError))
+            self.get(lambda: {})
+
+        self.assertEqual(cache_service.get_entry("overview", "IBM")["data"], {"v": 1})
+        self.assertIsNone(cache.get("overview:IBM:refreshing"))
+        self.assertEqual(self.connection.close.call_count, 2)
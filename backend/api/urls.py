@@ -9,15 +9,24 @@ urlpatterns = [
     # General
     # -------------------------
     path("hello/", views.hello, name="hello"),
+    path("cacheStats/", views.cache_stats, name="cache_stats"),
+    path("upstreamStats/", views.upstream_stats, name="upstream_stats"),
+    path("metrics/", views.metrics_view, name="metrics"),
 
 
     # -------------------------
     # Stock Data (External APIs)
     # -------------------------
+    path("stockInfo/batch/", views.get_stock_info_batch, name="stock_info_batch"),
+    path("stockInfo/batch/indicators/", views.get_indicators_batch, name="indicators_batch"),
     path("stockInfo/<str:ticker>/", views.get_stock_info, name="stock_info"),
+    path("stockInfo/<str:ticker>/prices/", views.get_price_history, name="price_history"),
+    path("stockInfo/<str:ticker>/indicators/", views.get_indicators, name="indicators"),
     path("devstockInfo/<str:ticker>/", views.dev_get_stock_info, name="dev_stock_info"),
 
+    path("aiResponse/batch/", views.get_ai_response_batch, name="ai_response_batch"),
     path("aiResponse/<str:ticker>/", views.get_ai_response, name="ai_response"),
+    path("aiResponse/<str:ticker>/stream/", views.stream_ai_response, name="ai_response_stream"),
 
     path("stockSearch/", views.search_stock, name="stock_search"),
     path("devstockSearch/", views.dev_stock_search, name="dev_stock_search"),
@@ -28,12 +37,13 @@ urlpatterns = [
     # -------------------------
     path("stocks/", views.list_stocks_view, name="list_stocks"),
     path("stocks/create/", views.create_stock_view, name="create_stock"),
+    path("stocks/bulk/", views.bulk_upsert_stocks_view, name="bulk_upsert_stocks"),
+    path("stocks/search/", views.search_stocks_db_view, name="search_stock_db"),
+    path("stocks/screen/", views.screen_stocks_view, name="screen_stocks"),
     path("stocks/<str:symbol>/", views.get_stock_view, name="get_stock"),
     path("stocks/<str:symbol>/update/", views.update_stock_view, name="update_stock"),
     path("stocks/<str:symbol>/delete/", views.delete_stock_view, name="delete_stock"),
 
-    path("stocks/search/", views.search_stock, name="search_stock_db"),
-
 
     # -------------------------
     # User Auth
@@ -41,6 +51,7 @@ urlpatterns = [
     path("users/register/", views.register_user, name="register_user"),
     path("users/login/", EmailTokenObtainPairView.as_view(), name="login_user"),
     path("users/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("users/password/", views.change_password_view, name="change_password"),
 
 
     # -------------------------
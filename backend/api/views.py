@@ -1,49 +1,59 @@
-from rest_framework.decorators import api_view, permission_classes, authentication_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.decorators import api_view, permission_classes, authentication_classes, parser_classes, renderer_classes
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.authentication import BasicAuthentication
 from django.shortcuts import render
 from django.core.exceptions import ObjectDoesNotExist
 from rest_framework.response import Response
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.conf import settings
-import requests
-from google import genai
-from google.genai import types
-
+import asyncio
+import hmac
+import json
+import logging
+from datetime import date
+from asgiref.sync import sync_to_async
+
+from . import conditional
+from .authentication import CachedJWTAuthentication
 from .models import Stock
-from api.serializers import StockSerializer, UserSerializer, UserCreateSerializer, UserUpdateSerializer, EmailTokenObtainPairSerializer
+from .pagination import StockCursorPagination
+from .parsers import NDJSONParser
+from .renderers import FastJSONRenderer
+from api.serializers import StockSerializer, stock_rows_data, UserSerializer, UserCreateSerializer, EmailTokenObtainPairSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-
-
-class EmailTokenObtainPairSerializer(TokenObtainPairSerializer):
-    username_field = "email"
 
 
 class EmailTokenObtainPairView(TokenObtainPairView):
     serializer_class = EmailTokenObtainPairSerializer
 
 from api.services.stock_service import (
+    STOCK_COLUMNS,
+    bulk_upsert_stocks,
     create_stock,
     get_stock_by_symbol,
-    list_stocks,
+    get_stock_row,
+    list_stock_rows,
     update_stock,
     delete_stock,
 )
 from api.services.user_service import (
+    change_password,
     create_user,
     get_user_by_id,
     update_user_by_id,
     delete_user_by_id,
 )
-import os
-from dotenv import load_dotenv
+from api.services import alphavantage, cache_service, indicators, latency, metrics, popularity, price_history, quota, screener, symbol_index, user_cache
+from api.services.screener import screen_stocks
+from api.services.stock_search import search_stocks
+from api.services.overview_service import aget_overview, aget_overview_modified, aget_overviews, is_valid_overview
+from api.services.summary_service import aget_summaries, aget_summary, astream_summary, summary_key
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-GOOGLE_API_KEY = os.getenv("GEMINI_KEY")
-
-AV_KEY = settings.AV_KEY
 
 def format_currency(value):
     if not value:
@@ -79,58 +89,276 @@ def format_price(value):
 def hello(request):
     return JsonResponse({"message": "Hello World!"})
 
-def get_stock_info(request, ticker):
+def staff_denied(request):
+    """IsAdminUser for plain Django views: the error response, or ``None`` for a staff JWT."""
+    try:
+        authenticated = CachedJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        authenticated = None
+    if authenticated is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+    if not authenticated[0].is_staff:
+        return JsonResponse({"detail": "You do not have permission to perform this action."}, status=403)
+    return None
 
-    url = f"https://www.alphavantage.co/query"
-    params = {
-        "function": "OVERVIEW",
-        "symbol": ticker,
-        "apikey": AV_KEY
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    return Response(cache_service.get_cache_stats())
+
+def metrics_view(request):
+    # Scrapers send the configured token; without one, only staff may read
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), expected):
+            return JsonResponse({"detail": "Invalid metrics token"}, status=401)
+    else:
+        denied = staff_denied(request)
+        if denied is not None:
+            return denied
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def upstream_stats(request):
+    return Response({
+        "latency": latency.get_latency_stats(),
+        # A lockless snapshot, so polling this never queues behind acquire()
+        "alphavantage_quota": quota.scheduler.remaining(),
+    })
+
+def upstream_error():
+    return JsonResponse({"detail": "Upstream request failed"}, status=502)
+
+def quota_exceeded(error):
+    retry_after = max(1, round(error.retry_after))
+    response = JsonResponse(
+        {"detail": "Upstream rate limit reached, try again later", "retry_after": retry_after},
+        status=429,
+    )
+    response["Retry-After"] = str(retry_after)
+    return response
+
+def format_stock_info(data):
+    return {
+        "symbol": data.get("Symbol"),
+        "asset_type": data.get("AssetType"),
+        "name": data.get("Name"),
+        "description": data.get("Description"),
+        "exchange": data.get("Exchange") or "N/A",
+        "currency": data.get("Currency") or "N/A",
+        "country": data.get("Country") or "N/A",
+        "sector": data.get("Sector") or "N/A",
+        "industry": data.get("Industry") or "N/A",
+        "address": data.get("Address") or "N/A",
+        "website": data.get("OfficialSite") or "N/A",
+
+        "market_cap": format_currency(data.get("MarketCapitalization")),
+        "ebitda": format_currency(data.get("EBITDA")),
+        "pe_ratio": data.get("PERatio") or "N/A",
+        "peg_ratio": data.get("PEGRatio") or "N/A",
+        "eps": format_price(data.get("EPS")),
+        "book_value": format_price(data.get("BookValue")),
+
+        "revenue_ttm": format_currency(data.get("RevenueTTM")),
+        "gross_profit_ttm": format_currency(data.get("GrossProfitTTM")),
+
+        "profit_margin": format_percent(data.get("ProfitMargin")),
+        "operating_margin_ttm": format_percent(data.get("OperatingMarginTTM")),
+        "return_on_assets": format_percent(data.get("ReturnOnAssetsTTM")),
+        "return_on_equity": format_percent(data.get("ReturnOnEquityTTM")),
+
+        "beta": data.get("Beta") or "N/A",
+        "52_week_high": format_price(data.get("52WeekHigh")),
+        "52_week_low": format_price(data.get("52WeekLow")),
+        "50_day_moving_average": format_price(data.get("50DayMovingAverage")),
+        "200_day_moving_average": format_price(data.get("200DayMovingAverage")),
+
+        "analyst_rating_strong_buy": data.get("AnalystRatingStrongBuy"),
+        "analyst_rating_buy": data.get("AnalystRatingBuy"),
+        "analyst_rating_hold": data.get("AnalystRatingHold"),
+        "analyst_rating_sell": data.get("AnalystRatingSell"),
+        "analyst_rating_strong_sell": data.get("AnalystRatingStrongSell"),
+        "analyst_target_price": data.get("AnalystTargetPrice")
     }
-    r = requests.get(url, params=params)
-    data = r.json()
-    print(data)
-    return JsonResponse({
-            "symbol": data.get("Symbol"),
-            "asset_type": data.get("AssetType"),
-            "name": data.get("Name"),
-            "description": data.get("Description"),
-            "exchange": data.get("Exchange") or "N/A",
-            "currency": data.get("Currency") or "N/A",
-            "country": data.get("Country") or "N/A",
-            "sector": data.get("Sector") or "N/A",
-            "industry": data.get("Industry") or "N/A",
-            "address": data.get("Address") or "N/A",
-            "website": data.get("OfficialSite") or "N/A",
-
-            "market_cap": format_currency(data.get("MarketCapitalization")),
-            "ebitda": format_currency(data.get("EBITDA")),
-            "pe_ratio": data.get("PERatio") or "N/A",
-            "peg_ratio": data.get("PEGRatio") or "N/A",
-            "eps": format_price(data.get("EPS")),
-            "book_value": format_price(data.get("BookValue")),
-
-            "revenue_ttm": format_currency(data.get("RevenueTTM")),
-            "gross_profit_ttm": format_currency(data.get("GrossProfitTTM")),
-
-            "profit_margin": format_percent(data.get("ProfitMargin")),
-            "operating_margin_ttm": format_percent(data.get("OperatingMarginTTM")),
-            "return_on_assets": format_percent(data.get("ReturnOnAssetsTTM")),
-            "return_on_equity": format_percent(data.get("ReturnOnEquityTTM")),
-
-            "beta": data.get("Beta") or "N/A",
-            "52_week_high": format_price(data.get("52WeekHigh")),
-            "52_week_low": format_price(data.get("52WeekLow")),
-            "50_day_moving_average": format_price(data.get("50DayMovingAverage")),
-            "200_day_moving_average": format_price(data.get("200DayMovingAverage")),
-
-            "analyst_rating_strong_buy": data.get("AnalystRatingStrongBuy"),
-            "analyst_rating_buy": data.get("AnalystRatingBuy"),
-            "analyst_rating_hold": data.get("AnalystRatingHold"),
-            "analyst_rating_sell": data.get("AnalystRatingSell"),
-            "analyst_rating_strong_sell": data.get("AnalystRatingStrongSell"),
-            "analyst_target_price": data.get("AnalystTargetPrice")
-        })
+
+async def get_stock_info(request, ticker):
+
+    try:
+        data = await aget_overview(ticker)
+    except quota.QuotaExceeded as e:
+        return quota_exceeded(e)
+    except alphavantage.UpstreamError:
+        return upstream_error()
+
+    valid = is_valid_overview(data)
+    if valid:
+        popularity.record(data["Symbol"])
+    metrics.log_sample(logger, "stock_info", ticker=ticker.upper(), valid=valid, fields=len(data or {}))
+
+    # A cache hit never goes upstream, so a matching validator costs two cache reads
+    etag = conditional.make_etag(data)
+    last_modified = await aget_overview_modified(ticker)
+    response = conditional.not_modified(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    return conditional.add_validators(
+        JsonResponse(format_stock_info(data)), etag=etag, last_modified=last_modified,
+    )
+
+async def get_stock_info_batch(request):
+    tickers = [t.strip().upper() for t in request.GET.get("tickers", "").split(",") if t.strip()]
+    tickers = list(dict.fromkeys(tickers))
+
+    if not tickers:
+        return JsonResponse({"detail": "Missing query param: ?tickers="}, status=400)
+    if len(tickers) > settings.STOCK_BATCH_MAX_TICKERS:
+        return JsonResponse(
+            {"detail": f"At most {settings.STOCK_BATCH_MAX_TICKERS} tickers per request"},
+            status=400,
+        )
+
+    overviews = await aget_overviews(tickers)
+
+    results = {}
+    errors = {}
+    for ticker in tickers:
+        data = overviews[ticker]
+        if isinstance(data, quota.QuotaExceeded):
+            errors[ticker] = {"detail": "Upstream rate limit reached", "status": 429}
+        elif isinstance(data, alphavantage.UpstreamError):
+            errors[ticker] = {"detail": "Upstream request failed", "status": 502}
+        elif isinstance(data, Exception):
+            raise data
+        elif not is_valid_overview(data):
+            errors[ticker] = {"detail": "Stock not found", "status": 404}
+        else:
+            popularity.record(ticker)
+            results[ticker] = format_stock_info(data)
+
+    return JsonResponse({"results": results, "errors": errors})
+
+async def get_price_history(request, ticker):
+    ticker = ticker.upper().strip()
+    try:
+        start = date.fromisoformat(request.GET["start"]) if request.GET.get("start") else None
+        end = date.fromisoformat(request.GET["end"]) if request.GET.get("end") else None
+    except ValueError:
+        return JsonResponse({"detail": "start and end must be YYYY-MM-DD dates"}, status=400)
+
+    columns = None
+    if request.GET.get("fields"):
+        columns = [c.strip() for c in request.GET["fields"].split(",") if c.strip()]
+        unknown = sorted(set(columns) - set(price_history.COLUMNS))
+        if unknown:
+            return JsonResponse(
+                {"detail": f"Unknown fields: {', '.join(unknown)}", "allowed": list(price_history.COLUMNS)},
+                status=400,
+            )
+
+    try:
+        await price_history.arefresh(ticker)
+        bars = await sync_to_async(price_history.read_range, thread_sensitive=False)(ticker, start, end, columns)
+    except quota.QuotaExceeded as e:
+        return quota_exceeded(e)
+    except alphavantage.UpstreamError:
+        return upstream_error()
+    except price_history.InvalidTicker:
+        return JsonResponse({"detail": "Invalid ticker"}, status=400)
+    except price_history.UnknownTicker:
+        return JsonResponse({"detail": "Stock not found"}, status=404)
+
+    return JsonResponse({"symbol": ticker, "count": len(bars["date"]), **price_history.as_lists(bars)})
+
+def _indicator_params(request):
+    """Parse ?indicators=&start=&end=; returns (specs, start, end) or an error response."""
+    try:
+        specs = indicators.parse_specs(request.GET.get("indicators") or settings.INDICATOR_DEFAULTS)
+    except ValueError as e:
+        return JsonResponse({"detail": str(e), "allowed": list(indicators.INDICATORS)}, status=400)
+    if len(specs) > settings.INDICATOR_MAX_SPECS:
+        return JsonResponse({"detail": f"At most {settings.INDICATOR_MAX_SPECS} indicators per request"}, status=400)
+    try:
+        start = date.fromisoformat(request.GET["start"]) if request.GET.get("start") else None
+        end = date.fromisoformat(request.GET["end"]) if request.GET.get("end") else None
+    except ValueError:
+        return JsonResponse({"detail": "start and end must be YYYY-MM-DD dates"}, status=400)
+    return specs, start, end
+
+
+async def get_indicators(request, ticker):
+    ticker = ticker.upper().strip()
+    params = _indicator_params(request)
+    if isinstance(params, JsonResponse):
+        return params
+    specs, start, end = params
+
+    try:
+        await price_history.arefresh(ticker)
+        results = await sync_to_async(indicators.compute_many, thread_sensitive=False)([ticker], specs)
+    except quota.QuotaExceeded as e:
+        return quota_exceeded(e)
+    except alphavantage.UpstreamError:
+        return upstream_error()
+    except price_history.InvalidTicker:
+        return JsonResponse({"detail": "Invalid ticker"}, status=400)
+    except price_history.UnknownTicker:
+        return JsonResponse({"detail": "Stock not found"}, status=404)
+
+    if ticker not in results:
+        return JsonResponse({"detail": "No price history"}, status=404)
+    return JsonResponse({"symbol": ticker, **indicators.as_lists(results[ticker], start, end)})
+
+
+async def get_indicators_batch(request):
+    tickers = [t.strip().upper() for t in request.GET.get("tickers", "").split(",") if t.strip()]
+    tickers = list(dict.fromkeys(tickers))
+
+    if not tickers:
+        return JsonResponse({"detail": "Missing query param: ?tickers="}, status=400)
+    if len(tickers) > settings.STOCK_BATCH_MAX_TICKERS:
+        return JsonResponse(
+            {"detail": f"At most {settings.STOCK_BATCH_MAX_TICKERS} tickers per request"},
+            status=400,
+        )
+    params = _indicator_params(request)
+    if isinstance(params, JsonResponse):
+        return params
+    specs, start, end = params
+
+    semaphore = asyncio.Semaphore(settings.STOCK_BATCH_CONCURRENCY)
+
+    async def refresh(ticker):
+        async with semaphore:
+            await price_history.arefresh(ticker)
+
+    outcomes = await asyncio.gather(*(refresh(t) for t in tickers), return_exceptions=True)
+
+    errors = {}
+    for ticker, outcome in zip(tickers, outcomes):
+        if isinstance(outcome, quota.QuotaExceeded):
+            errors[ticker] = {"detail": "Upstream rate limit reached", "status": 429}
+        elif isinstance(outcome, alphavantage.UpstreamError):
+            errors[ticker] = {"detail": "Upstream request failed", "status": 502}
+        elif isinstance(outcome, price_history.InvalidTicker):
+            errors[ticker] = {"detail": "Invalid ticker", "status": 400}
+        elif isinstance(outcome, price_history.UnknownTicker):
+            errors[ticker] = {"detail": "Stock not found", "status": 404}
+        elif isinstance(outcome, Exception):
+            raise outcome
+
+    # One matrix per indicator across every ticker in the batch
+    ready = [t for t in tickers if t not in errors]
+    computed = await sync_to_async(indicators.compute_many, thread_sensitive=False)(ready, specs)
+
+    results = {}
+    for ticker in ready:
+        if ticker in computed:
+            results[ticker] = indicators.as_lists(computed[ticker], start, end)
+        else:
+            errors[ticker] = {"detail": "No price history", "status": 404}
+    return JsonResponse({"results": results, "errors": errors})
 
 def dev_get_stock_info(request, ticker):
     ticker = ticker.upper().strip()
@@ -179,63 +407,145 @@ def dev_get_stock_info(request, ticker):
 
     return JsonResponse(dummy)
 
-def get_stock_background(ticker):
-    url = f"https://www.alphavantage.co/query"
-    params = {
-        "function": "OVERVIEW",
-        "symbol": ticker,
-        "apikey": AV_KEY
-    }
-    r = requests.get(url, params=params)
-    data = r.json()
-    return data
+async def get_stock_background(ticker):
+    return await aget_overview(ticker)
 
 
-def get_ai_response(request, ticker):
+async def get_ai_response(request, ticker):
 
     # Define Alpha Vantage 
-    alphav_background = get_stock_background(ticker)
-
-    # Configure client and tools to make a call to gemini
-    client = genai.Client(api_key=GOOGLE_API_KEY)
-
-    # Define investor prompt
-    prompt = [
-        types.Content(
-            role="user", parts=[types.Part(text=f"Based on the stock ticker {ticker}, retrieve information from the following json response and use the information provided to highlight important information for potential investors to know. JSON response: {alphav_background}. Do not include asterisk or pound symbols and start your response with the phrasing: Based on the provided financial data for {ticker} here is a summary of the most important information for potential investors to consider.")]
+    try:
+        alphav_background = await get_stock_background(ticker)
+    except quota.QuotaExceeded as e:
+        return quota_exceeded(e)
+    except alphavantage.UpstreamError:
+        return upstream_error()
+    if not is_valid_overview(alphav_background):
+        return JsonResponse({"detail": "Stock not found"}, status=404)
+
+    # The summary is keyed on its prompt, so the validators are known before
+    # generating and a client holding the current summary never costs a model
+    # call. Weak, since a regenerated summary says the same in other words.
+    etag = conditional.make_etag(summary_key(ticker, alphav_background), weak=True)
+    last_modified = await aget_overview_modified(ticker)
+    response = conditional.not_modified(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    # Summaries are cached by content, so a new generation only happens when
+    # the underlying fundamentals change
+    summary = await aget_summary(ticker, alphav_background)
+
+    return conditional.add_validators(JsonResponse({
+        "summ_response": summary
+    }), etag=etag, last_modified=last_modified)
+
+async def get_ai_response_batch(request):
+    tickers = [t.strip().upper() for t in request.GET.get("tickers", "").split(",") if t.strip()]
+    tickers = list(dict.fromkeys(tickers))
+
+    if not tickers:
+        return JsonResponse({"detail": "Missing query param: ?tickers="}, status=400)
+    if len(tickers) > settings.STOCK_BATCH_MAX_TICKERS:
+        return JsonResponse(
+            {"detail": f"At most {settings.STOCK_BATCH_MAX_TICKERS} tickers per request"},
+            status=400,
         )
-    ]
 
-    # Send request with function declarations
-    informed_response = client.models.generate_content(
-        model="gemini-3-flash-preview",
-        contents=prompt,
+    overviews = await aget_overviews(tickers)
+
+    ready = {}
+    errors = {}
+    for ticker in tickers:
+        data = overviews[ticker]
+        if isinstance(data, quota.QuotaExceeded):
+            errors[ticker] = {"detail": "Upstream rate limit reached", "status": 429}
+        elif isinstance(data, alphavantage.UpstreamError):
+            errors[ticker] = {"detail": "Upstream request failed", "status": 502}
+        elif isinstance(data, Exception):
+            raise data
+        elif not is_valid_overview(data):
+            errors[ticker] = {"detail": "Stock not found", "status": 404}
+        else:
+            ready[ticker] = data
+
+    # Uncached tickers share model calls, several per call
+    summaries = await aget_summaries(ready)
+
+    results = {}
+    for ticker, summary in summaries.items():
+        if isinstance(summary, Exception):
+            logger.error("AI summary failed for %s", ticker, exc_info=summary)
+            errors[ticker] = {"detail": "Summary generation failed", "status": 502}
+        else:
+            results[ticker] = {"summ_response": summary}
+    return JsonResponse({"results": results, "errors": errors})
+
+def sse_event(data, event=None):
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+async def stream_ai_events(ticker, overview):
+    chunks = astream_summary(ticker, overview)
+    try:
+        async for chunk in chunks:
+            yield sse_event({"text": chunk})
+    except Exception:
+        logger.exception("AI summary stream failed for %s", ticker)
+        yield sse_event({"detail": "Summary generation failed"}, event="error")
+        return
+    finally:
+        # Runs when the response is cancelled after a client disconnect,
+        # which stops the upstream generation
+        await chunks.aclose()
+
+    yield sse_event({}, event="done")
+
+async def stream_ai_response(request, ticker):
+    try:
+        alphav_background = await get_stock_background(ticker)
+    except quota.QuotaExceeded as e:
+        return quota_exceeded(e)
+    except alphavantage.UpstreamError:
+        return upstream_error()
+    if not is_valid_overview(alphav_background):
+        return JsonResponse({"detail": "Stock not found"}, status=404)
+
+    response = StreamingHttpResponse(
+        stream_ai_events(ticker, alphav_background),
+        content_type="text/event-stream",
     )
+    response["Cache-Control"] = "no-cache"
+    # Stop reverse proxies such as nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
 
-    return JsonResponse({
-        "summ_response": informed_response.text
-    })
-
-def search_stock(request):
+async def search_stock(request):
     q = request.GET.get("q", "").strip()
 
     if not q:
         return JsonResponse({"query": q, "results": []}, status=400)
 
-    url = "https://www.alphavantage.co/query"
-    params = {
-        "function": "SYMBOL_SEARCH",
-        "keywords": q,
-        "apikey": AV_KEY
-    }
+    # Typeahead traffic is answered from the local index; only queries it
+    # knows nothing about go upstream
+    index = await symbol_index.aget_index()
+    results = index.search(q, limit=settings.SYMBOL_SEARCH_LIMIT)
+    if results:
+        return JsonResponse({"query": q, "results": results})
 
-    r = requests.get(url, params=params, timeout=10)
-    data = r.json()
+    try:
+        data = await alphavantage.asymbol_search(q)
+    except quota.QuotaExceeded as e:
+        return quota_exceeded(e)
+    except alphavantage.UpstreamError:
+        return upstream_error()
 
     matches = data.get("bestMatches", [])
 
     results = []
     for m in matches:
+        if m.get("1. symbol"):
+            index.add(symbol_index.entry_from_match(m))
         results.append({
             "symbol": m.get("1. symbol"),
             "name": m.get("2. name"),
@@ -335,20 +645,141 @@ def create_stock_view(request):
     return Response(serializer.data, status=201)
 
 @api_view(["GET"])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
 def get_stock_view(request, symbol):
     try:
-        stock = get_stock_by_symbol(symbol)
+        row = get_stock_row(symbol)
     except ObjectDoesNotExist:
         return Response({"detail": "Stock not found"}, status=404)
 
-    return Response(StockSerializer(stock).data)
+    updated_at = row["updated_at"]
+    etag = conditional.make_etag(request.accepted_media_type, row["symbol"], updated_at.isoformat())
+    response = conditional.not_modified(request, etag=etag, last_modified=updated_at)
+    if response is not None:
+        return response
+
+    response = Response(stock_rows_data([row])[0])
+    return conditional.add_validators(response, etag=etag, last_modified=updated_at)
 
 
+STOCK_LIST_FILTERS = ("exchange", "country", "sector", "industry")
+STOCK_FIELDS = STOCK_COLUMNS
+
 @api_view(["GET"])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
 def list_stocks_view(request):
-    stocks = list_stocks()
-    serializer = StockSerializer(stocks, many=True)
-    return Response(serializer.data)
+    fields = None
+    if request.GET.get("fields"):
+        fields = [f.strip() for f in request.GET["fields"].split(",") if f.strip()]
+        unknown = sorted(set(fields) - set(STOCK_FIELDS))
+        if unknown:
+            return Response(
+                {"detail": f"Unknown fields: {', '.join(unknown)}", "allowed": STOCK_FIELDS},
+                status=400,
+            )
+
+    # Stored in upper case (see UPPER_CASE_FIELDS)
+    filters = {
+        name: request.GET[name].strip().upper()
+        for name in STOCK_LIST_FILTERS
+        if request.GET.get(name, "").strip()
+    }
+
+    # Read-only, so rows skip model instances and the per-field serializer machinery
+    rows = list_stock_rows(filters=filters, fields=fields)
+    paginator = StockCursorPagination()
+    page = paginator.paginate_queryset(rows, request)
+
+    # The page's rows and their versions decide the body, so a match skips serializing it
+    versions = "\n".join(f"{row['symbol']}@{row['updated_at'].isoformat()}" for row in page)
+    etag = conditional.make_etag(request.accepted_media_type, paginator.has_next, paginator.has_previous, versions)
+    last_modified = max((row["updated_at"] for row in page), default=None)
+    response = conditional.not_modified(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    response = paginator.get_paginated_response(stock_rows_data(page, fields=fields))
+    return conditional.add_validators(response, etag=etag, last_modified=last_modified)
+
+
+@api_view(["GET"])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
+def screen_stocks_view(request):
+    fields = None
+    if request.GET.get("fields"):
+        fields = [f.strip() for f in request.GET["fields"].split(",") if f.strip()]
+        unknown = sorted(set(fields) - set(STOCK_FIELDS))
+        if unknown:
+            return Response(
+                {"detail": f"Unknown fields: {', '.join(unknown)}", "allowed": STOCK_FIELDS},
+                status=400,
+            )
+
+    try:
+        filters = screener.parse_ranges(request.GET)
+        sort = screener.parse_sort(request.GET.get("sort"))
+    except screener.ScreenError as e:
+        return Response({"detail": str(e), "allowed": screener.SCREEN_FIELDS}, status=400)
+    filters.update({
+        name: request.GET[name].strip().upper()
+        for name in screener.SCREEN_TEXT_FILTERS
+        if request.GET.get(name, "").strip()
+    })
+
+    try:
+        limit = min(int(request.GET.get("limit", settings.STOCK_SCREEN_LIMIT)), settings.STOCK_SCREEN_MAX_LIMIT)
+        offset = max(int(request.GET.get("offset", 0)), 0)
+    except ValueError:
+        return Response({"detail": "limit and offset must be integers"}, status=400)
+
+    rows = screen_stocks(filters, sort=sort, fields=fields)
+    count = rows.count()
+    page = list(rows[offset:offset + max(limit, 1)])
+
+    versions = "\n".join(f"{row['symbol']}@{row['updated_at'].isoformat()}" for row in page)
+    etag = conditional.make_etag(request.accepted_media_type, count, versions)
+    last_modified = max((row["updated_at"] for row in page), default=None)
+    response = conditional.not_modified(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    data = stock_rows_data(page, fields=fields or screener.DEFAULT_FIELDS)
+    response = Response({"count": count, "sort": sort, "results": data})
+    return conditional.add_validators(response, etag=etag, last_modified=last_modified)
+
+
+@api_view(["POST"])
+@parser_classes([JSONParser, NDJSONParser])
+def bulk_upsert_stocks_view(request):
+    rows = request.data
+    if not isinstance(rows, list):
+        return Response({"detail": "Expected a JSON list or an NDJSON body"}, status=400)
+    if len(rows) > settings.STOCK_BULK_MAX_ROWS:
+        return Response(
+            {"detail": f"At most {settings.STOCK_BULK_MAX_ROWS} rows per request"},
+            status=400,
+        )
+
+    outcomes = bulk_upsert_stocks(rows, chunk_size=settings.STOCK_BULK_CHUNK_SIZE)
+
+    counts = {"created": 0, "updated": 0, "duplicate": 0, "invalid": 0}
+    for outcome in outcomes:
+        counts[outcome["status"]] += 1
+    return Response({**counts, "results": outcomes})
+
+
+@api_view(["GET"])
+def search_stocks_db_view(request):
+    q = request.GET.get("q", "").strip()
+    if not q:
+        return Response({"query": q, "results": [], "detail": "Missing query param: ?q="}, status=400)
+
+    try:
+        limit = min(int(request.GET.get("limit", settings.STOCK_SEARCH_LIMIT)), settings.STOCK_SEARCH_MAX_LIMIT)
+    except ValueError:
+        return Response({"detail": "limit must be an integer"}, status=400)
+
+    return Response({"query": q, "results": search_stocks(q, limit=max(limit, 1))})
 
 
 @api_view(["PUT", "PATCH"])
@@ -388,10 +819,14 @@ def register_user(request):
 
 @api_view(["GET"])
 def get_user(request, user_id):
-    try:
-        user = get_user_by_id(user_id)
-    except ObjectDoesNotExist:
-        return Response({"detail": "User not found"}, status=404)
+    # Authentication has already resolved the caller for this request
+    if request.user.is_authenticated and request.user.pk == user_id:
+        user = request.user
+    else:
+        try:
+            user = user_cache.get_user(user_id)
+        except ObjectDoesNotExist:
+            return Response({"detail": "User not found"}, status=404)
 
     return Response(
         UserSerializer(user).data
@@ -401,13 +836,18 @@ def get_user(request, user_id):
 @api_view(["PUT", "PATCH"])
 def update_user(request, user_id):
     user = get_user_by_id(user_id)
-    serializer = UserUpdateSerializer(user, data=request.data, partial=True)
+    # Raises ValidationError, answered with a 400 by DRF
+    user = update_user_by_id(user, request.data)
+    return Response(UserSerializer(user).data)
 
-    if serializer.is_valid():
-        serializer.save()
-        return Response(UserSerializer(user).data)
 
-    return Response(serializer.errors, status=400)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def change_password_view(request):
+    # Only the caller's own password, and only with the current one
+    user = get_user_by_id(request.user.pk)
+    change_password(user, request.data)
+    return Response(status=204)
 
 
 @api_view(["DELETE"])
@@ -53,7 +53,7 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.AllowAny",
@@ -61,6 +61,8 @@ REST_FRAMEWORK = {
 }
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack
+    'api.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
 
@@ -99,13 +101,222 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+#
+# SQLite by default. DB_ENGINE=postgresql switches to PostgreSQL (psycopg 3;
+# DB_POOL=true also needs psycopg[pool]).
+
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite")
+
+# Seconds a connection is reused across requests. Keep 0 under ASGI, where
+# each request's sync work runs on a new thread and a kept connection would
+# never be reused; raise it for WSGI workers.
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", 0))
+
+if DB_ENGINE == "postgresql":
+    DB_POOL = os.getenv("DB_POOL", "false").lower() == "true"
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv("DB_NAME", "clarus"),
+            'USER': os.getenv("DB_USER", ""),
+            'PASSWORD': os.getenv("DB_PASSWORD", ""),
+            'HOST': os.getenv("DB_HOST", ""),
+            'PORT': os.getenv("DB_PORT", ""),
+            # Django refuses persistent connections on top of its own pool
+            'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.getenv("DB_POOL_MIN_SIZE", 2)),
+                    'max_size': int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+                    'timeout': int(os.getenv("DB_POOL_TIMEOUT", 10)),
+                },
+            } if DB_POOL else {},
+        }
+    }
+elif DB_ENGINE == "sqlite":
+    # WAL lets readers run alongside the single writer; synchronous=NORMAL is
+    # durable across application crashes in WAL mode and skips most fsyncs
+    SQLITE_PRAGMAS = {
+        "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+        # Negative means KiB
+        "cache_size": -int(os.getenv("SQLITE_CACHE_KIB", 64 * 1024)),
+    }
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv("SQLITE_PATH", BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Writers take the write lock when their transaction starts, so
+                # they wait out the busy timeout instead of failing with
+                # "database is locked" when a read lock can't be upgraded
+                'transaction_mode': os.getenv("SQLITE_TRANSACTION_MODE", "IMMEDIATE"),
+                'timeout': int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)) / 1000,
+                'init_command': ";".join(f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()),
+            },
+        }
+    }
+else:
+    raise ValueError(f"Unsupported DB_ENGINE: {DB_ENGINE!r} (use sqlite or postgresql)")
+
 
-DATABASES = {
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Per-process LocMemCache by default. Set CACHE_BACKEND / CACHE_LOCATION to a
+# shared backend (e.g. django.core.cache.backends.redis.RedisCache) so every
+# worker and management command (such as prewarm) sees the same entries.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache')
+CACHE_IS_LOCMEM = CACHE_BACKEND == 'django.core.cache.backends.locmem.LocMemCache'
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv("CACHE_LOCATION", 'clarus-default'),
+        # LocMemCache culls the least recently used entries past this bound
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv("CACHE_MAX_ENTRIES", 5000)),
+        } if CACHE_IS_LOCMEM else {},
+    },
+    'summaries': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv("SUMMARY_CACHE_LOCATION", os.getenv("CACHE_LOCATION", 'clarus-summaries')),
+        'KEY_PREFIX': 'summaries',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", 2000)),
+        } if CACHE_IS_LOCMEM else {},
+    },
+}
+
+# Seconds an upstream payload is considered fresh, per data type
+CACHE_TTLS = {
+    "overview": 60 * 60 * 24,
 }
+CACHE_DEFAULT_TTL = 60 * 60
+
+# Extra seconds a stale entry may be served while it is refreshed in the background
+CACHE_STALE_TTL = 60 * 60 * 24
+CACHE_REFRESH_LOCK_TIMEOUT = 60
+
+# AI summaries are keyed by a hash of their inputs, so the TTL only bounds
+# how long an unused summary lingers
+SUMMARY_CACHE_ALIAS = 'summaries'
+SUMMARY_CACHE_TTL = 60 * 60 * 24 * 7
+
+# Resolved users for JWT authentication, kept per process. Saves and deletes
+# in one worker reach the others within the TTL.
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", 30))
+AUTH_USER_CACHE_SIZE = 10000
+
+# Stock rows fetched from Alpha Vantage more recently than this are served
+# without going upstream
+STOCK_FRESHNESS_SECONDS = int(os.getenv("STOCK_FRESHNESS_SECONDS", 60 * 60 * 24))
+
+# Cache-Control max-age for stock and AI responses. Clients revalidate with
+# the ETag afterwards, which is answered with a 304 when nothing changed.
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", 60))
+
+# metrics/ (Prometheus text). When a token is set, scrapers must send it as
+# "Authorization: Bearer <token>"; otherwise the endpoint needs a staff JWT.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Fraction of requests that write a sampled JSON log line
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 0.01))
+
+# stocks/ list pagination
+STOCKS_PAGE_SIZE = 50
+STOCKS_MAX_PAGE_SIZE = 500
+
+# stocks/bulk/ limits
+STOCK_BULK_MAX_ROWS = 50000
+STOCK_BULK_CHUNK_SIZE = 1000
+
+# stocks/search/ (full-text search over the Stock table)
+STOCK_SEARCH_LIMIT = 20
+STOCK_SEARCH_MAX_LIMIT = 100
+
+# stocks/screen/ page size
+STOCK_SCREEN_LIMIT = 50
+STOCK_SCREEN_MAX_LIMIT = 500
+
+# Local symbol search. The listing file is an Alpha Vantage LISTING_STATUS csv;
+# symbols from the Stock table are always indexed.
+SYMBOL_LISTING_FILE = os.getenv("SYMBOL_LISTING_FILE")
+SYMBOL_SEARCH_LIMIT = 10
+
+# Daily OHLCV history, one directory of memory-mapped column files per ticker.
+# Tickers are refreshed from TIME_SERIES_DAILY once their data is this old.
+PRICE_HISTORY_DIR = os.getenv("PRICE_HISTORY_DIR", str(BASE_DIR / "data" / "prices"))
+PRICE_HISTORY_REFRESH_SECONDS = int(os.getenv("PRICE_HISTORY_REFRESH_SECONDS", 60 * 60 * 6))
+# How long a ticker Alpha Vantage has no series for is answered without asking again
+PRICE_HISTORY_UNKNOWN_TTL = int(os.getenv("PRICE_HISTORY_UNKNOWN_TTL", 60 * 10))
+
+# Computed indicator series, keyed on the ticker's last bar
+INDICATOR_CACHE_TTL = int(os.getenv("INDICATOR_CACHE_TTL", 60 * 60 * 24))
+INDICATOR_DEFAULTS = "sma:50,sma:200"
+INDICATOR_MAX_SPECS = 10
+
+# stockInfo/batch/ limits
+STOCK_BATCH_MAX_TICKERS = int(os.getenv("STOCK_BATCH_MAX_TICKERS", 20))
+STOCK_BATCH_CONCURRENCY = 5
+
+
+# Upstream providers
+
+ALPHAVANTAGE_URL = os.getenv("ALPHAVANTAGE_URL", "https://www.alphavantage.co/query")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-3-flash-preview")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+
+# Upper bound on the estimated size of an AI summary prompt, and on the share
+# of it the company description may take
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 400))
+PROMPT_DESCRIPTION_TOKENS = int(os.getenv("PROMPT_DESCRIPTION_TOKENS", 120))
+# Tickers summarised per model call by the batch summary endpoint
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", 5))
+
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", 3.05))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", 10))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", 60))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", 2))
+UPSTREAM_RETRY_BACKOFF = float(os.getenv("UPSTREAM_RETRY_BACKOFF", 0.5))
+UPSTREAM_POOL_MAXSIZE = int(os.getenv("UPSTREAM_POOL_MAXSIZE", 20))
+
+# Alpha Vantage quota (free tier defaults). A share of the daily budget is
+# held back from background refreshes so interactive requests still get through.
+AV_CALLS_PER_MINUTE = int(os.getenv("AV_CALLS_PER_MINUTE", 5))
+AV_CALLS_PER_DAY = int(os.getenv("AV_CALLS_PER_DAY", 25))
+AV_BACKGROUND_RESERVE = float(os.getenv("AV_BACKGROUND_RESERVE", 0.2))
+AV_QUOTA_MAX_WAIT = 2
+AV_QUOTA_POLL_INTERVAL = 0.1
+# The buckets live in the default cache (shared across workers with a shared
+# backend); updates hold this cache lock for a few milliseconds
+AV_QUOTA_LOCK_TIMEOUT = 5
+AV_QUOTA_LOCK_POLL_INTERVAL = 0.005
+AV_THROTTLE_BACKOFF = 60
+AV_THROTTLE_DAILY_BACKOFF = 60 * 60
+
+# Per-ticker request counts are buffered in memory and written out this often
+POPULARITY_FLUSH_INTERVAL = 30
+
+# manage.py prewarm: the configured tickers come first, then the most
+# requested ones up to the limit. The budget is Alpha Vantage calls per day
+# (UTC) across runs; by default it leaves the interactive reserve untouched.
+PREWARM_TICKERS = [t.strip().upper() for t in os.getenv("PREWARM_TICKERS", "").split(",") if t.strip()]
+PREWARM_LIMIT = int(os.getenv("PREWARM_LIMIT", 50))
+PREWARM_CONCURRENCY = int(os.getenv("PREWARM_CONCURRENCY", 4))
+PREWARM_AV_BUDGET = int(os.getenv("PREWARM_AV_BUDGET", AV_CALLS_PER_DAY * (1 - AV_BACKGROUND_RESERVE)))
+PREWARM_STATE_FILE = os.getenv("PREWARM_STATE_FILE", str(BASE_DIR / ".prewarm-state.json"))
+
+# Coalesce identical in-flight upstream calls. Cross-process coalescing
+# elects a leader through a cache lock and needs a shared cache backend.
+SINGLEFLIGHT_CROSS_PROCESS = os.getenv("SINGLEFLIGHT_CROSS_PROCESS", "false").lower() == "true"
+SINGLEFLIGHT_WAIT_TIMEOUT = 30
+SINGLEFLIGHT_RESULT_TTL = 5
+SINGLEFLIGHT_POLL_INTERVAL = 0.05
 
 
 # Password validation
@@ -0,0 +1,263 @@
+"""
+Mixed read/write load against the configured database, before and after tuning.
+
+Each phase runs in its own process with its own environment, against a
+fresh SQLite file (or, for ``current``, whatever DB_* variables are set, so
+a PostgreSQL setup can be measured the same way):
+
+    python benchmarks/database.py [--phases baseline,tuned] [--threads 16] [--seconds 10]
+    DB_ENGINE=postgresql DB_POOL=true python benchmarks/database.py --phases current
+
+``baseline`` is the configuration before the database settings became
+environment driven: rollback journal, synchronous=FULL, deferred
+transactions, no mmap, a new connection per request. ``tuned`` is the
+current defaults plus persistent connections.
+
+Worker threads loop over a request mix of stock lookups and filtered lists,
+single-row stock updates, user registrations and bulk upserts, closing
+expired connections between operations the way Django does between
+requests. Reported per phase: throughput, p50/p95 latency per operation,
+and how many operations failed with "database is locked".
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+
+STOCK_ROWS = 5000
+SECTORS = ["TECHNOLOGY", "FINANCE", "ENERGY", "HEALTHCARE", "INDUSTRIALS"]
+
+PHASES = {
+    "baseline": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_TRANSACTION_MODE": "DEFERRED",
+        "SQLITE_MMAP_SIZE": "0",
+        "SQLITE_CACHE_KIB": "2000",
+        "DB_CONN_MAX_AGE": "0",
+    },
+    "tuned": {
+        "DB_CONN_MAX_AGE": "600",
+    },
+    "current": {},
+}
+
+# operation -> share of the traffic
+MIX = {
+    "get_stock": 0.45,
+    "list_stocks": 0.25,
+    "update_stock": 0.15,
+    "register_user": 0.10,
+    "bulk_upsert": 0.05,
+}
+
+
+# OPERATIONS
+def _symbol(rng: random.Random) -> str:
+    return f"S{rng.randrange(STOCK_ROWS):05d}"
+
+
+def get_stock(rng):
+    from api.services import stock_service
+
+    stock_service.get_stock_row(_symbol(rng))
+
+
+def list_stocks(rng):
+    from api.services import stock_service
+
+    list(stock_service.list_stock_rows({"sector": rng.choice(SECTORS)})[:50])
+
+
+def update_stock(rng):
+    from django.db import transaction
+
+    from api.services import stock_service
+
+    # Read then write in one transaction, like the update endpoint
+    with transaction.atomic():
+        stock = stock_service.get_stock_by_symbol(_symbol(rng))
+        stock_service.update_stock(stock, beta=round(rng.uniform(0.2, 2.5), 3))
+
+
+def register_user(rng):
+    from api.models import User
+
+    user = User(email=f"load-{uuid.uuid4().hex}@example.com", name="Load")
+    # Password hashing would dominate the timing and isn't what is measured
+    user.set_unusable_password()
+    user.save()
+
+
+def bulk_upsert(rng):
+    from api.services import stock_service
+
+    start = rng.randrange(STOCK_ROWS - 200)
+    stock_service.bulk_upsert_stocks([
+        {"symbol": f"S{i:05d}", "name": f"S{i:05d} Inc", "exchange": "NYSE", "country": "USA",
+         "beta": round(rng.uniform(0.2, 2.5), 3)}
+        for i in range(start, start + 200)
+    ])
+
+
+OPERATIONS = {name: globals()[name] for name in MIX}
+
+
+# PHASE (runs in the child process)
+def _prepare() -> None:
+    from django.core.management import call_command
+
+    from api.models import Stock
+
+    call_command("migrate", verbosity=0)
+    rng = random.Random(0)
+    Stock.objects.bulk_create([
+        Stock(
+            symbol=f"S{i:05d}", name=f"S{i:05d} Inc", exchange="NYSE", country="USA",
+            sector=rng.choice(SECTORS), market_cap=rng.randint(10**8, 3 * 10**12),
+            pe_ratio=round(rng.uniform(3, 80), 2), beta=round(rng.uniform(0.2, 2.5), 3),
+        )
+        for i in range(STOCK_ROWS)
+    ], batch_size=1000, ignore_conflicts=True)
+
+
+def _worker(seed: int, deadline: float, results: dict) -> None:
+    from django.db import OperationalError, close_old_connections, connection
+
+    rng = random.Random(seed)
+    names, weights = list(MIX), list(MIX.values())
+    timings = {name: [] for name in MIX}
+    locked = {name: 0 for name in MIX}
+    other = 0
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        close_old_connections()
+        start = time.perf_counter()
+        try:
+            OPERATIONS[name](rng)
+        except OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            locked[name] += 1
+            continue
+        except Exception:
+            other += 1
+            continue
+        finally:
+            close_old_connections()
+        timings[name].append(time.perf_counter() - start)
+    connection.close()
+    results[seed] = (timings, locked, other)
+
+
+def run_phase(threads: int, seconds: float) -> dict:
+    import django
+
+    django.setup()
+    from django.conf import settings
+
+    _prepare()
+
+    results = {}
+    deadline = time.perf_counter() + seconds
+    workers = [threading.Thread(target=_worker, args=(seed, deadline, results)) for seed in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    operations = {}
+    total = 0
+    for name in MIX:
+        samples = np.array([s for timings, _, _ in results.values() for s in timings[name]]) * 1000
+        locked = sum(locked[name] for _, locked, _ in results.values())
+        total += len(samples)
+        operations[name] = {
+            "ok": len(samples),
+            "locked": locked,
+            "p50_ms": round(float(np.percentile(samples, 50)), 2) if len(samples) else None,
+            "p95_ms": round(float(np.percentile(samples, 95)), 2) if len(samples) else None,
+        }
+
+    database = settings.DATABASES["default"]
+    return {
+        "engine": database["ENGINE"],
+        "options": {key: value for key, value in database["OPTIONS"].items() if key != "pool"},
+        "conn_max_age": database["CONN_MAX_AGE"],
+        "threads": threads,
+        "seconds": round(elapsed, 2),
+        "ops_per_second": round(total / elapsed, 1),
+        "locked": sum(op["locked"] for op in operations.values()),
+        "errors": sum(other for _, _, other in results.values()),
+        "operations": operations,
+    }
+
+
+# DRIVER
+def _spawn(phase: str, args) -> dict:
+    env = {**os.environ, **PHASES[phase], "LOG_SAMPLE_RATE": "0"}
+    with tempfile.TemporaryDirectory(prefix="bench-db-") as directory:
+        if phase != "current" or "SQLITE_PATH" not in os.environ:
+            env["SQLITE_PATH"] = str(Path(directory) / "load.sqlite3")
+        env["PRICE_HISTORY_DIR"] = directory
+        completed = subprocess.run(
+            [sys.executable, __file__, "--run-phase", "--threads", str(args.threads), "--seconds", str(args.seconds)],
+            env=env, capture_output=True, text=True,
+        )
+    if completed.returncode:
+        raise SystemExit(f"{phase} phase failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_report(report: dict) -> None:
+    for phase, result in report.items():
+        print(f"\n{phase}: {result['ops_per_second']} ops/s, {result['locked']} locked, "
+              f"{result['errors']} other errors ({result['threads']} threads, {result['seconds']} s)")
+        for name, op in result["operations"].items():
+            print(f"  {name:<14} ok {op['ok']:>7}  locked {op['locked']:>5}  "
+                  f"p50 {op['p50_ms']} ms  p95 {op['p95_ms']} ms")
+    if "baseline" in report and "tuned" in report and report["baseline"]["ops_per_second"]:
+        change = report["tuned"]["ops_per_second"] / report["baseline"]["ops_per_second"]
+        print(f"\ntuned / baseline throughput: {change:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--phases", default="baseline,tuned", help=f"Comma-separated, from {', '.join(PHASES)}")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10, help="Duration of each phase")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--run-phase", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_phase:
+        print(json.dumps(run_phase(args.threads, args.seconds)))
+        return
+
+    phases = [phase.strip() for phase in args.phases.split(",")]
+    unknown = set(phases) - set(PHASES)
+    if unknown:
+        parser.error(f"Unknown phases: {', '.join(sorted(unknown))}")
+
+    report = {phase: _spawn(phase, args) for phase in phases}
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+"""
+Benchmark every API endpoint against local upstream stand-ins.
+
+Requests go through the full ASGI middleware stack in-process, against a
+throwaway in-memory test database, with Alpha Vantage and Gemini served by
+benchmarks/upstream.py:
+
+    python benchmarks/endpoints.py [--concurrency 1,8,32] [--requests 200] [--output baseline.json]
+    python benchmarks/endpoints.py --only stock_info,list_stocks --latency 100 --error-rate 0.05
+    python benchmarks/endpoints.py --output new.json --compare baseline.json
+
+Every endpoint is warmed up once per distinct URL before it is measured,
+so the numbers are steady-state; the ``:cold`` scenarios use a new ticker
+per request and always go upstream. The JSON report holds p50/p95/p99
+latency, throughput, unexpected statuses, and DB queries, upstream calls
+and model prompt tokens per request (read from the metrics middleware) for
+every scenario and concurrency level. ``--compare`` prints the change against an earlier
+report and exits non-zero when a scenario got slower than ``--threshold``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+
+import upstream  # noqa: E402
+
+TICKERS = [f"T{i:03d}" for i in range(50)]
+STOCK_ROWS = 2000
+PASSWORD = "bench-Password-123"
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # Request number -> path, so scenarios can spread over many URLs
+    path: Callable[[int], str]
+    body: Callable[[int], object] = None
+    expect: tuple = (200,)
+    # Creates whatever the given request numbers will consume, e.g. rows to delete
+    setup: Callable[[range], None] = None
+    warmup: bool = True
+    stream: bool = False
+    headers: dict = None
+    # Caps --requests for endpoints that are slow by design (password hashing)
+    max_requests: int = None
+    # URL name(s) from api/urls.py this scenario covers
+    covers: tuple = field(default=())
+
+    def __post_init__(self):
+        self.covers = self.covers or (self.name,)
+
+
+def _pick(values: list):
+    return lambda i: values[i % len(values)]
+
+
+def scenarios(state: dict) -> list:
+    ticker = _pick(TICKERS)
+    run = state["run"]
+    return [
+        Scenario("hello", "GET", lambda i: "/api/hello/"),
+        Scenario("cache_stats", "GET", lambda i: "/api/cacheStats/", headers=state["staff_headers"]),
+        Scenario("upstream_stats", "GET", lambda i: "/api/upstreamStats/", headers=state["staff_headers"]),
+        Scenario("metrics", "GET", lambda i: "/api/metrics/", headers=state["staff_headers"]),
+
+        Scenario("stock_info", "GET", lambda i: f"/api/stockInfo/{ticker(i)}/"),
+        Scenario("stock_info:cold", "GET", lambda i: f"/api/stockInfo/C{run}{i:05d}/", warmup=False,
+                 covers=("stock_info",)),
+        Scenario("stock_info_batch", "GET",
+                 lambda i: "/api/stockInfo/batch/?tickers=" + ",".join(ticker(i + k) for k in range(5))),
+        Scenario("price_history", "GET", lambda i: f"/api/stockInfo/{ticker(i)}/prices/?fields=close"),
+        Scenario("indicators", "GET",
+                 lambda i: f"/api/stockInfo/{ticker(i)}/indicators/?indicators=sma:50,rsi,macd"),
+        Scenario("indicators_batch", "GET",
+                 lambda i: "/api/stockInfo/batch/indicators/?indicators=sma:50,rsi&tickers="
+                 + ",".join(ticker(i + k) for k in range(10))),
+        Scenario("dev_stock_info", "GET", lambda i: f"/api/devstockInfo/{ticker(i)}/"),
+
+        Scenario("ai_response", "GET", lambda i: f"/api/aiResponse/{ticker(i)}/"),
+        Scenario("ai_response:cold", "GET", lambda i: f"/api/aiResponse/A{run}{i:05d}/", warmup=False,
+                 covers=("ai_response",)),
+        Scenario("ai_response_batch", "GET",
+                 lambda i: "/api/aiResponse/batch/?tickers=" + ",".join(ticker(i + k) for k in range(10))),
+        Scenario("ai_response_batch:cold", "GET",
+                 lambda i: "/api/aiResponse/batch/?tickers=" + ",".join(f"A{run}{i:05d}{k}" for k in range(10)),
+                 warmup=False, covers=("ai_response_batch",)),
+        Scenario("ai_response_stream", "GET", lambda i: f"/api/aiResponse/{ticker(i)}/stream/", stream=True),
+
+        Scenario("stock_search", "GET", lambda i: f"/api/stockSearch/?q={ticker(i)[:2]}"),
+        Scenario("dev_stock_search", "GET", lambda i: "/api/devstockSearch/?q=app"),
+
+        Scenario("list_stocks", "GET", lambda i: "/api/stocks/?sector=TECHNOLOGY"),
+        Scenario("create_stock", "POST", lambda i: "/api/stocks/create/",
+                 body=lambda i: _stock(f"N{run}{i:04d}"), expect=(201,), warmup=False),
+        Scenario("bulk_upsert_stocks", "POST", lambda i: "/api/stocks/bulk/",
+                 body=lambda i: [_stock(f"B{k:04d}", beta=i % 3) for k in range(100)]),
+        Scenario("search_stock_db", "GET", lambda i: "/api/stocks/search/?q=software"),
+        Scenario("screen_stocks", "GET",
+                 lambda i: "/api/stocks/screen/?pe_ratio_min=10&pe_ratio_max=30&sort=-market_cap"),
+        Scenario("get_stock", "GET", lambda i: f"/api/stocks/S{i % STOCK_ROWS:05d}/"),
+        Scenario("update_stock", "PATCH", lambda i: f"/api/stocks/S{i % STOCK_ROWS:05d}/update/",
+                 body=lambda i: {"beta": i % 7 / 2}),
+        Scenario("delete_stock", "DELETE", lambda i: f"/api/stocks/D{run}{i:05d}/delete/", expect=(204,),
+                 setup=lambda numbers: _make_stocks([f"D{run}{i:05d}" for i in numbers]), warmup=False),
+
+        Scenario("register_user", "POST", lambda i: "/api/users/register/",
+                 body=lambda i: {"email": f"r{run}-{i}@example.com", "name": "Bench", "password": PASSWORD},
+                 expect=(201,), warmup=False, max_requests=20),
+        Scenario("login_user", "POST", lambda i: "/api/users/login/",
+                 body=lambda i: {"email": state["email"], "password": PASSWORD}, max_requests=20),
+        Scenario("token_refresh", "POST", lambda i: "/api/users/refresh/",
+                 body=lambda i: {"refresh": state["refresh"]}),
+        Scenario("get_user", "GET", lambda i: f"/api/users/{state['user_id']}/"),
+        Scenario("update_user", "PATCH", lambda i: f"/api/users/{state['user_id']}/update/",
+                 body=lambda i: {"name": f"Bench {i}"}),
+        Scenario("delete_user", "DELETE", lambda i: f"/api/users/{state['delete_ids'][i]}/delete/",
+                 expect=(204,), setup=lambda numbers: _make_users(state, numbers), warmup=False),
+    ]
+
+
+# FIXTURES
+def _stock(symbol: str, **extra) -> dict:
+    return {"symbol": symbol, "name": f"{symbol} Software Inc", "exchange": "NASDAQ", "country": "USA",
+            "sector": "TECHNOLOGY", "industry": "SERVICES-PREPACKAGED SOFTWARE", **extra}
+
+
+def _make_stocks(symbols: list) -> None:
+    from api.models import Stock
+
+    rng = random.Random(0)
+    Stock.objects.bulk_create([
+        Stock(
+            **_stock(symbol, sector=rng.choice(upstream.SECTORS)),
+            market_cap=rng.randint(10**8, 3 * 10**12),
+            pe_ratio=round(rng.uniform(3, 80), 2),
+            profit_margin=round(rng.uniform(-0.3, 0.5), 4),
+            beta=round(rng.uniform(0.2, 2.5), 3),
+        )
+        for symbol in symbols
+    ], batch_size=1000)
+
+
+def _make_users(state: dict, numbers: range) -> None:
+    from api.models import User
+
+    users = [User(email=f"d{state['run']}-{i}@example.com", name="Bench") for i in numbers]
+    for user in users:
+        # Deleting doesn't need a real password hash, and hashing thousands is slow
+        user.set_unusable_password()
+    User.objects.bulk_create(users)
+    state.setdefault("delete_ids", {}).update((i, str(user.id)) for i, user in zip(numbers, users))
+
+
+def prepare(state: dict) -> None:
+    from api.models import User
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    _make_stocks([f"S{i:05d}" for i in range(STOCK_ROWS)])
+    user = User.objects.create_user(email=f"bench-{state['run']}@example.com", name="Bench", password=PASSWORD)
+    state.update(email=user.email, user_id=str(user.id), refresh=str(RefreshToken.for_user(user)))
+    # The stats endpoints are staff only
+    staff = User.objects.create_user(email=f"staff-{state['run']}@example.com", name="Staff", is_staff=True)
+    state["staff_headers"] = {"Authorization": f"Bearer {RefreshToken.for_user(staff).access_token}"}
+
+
+# RUN
+def _metric_totals(metric, view: str) -> tuple:
+    """(observations, sum) of a histogram for one view label, across its other labels."""
+    with metric.lock:
+        matching = [(sum(counts), total) for labels, (counts, total) in metric.values.items() if labels[0] == view]
+    return sum(count for count, _ in matching), sum(total for _, total in matching)
+
+
+def _counters(scenario: Scenario) -> dict:
+    from api.services import metrics
+
+    view = scenario.covers[0]
+    return {
+        "requests": _metric_totals(metrics.REQUEST_SECONDS, view)[0],
+        "db_queries": _metric_totals(metrics.DB_QUERIES, view)[1],
+        "upstream_calls": _metric_totals(metrics.UPSTREAM_SECONDS, view)[0],
+        "prompt_tokens": _metric_totals(metrics.PROMPT_TOKENS, view)[1],
+    }
+
+
+async def _send(client, scenario: Scenario, i: int):
+    path = scenario.path(i)
+    kwargs = {"headers": scenario.headers}
+    if scenario.body is not None:
+        kwargs.update(data=json.dumps(scenario.body(i)), content_type="application/json")
+    response = await getattr(client, scenario.method.lower())(path, **kwargs)
+    if scenario.stream:
+        # The latency of a stream is the time to its last chunk
+        async for _ in response.streaming_content:
+            pass
+    return response.status_code
+
+
+async def run_level(scenario: Scenario, concurrency: int, numbers: range) -> dict:
+    from asgiref.sync import sync_to_async
+    from django.test import AsyncClient
+
+    if scenario.setup:
+        await sync_to_async(scenario.setup)(numbers)
+    before = _counters(scenario)
+
+    latencies = []
+    unexpected = {}
+    next_request = iter(numbers)
+
+    async def worker():
+        client = AsyncClient()
+        for i in next_request:
+            start = time.perf_counter()
+            status = await _send(client, scenario, i)
+            latencies.append(time.perf_counter() - start)
+            if status not in scenario.expect:
+                unexpected[str(status)] = unexpected.get(str(status), 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    after = _counters(scenario)
+    served = max(after["requests"] - before["requests"], 1)
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {
+        "requests": len(numbers),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "mean_ms": round(float(np.mean(latencies)) * 1000, 2),
+        "rps": round(len(numbers) / elapsed, 1),
+        "unexpected_statuses": unexpected,
+        "db_queries_per_request": round((after["db_queries"] - before["db_queries"]) / served, 2),
+        "upstream_calls_per_request": round((after["upstream_calls"] - before["upstream_calls"]) / served, 3),
+        "prompt_tokens_per_request": round((after["prompt_tokens"] - before["prompt_tokens"]) / served, 1),
+    }
+
+
+async def warm_up(scenario: Scenario, numbers: range) -> None:
+    from django.test import AsyncClient
+
+    client = AsyncClient()
+    seen = set()
+    for i in numbers:
+        path = scenario.path(i)
+        if path not in seen:
+            seen.add(path)
+            await _send(client, scenario, i)
+
+
+async def run(selected: list, levels: list, requests: int) -> dict:
+    results = {}
+    for scenario in selected:
+        count = min(requests, scenario.max_requests or requests)
+        if scenario.warmup:
+            await warm_up(scenario, range(count * len(levels)))
+        results[scenario.name] = {}
+        for level, concurrency in enumerate(levels):
+            # Request numbers never repeat within a run, so "new URL per request" scenarios stay new
+            numbers = range(level * count, (level + 1) * count)
+            result = await run_level(scenario, concurrency, numbers)
+            results[scenario.name][str(concurrency)] = result
+            print(
+                f"{scenario.name:<22} c={concurrency:<4} p50={result['p50_ms']:>8.2f}ms "
+                f"p95={result['p95_ms']:>8.2f}ms p99={result['p99_ms']:>8.2f}ms "
+                f"{result['rps']:>8.1f} req/s  db={result['db_queries_per_request']:<6} "
+                f"upstream={result['upstream_calls_per_request']:<6}"
+                + (f" unexpected={result['unexpected_statuses']}" if result["unexpected_statuses"] else ""),
+                flush=True,
+            )
+    return results
+
+
+def uncovered(all_scenarios: list) -> list:
+    from django.urls import URLPattern
+
+    from api import urls
+
+    covered = {name for scenario in all_scenarios for name in scenario.covers}
+    names = [p.name for p in urls.urlpatterns if isinstance(p, URLPattern)]
+    return sorted(set(names) - covered)
+
+
+# COMPARE
+def compare(baseline: dict, report: dict, threshold: float) -> list:
+    """Print per-scenario changes; returns the regressions beyond ``threshold``."""
+    regressions = []
+    print(f"\nChange against {baseline['meta'].get('commit') or 'baseline'}:")
+    for name, levels in report["results"].items():
+        for level, result in levels.items():
+            old = baseline["results"].get(name, {}).get(level)
+            if old is None:
+                continue
+            p95 = result["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else 0
+            rps = result["rps"] / old["rps"] - 1 if old["rps"] else 0
+            queries = result["db_queries_per_request"] - old["db_queries_per_request"]
+            flag = ""
+            if p95 > threshold or rps < -threshold or queries > 0:
+                flag = "  REGRESSION"
+                regressions.append(f"{name} c={level}")
+            print(f"{name:<22} c={level:<4} p95 {p95:+7.1%}  rps {rps:+7.1%}  db {queries:+.2f}{flag}")
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure(server, price_dir: str) -> None:
+    """Point the upstream clients at the stand-ins; must run before django.setup()."""
+    os.environ.update({
+        "ALPHAVANTAGE_URL": f"{server.url}/query",
+        "GEMINI_BASE_URL": server.url,
+        "AV_KEY": "benchmark",
+        "GEMINI_KEY": "benchmark",
+        # The stand-ins have no quota, and the real limits would make this a benchmark of the scheduler
+        "AV_CALLS_PER_MINUTE": "1000000",
+        "AV_CALLS_PER_DAY": "1000000",
+        "UPSTREAM_MAX_RETRIES": "0",
+        "PRICE_HISTORY_DIR": price_dir,
+        "LOG_SAMPLE_RATE": "0",
+    })
+    os.environ.pop("METRICS_TOKEN", None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and level")
+    parser.add_argument("--only", help="Comma-separated scenario names")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Earlier JSON report to diff against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative p95/throughput change counted as a regression")
+    upstream.add_arguments(parser)
+    args = parser.parse_args()
+
+    server = upstream.start(**upstream.options_from(args))
+    price_dir = tempfile.mkdtemp(prefix="bench-prices-")
+    configure(server, price_dir)
+
+    import logging
+
+    import django
+
+    django.setup()
+    # Expected 4xx/5xx answers would otherwise log one line per request
+    logging.getLogger("django.request").setLevel(logging.CRITICAL)
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+    state = {"run": uuid.uuid4().hex[:3].upper()}
+    prepare(state)
+    all_scenarios = scenarios(state)
+    missing = uncovered(all_scenarios)
+    if missing:
+        print(f"Endpoints without a scenario: {', '.join(missing)}", file=sys.stderr)
+
+    selected = all_scenarios
+    if args.only:
+        names = {name.strip() for name in args.only.split(",")}
+        selected = [s for s in all_scenarios if s.name in names]
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    results = asyncio.run(run(selected, levels, args.requests))
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "requests": args.requests,
+            "concurrency": levels,
+            "upstream": upstream.options_from(args),
+            "upstream_requests": server.requests,
+            "uncovered": missing,
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.compare:
+        regressions = compare(json.loads(Path(args.compare).read_text()), report, args.threshold)
+        if regressions:
+            sys.exit(f"{len(regressions)} regressions: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
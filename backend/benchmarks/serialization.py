@@ -0,0 +1,112 @@
+"""
+Compare the DRF serializer path with the values() fast path for stock lists.
+
+Runs against a throwaway in-memory test database:
+
+    python benchmarks/serialization.py [--rows 10000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from api.models import Stock  # noqa: E402
+from api.renderers import FastJSONRenderer  # noqa: E402
+from api.serializers import StockSerializer, stock_rows_data  # noqa: E402
+from api.services.stock_service import list_stock_rows  # noqa: E402
+
+EXCHANGES = ["NYSE", "NASDAQ", "LSE", "XETRA"]
+SECTORS = ["TECHNOLOGY", "FINANCE", "ENERGY", "HEALTHCARE", ""]
+
+
+def make_stocks(count: int) -> None:
+    rng = random.Random(0)
+    now = timezone.now()
+    stocks = []
+    for i in range(count):
+        has_fundamentals = i % 4 != 0
+        stocks.append(Stock(
+            symbol=f"S{i:05d}",
+            name=f"Company {i} Société Générale" if i % 50 == 0 else f"Company {i} Inc",
+            description="Designs, manufactures and markets products. " * rng.randint(1, 6),
+            exchange=rng.choice(EXCHANGES),
+            country="USA",
+            sector=rng.choice(SECTORS),
+            industry="SERVICES-PREPACKAGED SOFTWARE",
+            website=f"https://example{i}.com",
+            beta=round(rng.uniform(0.2, 2.5), 3),
+            asset_type="Common Stock",
+            currency="USD",
+            market_cap=rng.randint(10**6, 3 * 10**12) if has_fundamentals else None,
+            ebitda=rng.randint(10**5, 10**11) if has_fundamentals else None,
+            pe_ratio=round(rng.uniform(3, 80), 2) if has_fundamentals else None,
+            eps=round(rng.uniform(-5, 20), 2) if has_fundamentals else None,
+            profit_margin=round(rng.uniform(-0.5, 0.6), 4) if has_fundamentals else None,
+            week_52_high=round(rng.uniform(10, 900), 2),
+            week_52_low=round(rng.uniform(1, 10), 2),
+            analyst_rating_buy=rng.randint(0, 30) if has_fundamentals else None,
+            analyst_target_price=round(rng.uniform(5, 1000), 2) if has_fundamentals else None,
+            fetched_at=now - timedelta(seconds=rng.randint(0, 86400), microseconds=rng.randint(0, 999999))
+            if has_fundamentals else None,
+        ))
+    Stock.objects.bulk_create(stocks, batch_size=1000)
+
+
+def serializer_path() -> bytes:
+    data = StockSerializer(Stock.objects.order_by("symbol"), many=True).data
+    return JSONRenderer().render(data)
+
+
+def fast_path() -> bytes:
+    data = stock_rows_data(list_stock_rows().order_by("symbol"))
+    return FastJSONRenderer().render(data)
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    make_stocks(args.rows)
+
+    expected = serializer_path()
+    actual = fast_path()
+    if actual != expected:
+        sys.exit("Fast path output differs from the serializer path")
+
+    slow = best_of(serializer_path, args.repeat)
+    fast = best_of(fast_path, args.repeat)
+    print(f"{args.rows} rows, {len(actual) / 1024:.0f} KiB of JSON, outputs identical")
+    print(f"  ModelSerializer + JSONRenderer:      {slow * 1000:8.1f} ms")
+    print(f"  values() + FastJSONRenderer:         {fast * 1000:8.1f} ms  ({slow / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
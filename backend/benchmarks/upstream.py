@@ -0,0 +1,300 @@
+"""
+Local HTTP stand-ins for Alpha Vantage and Gemini.
+
+Used by the endpoint benchmarks, and handy for offline development.
+
+Point the backend at it with
+
+    ALPHAVANTAGE_URL=http://127.0.0.1:8765/query
+    GEMINI_BASE_URL=http://127.0.0.1:8765
+
+and run it on its own with
+
+    python benchmarks/upstream.py [--port 8765] [--latency 50] [--error-rate 0.01]
+
+Responses are deterministic per symbol. Symbols starting with ZZ are
+unknown, which Alpha Vantage answers with an empty object.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SECTORS = ["TECHNOLOGY", "FINANCE", "ENERGY", "HEALTHCARE", "INDUSTRIALS"]
+
+SUMMARY_WORDS = (
+    "The company reports steady revenue growth with healthy margins and a "
+    "conservative balance sheet, while analysts remain divided on valuation."
+).split()
+
+
+def _rng(*parts) -> random.Random:
+    digest = hashlib.sha256(":".join(map(str, parts)).encode()).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+# ALPHA VANTAGE
+def overview(symbol: str) -> dict:
+    if symbol.startswith("ZZ"):
+        return {}
+    rng = _rng("overview", symbol)
+    price = rng.uniform(5, 900)
+    return {
+        "Symbol": symbol,
+        "AssetType": "Common Stock",
+        "Name": f"{symbol.title()} Holdings Inc",
+        "Description": f"{symbol} designs, manufactures and sells products and services worldwide. " * 4,
+        "Exchange": rng.choice(["NYSE", "NASDAQ"]),
+        "Currency": "USD",
+        "Country": "USA",
+        "Sector": rng.choice(SECTORS),
+        "Industry": "SERVICES-PREPACKAGED SOFTWARE",
+        "Address": "1 MAIN STREET, NEW YORK, NY, US",
+        "OfficialSite": f"https://{symbol.lower()}.example.com",
+        "MarketCapitalization": str(rng.randint(10**8, 3 * 10**12)),
+        "EBITDA": str(rng.randint(10**6, 10**11)),
+        "PERatio": f"{rng.uniform(3, 80):.2f}",
+        "PEGRatio": f"{rng.uniform(0.2, 4):.3f}",
+        "EPS": f"{rng.uniform(-5, 20):.2f}",
+        "BookValue": f"{rng.uniform(1, 200):.2f}",
+        "RevenueTTM": str(rng.randint(10**7, 4 * 10**11)),
+        "GrossProfitTTM": str(rng.randint(10**6, 2 * 10**11)),
+        "ProfitMargin": f"{rng.uniform(-0.3, 0.5):.4f}",
+        "OperatingMarginTTM": f"{rng.uniform(-0.3, 0.5):.4f}",
+        "ReturnOnAssetsTTM": f"{rng.uniform(-0.1, 0.3):.4f}",
+        "ReturnOnEquityTTM": f"{rng.uniform(-0.2, 0.8):.4f}",
+        "Beta": f"{rng.uniform(0.2, 2.5):.3f}",
+        "52WeekHigh": f"{price * 1.3:.2f}",
+        "52WeekLow": f"{price * 0.7:.2f}",
+        "50DayMovingAverage": f"{price:.2f}",
+        "200DayMovingAverage": f"{price * 0.95:.2f}",
+        "AnalystRatingStrongBuy": str(rng.randint(0, 15)),
+        "AnalystRatingBuy": str(rng.randint(0, 20)),
+        "AnalystRatingHold": str(rng.randint(0, 20)),
+        "AnalystRatingSell": str(rng.randint(0, 5)),
+        "AnalystRatingStrongSell": str(rng.randint(0, 3)),
+        "AnalystTargetPrice": f"{price * 1.1:.2f}",
+    }
+
+
+def symbol_search(keywords: str) -> dict:
+    rng = _rng("search", keywords)
+    stem = "".join(c for c in keywords.upper() if c.isalnum())[:4] or "X"
+    return {"bestMatches": [
+        {
+            "1. symbol": f"{stem}{suffix}",
+            "2. name": f"{stem.title()}{suffix} Corp",
+            "3. type": "Equity",
+            "4. region": "United States",
+            "8. currency": "USD",
+            "9. matchScore": f"{rng.uniform(0.3, 1):.4f}",
+        }
+        for suffix in ("", "A", "B")
+    ]}
+
+
+def daily_series(symbol: str, outputsize: str) -> dict:
+    if symbol.startswith("ZZ"):
+        return {"Error Message": "Invalid API call."}
+    rng = _rng("daily", symbol)
+    bars = 5000 if outputsize == "full" else 100
+    day = date.today()
+    days = []
+    while len(days) < bars:
+        if day.weekday() < 5:
+            days.append(day)
+        day -= timedelta(days=1)
+
+    close = rng.uniform(20, 500)
+    series = {}
+    for day in reversed(days):
+        close *= 1 + rng.gauss(0, 0.015)
+        series[day.isoformat()] = {
+            "1. open": f"{close * 0.995:.4f}",
+            "2. high": f"{close * 1.01:.4f}",
+            "3. low": f"{close * 0.99:.4f}",
+            "4. close": f"{close:.4f}",
+            "5. volume": str(rng.randint(10**5, 10**8)),
+        }
+    return {"Meta Data": {"2. Symbol": symbol}, "Time Series (Daily)": series}
+
+
+def alphavantage(params: dict) -> dict:
+    function = params.get("function", "")
+    symbol = params.get("symbol", "").upper()
+    if function == "OVERVIEW":
+        return overview(symbol)
+    if function == "SYMBOL_SEARCH":
+        return symbol_search(params.get("keywords", ""))
+    if function == "TIME_SERIES_DAILY":
+        return daily_series(symbol, params.get("outputsize", "compact"))
+    return {}
+
+
+# GEMINI
+def summary_text(prompt: str, words: int = 120) -> str:
+    rng = _rng("summary", prompt)
+    return " ".join(rng.choice(SUMMARY_WORDS) for _ in range(words))
+
+
+def gemini_response(text: str, done: bool = True, prompt_tokens: int = 0) -> dict:
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if done:
+        candidate["finishReason"] = "STOP"
+    usage = {"promptTokenCount": prompt_tokens, "candidatesTokenCount": len(text.split())}
+    return {"candidates": [candidate], "usageMetadata": usage}
+
+
+def _prompt(body: dict) -> str:
+    return "".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+
+
+# SERVER
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _inject(self) -> bool:
+        """Sleep for the configured latency; answer with an injected fault if one is drawn."""
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            roll = server.rng.random()
+            delay = max(server.latency + server.rng.uniform(-server.jitter, server.jitter), 0)
+        time.sleep(delay)
+
+        if roll < server.error_rate:
+            self._send(503, {"error": "injected failure"})
+            return True
+        if roll < server.error_rate + server.throttle_rate and self.path.startswith("/query"):
+            # Alpha Vantage's rate-limit answer: HTTP 200 with a lone Information key
+            self._send(200, {"Information": "Thank you for using Alpha Vantage! Our standard API rate limit is 5 requests per minute."})
+            return True
+        return False
+
+    def _send(self, status: int, data: dict) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/query":
+            return self._send(404, {"error": "not found"})
+        if self._inject():
+            return
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self._send(200, alphavantage(params))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if self._inject():
+            return
+
+        prompt = _prompt(body)
+        text = summary_text(prompt)
+        config = body.get("generationConfig", {})
+        if config.get("responseMimeType") == "application/json":
+            # One summary per property of the requested schema
+            schema = config.get("responseJsonSchema") or config.get("responseSchema") or {}
+            text = json.dumps({name: summary_text(prompt + name) for name in schema.get("properties", {})})
+        # Roughly Gemini's four characters per token
+        prompt_tokens = len(prompt) // 4
+        if url.path.endswith(":generateContent"):
+            return self._send(200, gemini_response(text, prompt_tokens=prompt_tokens))
+        if not url.path.endswith(":streamGenerateContent"):
+            return self._send(404, {"error": "not found"})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = text.split(" ")
+        chunks = [" ".join(words[i:i + 20]) + " " for i in range(0, len(words), 20)]
+        for index, chunk in enumerate(chunks):
+            done = index == len(chunks) - 1
+            self.wfile.write(f"data: {json.dumps(gemini_response(chunk, done, prompt_tokens))}\r\n\r\n".encode())
+            self.wfile.flush()
+            time.sleep(self.server.chunk_delay)
+        self.close_connection = True
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0,
+                 chunk_delay=0.0, seed=0):
+        super().__init__(address, StandInHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.chunk_delay = chunk_delay
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.requests = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start(port: int = 0, **options) -> StandInServer:
+    """Serve the stand-ins from a daemon thread; port 0 picks a free port."""
+    server = StandInServer(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", type=float, default=50, help="Milliseconds added to every upstream response")
+    parser.add_argument("--jitter", type=float, default=10, help="Random +/- milliseconds on top of --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of upstream calls answered with a 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="Fraction of Alpha Vantage calls answered with a rate-limit body")
+    parser.add_argument("--chunk-delay", type=float, default=20, help="Milliseconds between streamed Gemini chunks")
+
+
+def options_from(args) -> dict:
+    return {
+        "latency": args.latency / 1000,
+        "jitter": args.jitter / 1000,
+        "error_rate": args.error_rate,
+        "throttle_rate": args.throttle_rate,
+        "chunk_delay": args.chunk_delay / 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = StandInServer(("127.0.0.1", args.port), **options_from(args))
+    print(f"Alpha Vantage: {server.url}/query")
+    print(f"Gemini:        {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()